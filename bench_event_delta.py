@@ -0,0 +1,90 @@
+import glob
+import json
+import os
+import time
+import tracemalloc
+import optparse
+from sieve_common.config import get_common_config
+from sieve_common.event_delta import diff_event, diff_event_with_copy
+from sieve_common.k8s_event import get_mask_by_resource_key
+
+
+def load_object_pairs():
+    # pair the objects of the same resource key recorded in different oracles of a controller
+    object_pairs = []
+    for controller_dir in sorted(glob.glob("examples/*")):
+        key_to_objects = {}
+        for state_file in sorted(
+            glob.glob(os.path.join(controller_dir, "oracle", "*", "state.json"))
+        ):
+            state = json.load(open(state_file))
+            for key in state:
+                if isinstance(state[key], dict):
+                    key_to_objects.setdefault(key, []).append(state[key])
+        for key in key_to_objects:
+            objects = key_to_objects[key]
+            for i in range(len(objects)):
+                object_pairs.append((key, objects[i - 1], objects[i]))
+    return object_pairs
+
+
+def run_diff(diff_func, object_pairs, masks):
+    return [
+        diff_func(prev_object, cur_object, masks[key][0], masks[key][1])
+        for key, prev_object, cur_object in object_pairs
+    ]
+
+
+def measure(diff_func, object_pairs, masks, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        run_diff(diff_func, object_pairs, masks)
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    for key, prev_object, cur_object in object_pairs:
+        diff_func(prev_object, cur_object, masks[key][0], masks[key][1])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak
+
+
+if __name__ == "__main__":
+    usage = "usage: python3 bench_event_delta.py [options]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option(
+        "-r",
+        "--rounds",
+        dest="rounds",
+        help="number of ROUNDS to diff all the object pairs",
+        metavar="ROUNDS",
+        default="5",
+    )
+    (options, args) = parser.parse_args()
+    common_config = get_common_config()
+    object_pairs = load_object_pairs()
+    masks = {}
+    for key, _, _ in object_pairs:
+        masks[key] = (
+            set(get_mask_by_resource_key(common_config.field_key_mask, key)),
+            set(get_mask_by_resource_key(common_config.field_path_mask, key)),
+        )
+    assert run_diff(diff_event, object_pairs, masks) == run_diff(
+        diff_event_with_copy, object_pairs, masks
+    )
+    rounds = int(options.rounds)
+    print(
+        "{} object pairs from examples/*/oracle/*/state.json".format(len(object_pairs))
+    )
+    old_duration, old_peak = measure(diff_event_with_copy, object_pairs, masks, rounds)
+    new_duration, new_peak = measure(diff_event, object_pairs, masks, rounds)
+    print("{:<22}{:>12}{:>16}".format("", "time (s)", "peak mem (KB)"))
+    for name, duration, peak in [
+        ("diff_event_with_copy", old_duration, old_peak),
+        ("diff_event", new_duration, new_peak),
+    ]:
+        print("{:<22}{:>12.3f}{:>16.1f}".format(name, duration, peak / 1024))
+    print(
+        "speedup: {:.2f}x, peak memory: {:.2f}x less".format(
+            old_duration / new_duration, old_peak / new_peak
+        )
+    )
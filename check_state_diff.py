@@ -0,0 +1,222 @@
+import copy
+import glob
+import json
+import optparse
+import os
+import random
+import shutil
+import tempfile
+from deepdiff import DeepDiff
+from sieve_common.common import TestContext, SIEVE_LEARN_VALUE_MASK
+from sieve_common.config import get_common_config, load_controller_config
+from sieve_oracle.liveness_checker import (
+    compare_states,
+    diff_state_objects,
+    generate_state_delta_message,
+)
+
+FIELD_MESSAGE_PREFIXES = (
+    "End state inconsistency - more object fields than reference:",
+    "End state inconsistency - fewer object fields than reference:",
+    "End state inconsistency - object field has a different value:",
+)
+
+
+def deepdiff_deltas(reference_state, testing_state):
+    # the deltas reported by DeepDiff, which compare_states used to rely on
+    tdiff = DeepDiff(reference_state, testing_state, ignore_order=False, view="tree")
+    deltas = []
+    for delta_type in tdiff:
+        for key in tdiff[delta_type]:
+            t1 = None if delta_type.endswith("_added") else key.t1
+            t2 = None if delta_type.endswith("_removed") else key.t2
+            deltas.append((delta_type, key.path(output_format="list"), t1, t2))
+    return deltas
+
+
+def deepdiff_field_messages(test_context, reference_state, testing_state):
+    fields_diff_messages = []
+    fields_existence_messages = []
+    for delta in deepdiff_deltas(reference_state, testing_state):
+        message = generate_state_delta_message(test_context, *delta)
+        if message is None:
+            continue
+        if delta[0] in ["values_changed", "type_changes"]:
+            fields_diff_messages.append(message)
+        else:
+            fields_existence_messages.append(message)
+    return sorted(fields_diff_messages) + sorted(fields_existence_messages)
+
+
+def normalize_deltas(deltas):
+    return sorted(
+        json.dumps([delta_type, path, t1, t2]) for delta_type, path, t1, t2 in deltas
+    )
+
+
+def mutate(value, rand):
+    # return a random value that differs from value in type or content
+    choice = rand.randrange(6)
+    if choice == 0:
+        return SIEVE_LEARN_VALUE_MASK
+    elif choice == 1:
+        return "sieve-check-%d" % rand.randrange(1000)
+    elif choice == 2:
+        return rand.randrange(1000)
+    elif choice == 3:
+        return rand.random() < 0.5
+    elif choice == 4:
+        return None
+    return {"sieveCheck": copy.deepcopy(value)}
+
+
+def mutate_state(state, rand, num_mutations):
+    state = copy.deepcopy(state)
+    keys = [key for key in state if isinstance(state[key], dict)]
+    for _ in range(num_mutations):
+        if len(keys) == 0:
+            break
+        obj = state[rand.choice(keys)]
+        # walk down to a random field
+        while True:
+            fields = list(obj.keys()) if isinstance(obj, dict) else range(len(obj))
+            if len(fields) == 0:
+                break
+            field = rand.choice(list(fields))
+            child = obj[field]
+            if isinstance(child, (dict, list)) and len(child) > 0:
+                if rand.random() < 0.7:
+                    obj = child
+                    continue
+            action = rand.randrange(3)
+            if action == 0:
+                obj[field] = mutate(child, rand)
+            elif action == 1 and isinstance(obj, dict):
+                del obj[field]
+            elif action == 1:
+                obj.pop()
+            elif isinstance(obj, dict):
+                obj["sieveCheck%d" % rand.randrange(1000)] = mutate(child, rand)
+            else:
+                obj.append(mutate(child, rand))
+            break
+    return state
+
+
+def new_test_context(controller_config_dir, oracle_dir, result_dir):
+    return TestContext(
+        controller=os.path.basename(controller_config_dir),
+        controller_config_dir=controller_config_dir,
+        test_workload=os.path.basename(oracle_dir),
+        mode=None,
+        postprocess=True,
+        build_oracle=False,
+        original_test_plan=None,
+        test_plan=None,
+        result_root_dir=None,
+        result_dir=result_dir,
+        oracle_dir=oracle_dir,
+        container_registry=None,
+        image_tag=None,
+        num_apiservers=None,
+        num_workers=None,
+        use_csi_driver=False,
+        common_config=get_common_config(),
+        controller_config=load_controller_config(controller_config_dir),
+    )
+
+
+def check_pair(controller_config_dir, oracle_dir, testing_state, result_dir):
+    reference_state = json.load(open(os.path.join(oracle_dir, "state.json")))
+    expected_deltas = normalize_deltas(deepdiff_deltas(reference_state, testing_state))
+    actual_deltas = normalize_deltas(
+        diff_state_objects(reference_state, testing_state, [], lambda path: False)
+    )
+    if expected_deltas != actual_deltas:
+        return "deltas differ"
+    with open(os.path.join(result_dir, "state.json"), "w") as state_file:
+        json.dump(testing_state, state_file)
+    test_context = new_test_context(controller_config_dir, oracle_dir, result_dir)
+    expected_messages = deepdiff_field_messages(
+        test_context, reference_state, testing_state
+    )
+    actual_messages = [
+        message
+        for message in compare_states(test_context)
+        if message.startswith(FIELD_MESSAGE_PREFIXES)
+    ]
+    if expected_messages != actual_messages:
+        return "messages differ: %s vs %s" % (expected_messages, actual_messages)
+    return None
+
+
+def check_state_diff(num_variants, num_mutations, seed):
+    rand = random.Random(seed)
+    num_pairs = 0
+    num_failures = 0
+    result_dir = tempfile.mkdtemp()
+    for controller_config_dir in sorted(glob.glob("examples/*")):
+        oracle_dirs = sorted(
+            os.path.dirname(state_file)
+            for state_file in glob.glob(
+                os.path.join(controller_config_dir, "oracle", "*", "state.json")
+            )
+        )
+        for oracle_dir in oracle_dirs:
+            shutil.copy(os.path.join(oracle_dir, "controller_family.json"), result_dir)
+            # compare the reference state against the other recorded states
+            # and against random variants of itself
+            testing_states = [
+                json.load(open(os.path.join(other_oracle_dir, "state.json")))
+                for other_oracle_dir in oracle_dirs
+            ]
+            reference_state = json.load(open(os.path.join(oracle_dir, "state.json")))
+            for _ in range(num_variants):
+                testing_states.append(
+                    mutate_state(reference_state, rand, num_mutations)
+                )
+            for testing_state in testing_states:
+                num_pairs += 1
+                failure = check_pair(
+                    controller_config_dir, oracle_dir, testing_state, result_dir
+                )
+                if failure is not None:
+                    num_failures += 1
+                    print("\033[91m" + oracle_dir + " " + failure + "\033[0m")
+    shutil.rmtree(result_dir)
+    print("%d state pairs checked, %d mismatches" % (num_pairs, num_failures))
+    return num_failures == 0
+
+
+if __name__ == "__main__":
+    usage = "usage: python3 check_state_diff.py [options]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option(
+        "-v",
+        "--variants",
+        dest="variants",
+        help="number of random VARIANTS of each state.json to compare against",
+        metavar="VARIANTS",
+        default="5",
+    )
+    parser.add_option(
+        "-m",
+        "--mutations",
+        dest="mutations",
+        help="number of random MUTATIONS applied to each variant",
+        metavar="MUTATIONS",
+        default="10",
+    )
+    parser.add_option(
+        "-s",
+        "--seed",
+        dest="seed",
+        help="random SEED of the variants",
+        metavar="SEED",
+        default="0",
+    )
+    (options, args) = parser.parse_args()
+    if not check_state_diff(
+        int(options.variants), int(options.mutations), int(options.seed)
+    ):
+        exit(1)
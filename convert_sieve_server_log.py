@@ -0,0 +1,54 @@
+import glob
+import optparse
+import os
+import time
+from sieve_common.trace import convert_sieve_server_log
+
+
+def convert_learn_results(learn_result_dir, force):
+    # the trace is written next to the log, where the analyzer looks for it
+    log_paths = glob.glob(
+        os.path.join(learn_result_dir, "**", "sieve-server.log"), recursive=True
+    )
+    for log_path in sorted(log_paths):
+        trace_path = os.path.join(os.path.dirname(log_path), "sieve-server.trace")
+        if (
+            not force
+            and os.path.exists(trace_path)
+            and os.path.getmtime(trace_path) >= os.path.getmtime(log_path)
+        ):
+            continue
+        s = time.time()
+        convert_sieve_server_log(log_path, trace_path)
+        print(
+            "{} => {} ({} => {} bytes) takes {:.3f} seconds".format(
+                log_path,
+                trace_path,
+                os.path.getsize(log_path),
+                os.path.getsize(trace_path),
+                time.time() - s,
+            )
+        )
+
+
+if __name__ == "__main__":
+    usage = "usage: python3 convert_sieve_server_log.py [options]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option(
+        "-d",
+        "--dir",
+        dest="dir",
+        help="convert all the sieve-server.log under DIR",
+        metavar="DIR",
+        default="sieve_learn_results",
+    )
+    parser.add_option(
+        "-f",
+        "--force",
+        dest="force",
+        action="store_true",
+        help="convert the logs even if they are already converted",
+        default=False,
+    )
+    (options, args) = parser.parse_args()
+    convert_learn_results(options.dir, options.force)
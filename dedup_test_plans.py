@@ -0,0 +1,51 @@
+import optparse
+import os
+from sieve_common.config import get_common_config
+from sieve_common.test_plan import write_test_plan_manifest
+
+
+if __name__ == "__main__":
+    usage = "usage: python3 dedup_test_plans.py [options]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option(
+        "-d",
+        "--dir",
+        dest="dir",
+        help="deduplicate the test plans generated under DIR",
+        metavar="DIR",
+        default="sieve_learn_results",
+    )
+    parser.add_option(
+        "-c",
+        "--controller",
+        dest="controller",
+        help="only deduplicate the test plans of CONTROLLER",
+        metavar="CONTROLLER",
+        default=None,
+    )
+    parser.add_option(
+        "--across-workloads",
+        dest="across_workloads",
+        action="store_true",
+        help="consider the same test plan generated by different workloads equivalent",
+        default=get_common_config().test_plan_dedup_across_workloads_enabled,
+    )
+    parser.add_option(
+        "--per-workload",
+        dest="across_workloads",
+        action="store_false",
+        help="do not consider the same test plan generated by different workloads equivalent",
+    )
+    (options, args) = parser.parse_args()
+    if options.controller is None:
+        controllers = sorted(
+            controller
+            for controller in os.listdir(options.dir)
+            if os.path.isdir(os.path.join(options.dir, controller))
+        )
+    else:
+        controllers = [options.controller]
+    for controller in controllers:
+        write_test_plan_manifest(
+            os.path.join(options.dir, controller), options.across_workloads
+        )
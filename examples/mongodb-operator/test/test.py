@@ -5,7 +5,7 @@ current = os.path.dirname(os.path.realpath(__file__))
 sieve_root = os.path.dirname(os.path.dirname(os.path.dirname(current)))
 sys.path.append(sieve_root)
 
-from sieve_test_driver.test_framework import new_built_in_workload
+from sieve_test_driver.test_framework import new_built_in_workload, new_step_group
 from sieve_common.common import RUNNING, TERMINATED
 
 test_cases = {
@@ -25,8 +25,11 @@ test_cases = {
     .cmd(
         'kubectl patch PerconaServerMongoDB mongodb-cluster --type merge -p=\'{"spec":{"sharding":{"enabled":false}}}\''
     )
-    .wait_for_pod_status("mongodb-cluster-cfg-2", TERMINATED)
-    .wait_for_pod_status("mongodb-cluster-mongos-*", TERMINATED)
+    .all_of(
+        new_step_group()
+        .wait_for_pod_status("mongodb-cluster-cfg-2", TERMINATED)
+        .wait_for_pod_status("mongodb-cluster-mongos-*", TERMINATED)
+    )
     .cmd(
         'kubectl patch PerconaServerMongoDB mongodb-cluster --type merge -p=\'{"spec":{"sharding":{"enabled":true}}}\''
     )
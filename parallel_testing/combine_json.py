@@ -1,31 +1,27 @@
+import sys
+
+sys.path.append("../")
+
 import glob
 import json
 import time
 import os
-import sys
-
-
-def merge(result, patch):
-    """
-    Recursive function to merge two dict
-    """
-    for key in patch:
-        if key not in result:
-            result[key] = patch[key]
-        else:
-            if type(patch[key]) is not dict:
-                print("ERROR: Duplicate config, overwriting")
-                result[key] = patch[key]
-            else:
-                merge(result[key], patch[key])
+from sieve_common.result_db import (
+    query_test_plan_runs,
+    test_plan_states,
+    unrecorded_test_results,
+    iter_test_results,
+)
 
 
 if __name__ == "__main__":
     t = time.localtime()
     result_folder = sys.argv[1]
     controller = sys.argv[2]
-    json_names = glob.glob(
-        os.path.join(result_folder, "sieve_test_results/{}-*.json".format(controller))
+    # the result databases of all the hosts are collected in sieve_test_results
+    test_result_dir = os.path.join(result_folder, "sieve_test_results")
+    rows = query_test_plan_runs(
+        test_result_dir, controller=controller, states=[test_plan_states.DONE]
     )
     generated_test_plans = glob.glob(
         os.path.join(
@@ -40,25 +36,32 @@ if __name__ == "__main__":
 
     result = {}
     result["failed"] = []
-    for fname in json_names:
-        with open(fname, "r") as in_json:
-            patch = json.load(in_json)
-            merge(result, patch)
+    finished = set()
+    for row in rows:
+        result.setdefault(row["controller"], {}).setdefault(
+            row["test_workload"], {}
+        ).setdefault(row["mode"], {})[row["test_plan"]] = json.loads(row["result"])
+        finished.add((row["test_workload"], os.path.basename(row["test_plan"])))
+    # the test results not recorded in the result databases are read from the json files
+    unrecorded = unrecorded_test_results(test_result_dir)
+    for test_result in unrecorded.values():
+        for (
+            result_controller,
+            test_workload,
+            mode,
+            test_plan,
+            test_plan_result,
+        ) in iter_test_results(test_result):
+            if result_controller != controller:
+                continue
+            result.setdefault(controller, {}).setdefault(test_workload, {}).setdefault(
+                mode, {}
+            )[test_plan] = test_plan_result
+            finished.add((test_workload, os.path.basename(test_plan)))
     for test_plan in generated_test_plans:
         tokens = test_plan.split("/")
-        workload_name = tokens[-6]
-        expected_name = "{}-{}-{}.json".format(
-            controller,
-            workload_name,
-            os.path.basename(test_plan),
-        )
-        # print(test_plan)
-        # print(expected_name)
-        found = False
-        for json_name in json_names:
-            if json_name.endswith(expected_name):
-                found = True
-        if not found:
+        workload_name = tokens[-4]
+        if (workload_name, os.path.basename(test_plan)) not in finished:
             result["failed"].append(test_plan)
 
     with open(
@@ -0,0 +1,636 @@
+import sys
+
+sys.path.append("../")
+
+import argparse
+import collections
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from gen_commands import collect_test_plans, patterns
+from sieve_common.common import ok, fail
+from sieve_common.config import load_controller_config
+from sieve_common.test_plan import TestPlanQueue
+from sieve_common.result_db import (
+    finished_test_plans,
+    normalize_test_plan,
+    record_test_plan_result,
+)
+
+DEFAULT_FARM_PORT = 8642
+
+
+class FarmCoordinator:
+    """
+    The coordinator hands out the test plans to the workers one at a time when they ask for one,
+    so a host with more capacity (or faster runs) simply asks more often.
+    A test plan leased to a worker that stops sending heartbeats is queued again,
+    and each finished result uploaded by the workers is recorded right away.
+    """
+
+    def __init__(
+        self,
+        test_plan_queue,
+        test_plan_to_run,
+        result_root_dir,
+        heartbeat_timeout,
+        max_attempts,
+    ):
+        self.lock = threading.Lock()
+        self.pending = iter(test_plan_queue)
+        self.pending_exhausted = False
+        # the test plans queued again after their workers died or their runs failed
+        self.retries = collections.deque()
+        # test plan -> (controller, controller config dir, test workload)
+        self.test_plan_to_run = test_plan_to_run
+        self.result_root_dir = result_root_dir
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        # test plan -> the worker running it
+        self.leases = {}
+        self.attempts = collections.Counter()
+        # worker -> the last time the worker is heard from
+        self.workers = {}
+        self.finished = set()
+        self.failed = set()
+        self.all_finished = threading.Event()
+
+    def heard_from(self, worker):
+        if worker not in self.workers:
+            print("Worker {} joins".format(worker))
+        self.workers[worker] = time.time()
+
+    def next_test_plan(self):
+        if len(self.retries) > 0:
+            return self.retries.popleft()
+        if not self.pending_exhausted:
+            try:
+                return next(self.pending)
+            except StopIteration:
+                self.pending_exhausted = True
+        return None
+
+    def check_all_finished(self):
+        if self.pending_exhausted and len(self.retries) == 0 and len(self.leases) == 0:
+            self.all_finished.set()
+
+    def requeue_or_fail(self, test_plan):
+        if self.attempts[test_plan] < self.max_attempts:
+            self.retries.append(test_plan)
+        else:
+            fail("{} failed {} times".format(test_plan, self.attempts[test_plan]))
+            self.failed.add(test_plan)
+
+    def register(self, request):
+        with self.lock:
+            self.heard_from(request["worker"])
+            print(
+                "Worker {} runs {} test plans at a time".format(
+                    request["worker"], request["slots"]
+                )
+            )
+        return {}
+
+    def heartbeat(self, request):
+        with self.lock:
+            self.heard_from(request["worker"])
+            # the worker might be considered dead before, take its test plans back
+            for test_plan in request["test_plans"]:
+                if test_plan not in self.finished and test_plan not in self.leases:
+                    self.leases[test_plan] = request["worker"]
+                    if test_plan in self.retries:
+                        self.retries.remove(test_plan)
+        return {}
+
+    def lease(self, request):
+        with self.lock:
+            self.heard_from(request["worker"])
+            test_plan = self.next_test_plan()
+            if test_plan is None:
+                self.check_all_finished()
+                return {"test_plan": None, "done": self.all_finished.is_set()}
+            self.leases[test_plan] = request["worker"]
+            self.attempts[test_plan] += 1
+            controller, controller_config_dir, test_workload = self.test_plan_to_run[
+                test_plan
+            ]
+            print(
+                "Lease {} to {} (attempt {})".format(
+                    test_plan, request["worker"], self.attempts[test_plan]
+                )
+            )
+            return {
+                "test_plan": test_plan,
+                "test_plan_content": open(os.path.join("..", test_plan)).read(),
+                "controller": controller,
+                "controller_config_dir": controller_config_dir,
+                "test_workload": test_workload,
+                "done": False,
+            }
+
+    def upload(self, request):
+        """
+        Record the result of the test plan uploaded by the worker.
+        The result is None if the worker could not run the test plan.
+        """
+        with self.lock:
+            self.heard_from(request["worker"])
+            test_plan = request["test_plan"]
+            if test_plan in self.finished:
+                # the test plan is queued again and finished by another worker
+                return {}
+            self.leases.pop(test_plan, None)
+            if test_plan in self.retries:
+                self.retries.remove(test_plan)
+            if request["result"] is None:
+                fail("{} did not finish on {}".format(test_plan, request["worker"]))
+                self.requeue_or_fail(test_plan)
+                self.check_all_finished()
+                return {}
+            controller, _, test_workload = self.test_plan_to_run[test_plan]
+            result_file = os.path.join(
+                self.result_root_dir, os.path.basename(request["result_file"])
+            )
+            os.makedirs(self.result_root_dir, exist_ok=True)
+            with open(result_file, "w") as test_result_json:
+                json.dump(request["result"], test_result_json, indent=4)
+            # the result json has only one test plan in it
+            inner_result = list(
+                request["result"][controller][test_workload]["test"].values()
+            )[0]
+            record_test_plan_result(
+                self.result_root_dir,
+                controller,
+                test_workload,
+                "test",
+                os.path.join("..", test_plan),
+                inner_result,
+                result_file,
+            )
+            if inner_result["no_exception"]:
+                self.finished.add(test_plan)
+                self.failed.discard(test_plan)
+                ok(
+                    "{} finished on {} in {:.1f} seconds".format(
+                        test_plan, request["worker"], inner_result["duration"]
+                    )
+                )
+            else:
+                fail("{} raised exception on {}".format(test_plan, request["worker"]))
+                self.requeue_or_fail(test_plan)
+            self.check_all_finished()
+        return {}
+
+    def reap_dead_workers(self):
+        with self.lock:
+            now = time.time()
+            for worker in list(self.workers):
+                if now - self.workers[worker] < self.heartbeat_timeout:
+                    continue
+                fail("Worker {} is dead".format(worker))
+                del self.workers[worker]
+                for test_plan in list(self.leases):
+                    if self.leases[test_plan] == worker:
+                        del self.leases[test_plan]
+                        self.requeue_or_fail(test_plan)
+            self.check_all_finished()
+
+    def status(self):
+        with self.lock:
+            return {
+                "workers": sorted(self.workers),
+                "running": len(self.leases),
+                "queued_again": len(self.retries),
+                "finished": len(self.finished),
+                "failed": len(self.failed),
+            }
+
+
+class FarmRequestHandler(BaseHTTPRequestHandler):
+    coordinator = None
+
+    def reply(self, response):
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self.send_error(404)
+            return
+        self.reply(self.coordinator.status())
+
+    def do_POST(self):
+        handlers = {
+            "/register": self.coordinator.register,
+            "/heartbeat": self.coordinator.heartbeat,
+            "/lease": self.coordinator.lease,
+            "/upload": self.coordinator.upload,
+        }
+        if self.path not in handlers:
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.reply(handlers[self.path](request))
+
+    def log_message(self, format, *args):
+        # the coordinator prints the leases and results instead of each request
+        pass
+
+
+def run_coordinator(args):
+    if args.controllers is None:
+        args.controllers = os.listdir("../sieve_learn_results")
+    if args.patterns is None:
+        args.patterns = patterns
+    test_plan_to_run = {}
+    for test_plan, (controller, test_workload) in collect_test_plans(
+        args.controllers, args.patterns
+    ).items():
+        controller_config_dir = os.path.join("examples", controller)
+        controller_name = load_controller_config(
+            os.path.join("..", controller_config_dir)
+        ).controller_name
+        # the workers find the test plan by its path relative to the sieve dir
+        test_plan = normalize_test_plan(test_plan)
+        test_plan_to_run[test_plan] = (
+            controller_name,
+            controller_config_dir,
+            test_workload,
+        )
+    result_root_dir = os.path.abspath("../sieve_test_results")
+    if not args.rerun_finished:
+        finished = set()
+        for controller_name, _, _ in set(test_plan_to_run.values()):
+            finished |= finished_test_plans(result_root_dir, controller_name)
+        for test_plan in sorted(finished & set(test_plan_to_run)):
+            print("Skip {} as it is already finished".format(test_plan))
+            del test_plan_to_run[test_plan]
+    if len(test_plan_to_run) == 0:
+        print("No test plans to run")
+        return
+    test_plan_queue = TestPlanQueue(
+        [os.path.join("..", test_plan) for test_plan in test_plan_to_run],
+        result_root_dir,
+        args.time_budget,
+        args.jobs,
+    )
+    print("Test plans to run (with scores):")
+    print(test_plan_queue.describe())
+    coordinator = FarmCoordinator(
+        (os.path.relpath(test_plan, "..") for test_plan in test_plan_queue),
+        test_plan_to_run,
+        result_root_dir,
+        args.heartbeat_timeout,
+        args.max_attempts,
+    )
+    FarmRequestHandler.coordinator = coordinator
+    server = ThreadingHTTPServer((args.host, args.port), FarmRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print("Coordinator listening on {}:{}".format(args.host, args.port))
+    while not coordinator.all_finished.wait(args.heartbeat_timeout / 4):
+        coordinator.reap_dead_workers()
+    # keep answering the workers for a while so they learn that all the test plans are done
+    time.sleep(args.linger)
+    server.shutdown()
+    status = coordinator.status()
+    print(
+        "{} test plans finished, {} test plans failed".format(
+            status["finished"], status["failed"]
+        )
+    )
+
+
+def available_memory():
+    # in GiB
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / (1024 * 1024)
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES") / (1024**3)
+
+
+def worker_slots(cores_per_test, memory_per_test):
+    """
+    Decide how many test plans the worker runs at a time by the cores and the available memory,
+    as each test plan runs its own kind cluster.
+    """
+    cores = os.cpu_count() or 1
+    return max(
+        1,
+        min(int(cores // cores_per_test), int(available_memory() // memory_per_test)),
+    )
+
+
+class FarmWorker:
+    """
+    The worker runs slots test plans at a time, each on its own cluster (sieve-<slot>),
+    by calling sieve.py in the sieve dir, and uploads the result right after each test plan.
+    """
+
+    def __init__(self, args, slots):
+        self.coordinator_url = args.coordinator.rstrip("/")
+        self.name = args.name
+        self.slots = slots
+        self.slot_offset = args.slot_offset
+        self.sieve_dir = os.path.abspath(args.sieve_dir)
+        self.registry = args.registry
+        self.warm_cluster = args.warm_cluster
+        self.heartbeat_interval = args.heartbeat_interval
+        self.lock = threading.Lock()
+        self.running = set()
+        self.stopped = threading.Event()
+
+    def request(self, path, content, retries=5):
+        """
+        Send the request to the coordinator and return the response,
+        or None if the coordinator cannot be reached.
+        """
+        for i in range(retries):
+            try:
+                with urllib.request.urlopen(
+                    urllib.request.Request(
+                        self.coordinator_url + path,
+                        data=json.dumps(content).encode(),
+                        headers={"Content-Type": "application/json"},
+                    ),
+                    timeout=60,
+                ) as response:
+                    return json.loads(response.read())
+            except (urllib.error.URLError, OSError) as e:
+                print("Cannot reach the coordinator: {}".format(e))
+                if i + 1 < retries:
+                    time.sleep(self.heartbeat_interval)
+        return None
+
+    def run_test_plan(self, slot, lease):
+        test_plan = os.path.join(self.sieve_dir, lease["test_plan"])
+        # the worker might not have the test plan generated by the learn run on the coordinator
+        if (
+            not os.path.isfile(test_plan)
+            or open(test_plan).read() != lease["test_plan_content"]
+        ):
+            os.makedirs(os.path.dirname(test_plan), exist_ok=True)
+            with open(test_plan, "w") as test_plan_file:
+                test_plan_file.write(lease["test_plan_content"])
+        cluster_dir = os.path.join(
+            self.sieve_dir, "sieve_clusters", "sieve-{}".format(slot)
+        )
+        os.makedirs(cluster_dir, exist_ok=True)
+        cmd = [
+            "python3",
+            "sieve.py",
+            "-m",
+            "test",
+            "-c",
+            lease["controller_config_dir"],
+            "-w",
+            lease["test_workload"],
+            "-p",
+            lease["test_plan"],
+            "-r",
+            self.registry,
+            "--cluster-slot",
+            str(slot),
+        ]
+        if self.warm_cluster:
+            cmd.append("--warm-cluster")
+        result_file = os.path.join(
+            self.sieve_dir,
+            "sieve_test_results",
+            "{}-{}-{}.json".format(
+                lease["controller"],
+                lease["test_workload"],
+                os.path.basename(lease["test_plan"]),
+            ),
+        )
+        start_time = time.time()
+        with open(os.path.join(cluster_dir, "sieve.log"), "a") as log_file:
+            subprocess.run(
+                cmd, cwd=self.sieve_dir, stdout=log_file, stderr=subprocess.STDOUT
+            )
+        # the result json is left by an earlier run if sieve.py crashed this time
+        if (
+            not os.path.isfile(result_file)
+            or os.path.getmtime(result_file) < start_time
+        ):
+            return None, result_file
+        return json.load(open(result_file)), result_file
+
+    def run_slot(self, slot):
+        while not self.stopped.is_set():
+            lease = self.request("/lease", {"worker": self.name})
+            if lease is None or lease["done"]:
+                break
+            if lease["test_plan"] is None:
+                # the remaining test plans are running on other workers,
+                # wait in case some of them are queued again
+                time.sleep(self.heartbeat_interval)
+                continue
+            with self.lock:
+                self.running.add(lease["test_plan"])
+            print("Run {} on cluster sieve-{}".format(lease["test_plan"], slot))
+            result, result_file = self.run_test_plan(slot, lease)
+            response = self.request(
+                "/upload",
+                {
+                    "worker": self.name,
+                    "test_plan": lease["test_plan"],
+                    "result_file": result_file,
+                    "result": result,
+                },
+            )
+            with self.lock:
+                self.running.discard(lease["test_plan"])
+            if response is None:
+                break
+        self.stopped.set()
+
+    def send_heartbeats(self):
+        while not self.stopped.wait(self.heartbeat_interval):
+            with self.lock:
+                running = sorted(self.running)
+            self.request(
+                "/heartbeat", {"worker": self.name, "test_plans": running}, retries=1
+            )
+
+    def run(self):
+        if (
+            self.request("/register", {"worker": self.name, "slots": self.slots})
+            is None
+        ):
+            return
+        threading.Thread(target=self.send_heartbeats, daemon=True).start()
+        slot_threads = [
+            threading.Thread(target=self.run_slot, args=(self.slot_offset + i,))
+            for i in range(self.slots)
+        ]
+        for slot_thread in slot_threads:
+            slot_thread.start()
+        for slot_thread in slot_threads:
+            slot_thread.join()
+        print("Worker {} exits".format(self.name))
+
+
+def run_worker(args):
+    if args.name is None:
+        args.name = "{}-{}".format(socket.gethostname(), os.getpid())
+    slots = (
+        args.jobs
+        if args.jobs is not None
+        else worker_slots(args.cores_per_test, args.memory_per_test)
+    )
+    FarmWorker(args, slots).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the test plans on multiple hosts: one coordinator hands out the test plans to the workers."
+    )
+    subparsers = parser.add_subparsers(dest="role")
+    subparsers.required = True
+
+    coordinator_parser = subparsers.add_parser(
+        "coordinator", help="Hand out the test plans and collect the results"
+    )
+    coordinator_parser.add_argument(
+        "-c", dest="controllers", help="Controllers to test", nargs="+"
+    )
+    coordinator_parser.add_argument(
+        "--pattern", dest="patterns", help="Patterns to test", nargs="+"
+    )
+    coordinator_parser.add_argument(
+        "--host", dest="host", help="Address to listen on", default="0.0.0.0"
+    )
+    coordinator_parser.add_argument(
+        "--port",
+        dest="port",
+        help="Port to listen on",
+        type=int,
+        default=DEFAULT_FARM_PORT,
+    )
+    coordinator_parser.add_argument(
+        "--time-budget",
+        dest="time_budget",
+        help="Do not hand out more test plans after the seconds",
+        type=float,
+        default=None,
+    )
+    coordinator_parser.add_argument(
+        "-j",
+        dest="jobs",
+        help="Number of test plans run at the same time by all the workers (used to estimate the time budget)",
+        type=int,
+        default=1,
+    )
+    coordinator_parser.add_argument(
+        "--heartbeat-timeout",
+        dest="heartbeat_timeout",
+        help="Seconds without hearing from a worker before its test plans are queued again",
+        type=float,
+        default=120,
+    )
+    coordinator_parser.add_argument(
+        "--max-attempts",
+        dest="max_attempts",
+        help="Times to run a test plan before giving up on it",
+        type=int,
+        default=3,
+    )
+    coordinator_parser.add_argument(
+        "--linger",
+        dest="linger",
+        help="Seconds to keep answering the workers after all the test plans are done",
+        type=float,
+        default=60,
+    )
+    coordinator_parser.add_argument(
+        "--rerun-finished",
+        dest="rerun_finished",
+        action="store_true",
+        help="Also run the test plans already finished according to the result database",
+        default=False,
+    )
+
+    worker_parser = subparsers.add_parser(
+        "worker", help="Run the test plans handed out by the coordinator"
+    )
+    worker_parser.add_argument(
+        "coordinator", help="URL of the coordinator, e.g., http://vm1.com:8642"
+    )
+    worker_parser.add_argument(
+        "--name",
+        dest="name",
+        help="Name of the worker (default: host-pid)",
+        default=None,
+    )
+    worker_parser.add_argument(
+        "-j",
+        dest="jobs",
+        help="Number of test plans to run at a time (default: decided by the cores and memory)",
+        type=int,
+        default=None,
+    )
+    worker_parser.add_argument(
+        "--cores-per-test",
+        dest="cores_per_test",
+        help="Cores needed by one test plan",
+        type=float,
+        default=4,
+    )
+    worker_parser.add_argument(
+        "--memory-per-test",
+        dest="memory_per_test",
+        help="Memory (GiB) needed by one test plan",
+        type=float,
+        default=8,
+    )
+    worker_parser.add_argument(
+        "--slot-offset",
+        dest="slot_offset",
+        help="First cluster slot to use, so multiple workers can run on the same host",
+        type=int,
+        default=0,
+    )
+    worker_parser.add_argument(
+        "--sieve-dir", dest="sieve_dir", help="The sieve project dir", default=".."
+    )
+    worker_parser.add_argument(
+        "-r",
+        dest="registry",
+        help="Container registry",
+        default="ghcr.io/sieve-project/action",
+    )
+    worker_parser.add_argument(
+        "--warm-cluster",
+        dest="warm_cluster",
+        action="store_true",
+        help="Reuse the cluster of each slot across the test plans",
+        default=False,
+    )
+    worker_parser.add_argument(
+        "--heartbeat-interval",
+        dest="heartbeat_interval",
+        help="Seconds between two heartbeats",
+        type=float,
+        default=10,
+    )
+    args = parser.parse_args()
+
+    if args.role == "coordinator":
+        run_coordinator(args)
+    else:
+        run_worker(args)
@@ -1,9 +1,48 @@
+import sys
+
+sys.path.append("../")
+
 import glob
 import os
 import argparse
+from sieve_common.config import get_common_config
+from sieve_common.test_plan import unique_test_plans, TestPlanQueue
 
 patterns = ["intermediate-state", "unobserved-state", "stale-state"]
 
+
+def collect_test_plans(controllers, patterns):
+    """
+    Collect the test plans of the patterns generated by the learn runs of the controllers,
+    and return the map from each test plan to (controller, test workload).
+    Only one test plan of each group of equivalent test plans is collected.
+    """
+    test_plan_to_run = {}
+    for controller in controllers:
+        for pattern in patterns:
+            for test_workload in os.listdir(
+                os.path.join("../sieve_learn_results", controller)
+            ):
+                test_plans = glob.glob(
+                    os.path.join(
+                        os.path.abspath("../sieve_learn_results"),
+                        controller,
+                        test_workload,
+                        "learn",
+                        pattern,
+                        "*.yaml",
+                    )
+                )
+                for test_plan in test_plans:
+                    test_plan_to_run[test_plan] = (controller, test_workload)
+    # dedup all the collected test plans together, as the representative
+    # of a test plan might be generated by another workload or pattern
+    unique = unique_test_plans(
+        sorted(test_plan_to_run), get_common_config("..").test_plan_dedup_enabled
+    )
+    return {test_plan: test_plan_to_run[test_plan] for test_plan in unique}
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Generate testcase commands into a file."
@@ -21,6 +60,20 @@ if __name__ == "__main__":
     parser.add_argument(
         "--pattern", dest="patterns", help="Patterns to test", nargs="+"
     )
+    parser.add_argument(
+        "--time-budget",
+        dest="time_budget",
+        help="Only generate the commands of the test plans expected to finish within the seconds",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-j",
+        dest="jobs",
+        help="Number of test plans run at the same time (e.g., the number of hosts)",
+        type=int,
+        default=1,
+    )
     args = parser.parse_args()
 
     if args.controllers is None:
@@ -40,26 +93,20 @@ if __name__ == "__main__":
             pull_command_file.write(
                 "docker pull {}/{}:test\n".format(args.docker, controller)
             )
-            for pattern in args.patterns:
-                for test_workload in os.listdir(
-                    os.path.join("../sieve_learn_results", controller)
-                ):
-                    test_plans = glob.glob(
-                        os.path.join(
-                            os.path.abspath("../sieve_learn_results"),
-                            controller,
-                            test_workload,
-                            "learn",
-                            pattern,
-                            "*.yaml",
-                        )
-                    )
-                    for test_plan in test_plans:
-                        command_file.write(
-                            "python3 sieve.py -m test -c {} -w {} -p {} -r {}\n".format(
-                                controller,
-                                test_workload,
-                                test_plan,
-                                args.docker,
-                            )
-                        )
+        test_plan_to_run = collect_test_plans(args.controllers, args.patterns)
+        # the test plans most likely to find bugs go first
+        for test_plan in TestPlanQueue(
+            test_plan_to_run.keys(),
+            os.path.abspath("../sieve_test_results"),
+            args.time_budget,
+            args.jobs,
+        ):
+            controller, test_workload = test_plan_to_run[test_plan]
+            command_file.write(
+                "python3 sieve.py -m test -c {} -w {} -p {} -r {}\n".format(
+                    controller,
+                    test_workload,
+                    test_plan,
+                    args.docker,
+                )
+            )
@@ -4,6 +4,13 @@ sys.path.append("../")
 
 import argparse
 import os
+import queue
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sieve_common.common import ok, fail
+from sieve_common.config import get_common_config, load_controller_config
+from sieve_common.test_plan import write_test_plan_manifest
 
 controllers_to_run = {
     "cassandra-operator": ["recreate", "scaledown-scaleup"],
@@ -35,6 +42,166 @@ controllers_to_run = {
     "elastic-operator": ["recreate", "scaledown-scaleup"],
 }
 
+
+def learn_images(registry, controllers):
+    """
+    Return the images used by the learn runs of the controllers.
+    Each image appears only once even if it is shared by multiple controllers,
+    e.g., the kind node image of the same Kubernetes version.
+    The names are the same as kind_node_image and controller_image in sieve.py.
+    """
+    platform = "macos-" if sys.platform == "darwin" else ""
+    images = []
+    for controller in controllers:
+        controller_config = load_controller_config(os.path.join("examples", controller))
+        for image in [
+            "{}/node:{}-{}learn".format(
+                registry, controller_config.kubernetes_version, platform
+            ),
+            "{}/{}:learn".format(registry, controller_config.controller_name),
+        ]:
+            if image not in images:
+                images.append(image)
+    return images
+
+
+class LearnSweep:
+    """
+    Run the learn runs of different (controller, workload) pairs at the same time,
+    each on its own kind cluster (sieve-<slot>), with at most jobs clusters at a time.
+    When building the oracle, the passes of the same workload also run at the same time
+    on different clusters, and the oracle is built from all the passes once they are done.
+    The output of each run goes to sieve_learn_results/<controller>/<workload>/sieve-*.log.
+    """
+
+    def __init__(self, registry, jobs, build_oracle, num_learn_passes):
+        self.registry = registry
+        self.build_oracle = build_oracle
+        self.num_learn_passes = num_learn_passes
+        self.slots = queue.Queue()
+        for slot in range(jobs):
+            self.slots.put(slot)
+        self.cluster_executor = ThreadPoolExecutor(jobs)
+        self.lock = threading.Lock()
+        self.failed = []
+
+    def sieve(self, controller_name, controller, test_workload, options, log_name):
+        log_dir = os.path.join("sieve_learn_results", controller_name, test_workload)
+        os.makedirs(log_dir, exist_ok=True)
+        cmd = [
+            "python3",
+            "sieve.py",
+            "-m",
+            "learn",
+            "-c",
+            os.path.join("examples", controller),
+            "-w",
+            test_workload,
+            "-r",
+            self.registry,
+        ] + options
+        with open(os.path.join(log_dir, log_name), "w") as log_file:
+            return_code = subprocess.run(
+                cmd, stdout=log_file, stderr=subprocess.STDOUT
+            ).returncode
+        if return_code != 0:
+            with self.lock:
+                self.failed.append(" ".join(cmd))
+            fail(
+                "{} returns {}, see {}".format(
+                    " ".join(cmd), return_code, os.path.join(log_dir, log_name)
+                )
+            )
+        return return_code == 0
+
+    def sieve_on_cluster(
+        self, controller_name, controller, test_workload, options, log_name
+    ):
+        slot = self.slots.get()
+        try:
+            return self.sieve(
+                controller_name,
+                controller,
+                test_workload,
+                options + ["--cluster-slot", str(slot)],
+                log_name,
+            )
+        finally:
+            self.slots.put(slot)
+
+    def submit_learn_runs(self, controller_name, controller, test_workload):
+        if not self.build_oracle:
+            return [
+                self.cluster_executor.submit(
+                    self.sieve_on_cluster,
+                    controller_name,
+                    controller,
+                    test_workload,
+                    [],
+                    "sieve-learn.log",
+                )
+            ]
+        return [
+            self.cluster_executor.submit(
+                self.sieve_on_cluster,
+                controller_name,
+                controller,
+                test_workload,
+                ["--build-oracle", "--learn-pass", str(learn_pass)],
+                "sieve-learn-pass{}.log".format(learn_pass),
+            )
+            for learn_pass in range(1, self.num_learn_passes + 1)
+        ]
+
+    def finish_learn(self, controller_name, controller, test_workload, learn_runs):
+        success = all([learn_run.result() for learn_run in learn_runs])
+        if success and self.build_oracle:
+            # build the oracle and generate the test plans from all the passes,
+            # which does not need a cluster
+            success = self.sieve(
+                controller_name,
+                controller,
+                test_workload,
+                ["--build-oracle", "--postprocess"],
+                "sieve-postprocess.log",
+            )
+        if success:
+            ok("Learn run of {} {} is done".format(controller, test_workload))
+        return success
+
+    def run(self, controller_to_workloads):
+        workloads = [
+            (controller, test_workload)
+            for controller in controller_to_workloads
+            for test_workload in controller_to_workloads[controller]
+        ]
+        # each learn waits for its runs on the clusters in its own thread
+        with ThreadPoolExecutor(max(1, len(workloads))) as learn_executor:
+            learns = []
+            for controller, test_workload in workloads:
+                controller_name = load_controller_config(
+                    os.path.join("examples", controller)
+                ).controller_name
+                # the runs are submitted in order,
+                # so the passes of the same workload start at the same time
+                learn_runs = self.submit_learn_runs(
+                    controller_name, controller, test_workload
+                )
+                learns.append(
+                    learn_executor.submit(
+                        self.finish_learn,
+                        controller_name,
+                        controller,
+                        test_workload,
+                        learn_runs,
+                    )
+                )
+            for learn in learns:
+                learn.result()
+        self.cluster_executor.shutdown()
+        return self.failed
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Automate learning run.")
     parser.add_argument(
@@ -44,8 +211,26 @@ if __name__ == "__main__":
         default="ghcr.io/sieve-project/action",
     )
     parser.add_argument("-c", dest="controllers", help="Controllers to test", nargs="+")
+    parser.add_argument(
+        "-w", dest="workloads", help="Workloads to learn (default: all)", nargs="+"
+    )
+    parser.add_argument(
+        "-j",
+        dest="jobs",
+        help="Number of kind clusters used at the same time",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--build-oracle",
+        dest="build_oracle",
+        action="store_true",
+        help="Build the oracle, running the passes of each workload at the same time",
+        default=False,
+    )
     args = parser.parse_args()
     os.chdir("..")
+    common_config = get_common_config()
 
     if args.controllers is None:
         print("No controller specified, running learning mode for all controllers")
@@ -53,12 +238,36 @@ if __name__ == "__main__":
     else:
         controllers = args.controllers
 
-    os.system("docker pull %s/node:learn" % args.registry)
-    for controller in controllers:
-        os.system("docker pull %s/%s:learn" % (args.registry, controller))
-        for testcase in controllers_to_run[controller]:
-            os.system(
-                "python3 sieve.py -m learn -c {} -w {} -r {}".format(
-                    controller, testcase, args.registry
+    # pull each image once before the learn runs load them to their clusters
+    for image in learn_images(args.registry, controllers):
+        os.system("docker pull {}".format(image))
+    controller_to_workloads = {
+        controller: [
+            test_workload
+            for test_workload in controllers_to_run[controller]
+            if args.workloads is None or test_workload in args.workloads
+        ]
+        for controller in controllers
+    }
+    failed = LearnSweep(
+        args.registry, args.jobs, args.build_oracle, common_config.oracle_learn_passes
+    ).run(controller_to_workloads)
+    if (
+        common_config.test_plan_dedup_enabled
+        and common_config.persist_test_plans_enabled
+    ):
+        # the learn runs of the same controller might write the manifest at the same
+        # time, so write it again after all of them are done
+        for controller in controllers:
+            controller_name = load_controller_config(
+                os.path.join("examples", controller)
+            ).controller_name
+            controller_result_dir = os.path.join("sieve_learn_results", controller_name)
+            if os.path.isdir(controller_result_dir):
+                write_test_plan_manifest(
+                    controller_result_dir,
+                    common_config.test_plan_dedup_across_workloads_enabled,
                 )
-            )
+    if len(failed) > 0:
+        fail("{} learn runs failed:\n{}".format(len(failed), "\n".join(failed)))
+        exit(1)
@@ -1,22 +1,20 @@
-import json
-import glob
+from sieve_common.result_db import (
+    query_potential_bugs,
+    unrecorded_test_results,
+    iter_test_results,
+    is_potential_bug,
+)
 
-test_result_files = glob.glob("sieve_test_results/*.json")
 potential_bug_list = ""
-for test_result_file in test_result_files:
-    test_result = json.load(open(test_result_file))
-    for controller in test_result:
-        for test_case in test_result[controller]:
-            for mode in test_result[controller][test_case]:
-                for test_plan in test_result[controller][test_case][mode]:
-                    inner_result = test_result[controller][test_case][mode][test_plan]
-                    if (
-                        inner_result["injection_completed"]
-                        and inner_result["workload_completed"]
-                        and inner_result["no_exception"]
-                        and inner_result["number_errors"] > 0
-                    ):
-                        potential_bug_list += test_result_file + "\n"
+for row in query_potential_bugs("sieve_test_results"):
+    potential_bug_list += row["result_file"] + "\n"
+
+# the test results not recorded in the result databases are read from the json files
+unrecorded = unrecorded_test_results("sieve_test_results")
+for test_result_file, test_result in unrecorded.items():
+    for _, _, _, _, result in iter_test_results(test_result):
+        if is_potential_bug(result):
+            potential_bug_list += test_result_file + "\n"
 
 print(
     "Please refer to the following test results for potential bugs found by Sieve\n"
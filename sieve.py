@@ -1,5 +1,6 @@
 import shutil
 from typing import Tuple
+from contextlib import contextmanager
 import docker
 import optparse
 import os
@@ -14,9 +15,7 @@ import glob
 import sys
 from sieve_analyzer import analyze
 from sieve_oracle.oracle import (
-    save_state,
-    save_history,
-    save_controller_related_object_list,
+    save_api_event_artifacts,
     create_differential_oracles,
     check,
 )
@@ -29,9 +28,16 @@ import signal
 import errno
 import socket
 import traceback
+import fcntl
+import multiprocessing
+import queue
+import datetime
 from sieve_common.common import (
     TestContext,
     TestResult,
+    KindCluster,
+    DEFAULT_KIND_CLUSTER,
+    DEFAULT_SIEVE_SERVER_PORT,
     cprint,
     bcolors,
     ok,
@@ -40,7 +46,17 @@ from sieve_common.common import (
     os_system,
     deploy_directory,
     rmtree_if_exists,
-    first_pass_learn_result_dir,
+    learn_pass_result_dir,
+)
+from sieve_common.k8s_event import SIEVE_API_EVENT_MARK
+from sieve_common.k8s_watch import wait_until, wait_durations, reset_wait_durations
+from sieve_common.test_plan import unique_test_plans, TestPlanQueue
+from sieve_common.result_db import (
+    queue_test_plans,
+    record_test_plan_running,
+    record_test_plan_result,
+    finished_test_plans,
+    normalize_test_plan,
 )
 
 
@@ -52,6 +68,7 @@ def save_run_result(
     """
     Save the testing result into a json file for later debugging.
     The test result json contains the test plan, the errors detected by the oracles and so on.
+    The result is also recorded in the result database so the batch mode can skip the test plan.
     """
     if test_context.mode != sieve_modes.TEST:
         return
@@ -81,6 +98,7 @@ def save_run_result(
                         if test_context.mode == sieve_modes.TEST
                         else "",
                         "host": socket.gethostname(),
+                        "wait_durations": dict(wait_durations),
                     }
                 }
             },
@@ -107,6 +125,36 @@ def save_run_result(
             test_result_json,
             indent=4,
         )
+    record_test_plan_result(
+        test_context.result_root_dir,
+        test_context.controller,
+        test_context.test_workload,
+        test_context.mode,
+        test_context.original_test_plan,
+        result_map[test_context.controller][test_context.test_workload][
+            test_context.mode
+        ][test_context.original_test_plan],
+        result_filename,
+    )
+
+
+SIEVE_CLUSTERS_DIR = "sieve_clusters"
+
+
+@contextmanager
+def sieve_file_lock(name):
+    """
+    Serialize the steps modifying the files shared by the test runs in parallel,
+    e.g., building the Sieve server and rewriting the deployment file of the controller.
+    """
+    os.makedirs(SIEVE_CLUSTERS_DIR, exist_ok=True)
+    lock_file = open(os.path.join(SIEVE_CLUSTERS_DIR, name + ".lock"), "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
 
 
 def create_configmap(test_plan):
@@ -121,12 +169,13 @@ def create_configmap(test_plan):
     return configmap_path
 
 
-def create_kind_config(num_apiservers, num_workers):
+def create_kind_config(num_apiservers, num_workers, cluster_name=DEFAULT_KIND_CLUSTER):
     kind_config_dir = "kind_configs"
     os.makedirs(kind_config_dir, exist_ok=True)
     kind_config_filename = os.path.join(
         kind_config_dir,
-        "kind-{}a-{}w.yaml".format(
+        "{}-{}a-{}w.yaml".format(
+            cluster_name,
             str(num_apiservers),
             str(num_workers),
         ),
@@ -143,26 +192,27 @@ def create_kind_config(num_apiservers, num_workers):
 
 
 def redirect_workers(test_context: TestContext):
-    leading_api = test_context.common_config.leading_api
+    cluster = test_context.cluster
+    leading_api = cluster.node(test_context.common_config.leading_api)
     for i in range(test_context.num_workers):
-        worker = "kind-worker" + (str(i + 1) if i > 0 else "")
+        worker = cluster.worker(i)
         os_system(
-            "docker exec {} bash -c \"sed -i 's/kind-external-load-balancer/{}/g' /etc/kubernetes/kubelet.conf\"".format(
-                worker, leading_api
+            "docker exec {} bash -c \"sed -i 's/{}/{}/g' /etc/kubernetes/kubelet.conf\"".format(
+                worker, cluster.external_load_balancer(), leading_api
             )
         )
         os_system('docker exec {} bash -c "systemctl restart kubelet"'.format(worker))
 
 
-def redirect_kubectl():
+def redirect_kubectl(cluster: KindCluster):
     client = docker.from_env()
-    cp_port = client.containers.get("kind-control-plane").attrs["NetworkSettings"][
+    cp_port = client.containers.get(cluster.control_plane()).attrs["NetworkSettings"][
         "Ports"
     ]["6443/tcp"][0]["HostPort"]
-    balancer_port = client.containers.get("kind-external-load-balancer").attrs[
+    balancer_port = client.containers.get(cluster.external_load_balancer()).attrs[
         "NetworkSettings"
     ]["Ports"]["6443/tcp"][0]["HostPort"]
-    kube_config = os.getenv("KUBECONFIG")
+    kube_config = cluster.kubeconfig_path()
     target_prefix = "    server: https://127.0.0.1:"
     fin = open(kube_config)
     data = fin.read()
@@ -174,13 +224,11 @@ def redirect_kubectl():
     fin.close()
 
 
-def get_apiserver_ports(num_api):
+def get_apiserver_ports(cluster: KindCluster, num_api):
     client = docker.from_env()
     ports = []
     for i in range(num_api):
-        container_name_prefix = "kind-control-plane"
-        suffix = str(i + 1) if i > 0 else ""
-        cp_port = client.containers.get(container_name_prefix + suffix).attrs[
+        cp_port = client.containers.get(cluster.control_plane(i)).attrs[
             "NetworkSettings"
         ]["Ports"]["6443/tcp"][0]["HostPort"]
         ports.append(cp_port)
@@ -188,6 +236,9 @@ def get_apiserver_ports(num_api):
 
 
 def prepare_sieve_server(test_context: TestContext):
+    # Each cluster has its own copy of the Sieve server with its own configs.
+    sieve_server_dir = test_context.cluster.sieve_server_dir
+    os.makedirs(sieve_server_dir, exist_ok=True)
     if test_context.mode == sieve_modes.TEST:
         configured_field_key_mask_json = "configured_field_key_mask.json"
         configured_field_path_mask_json = "configured_field_path_mask.json"
@@ -206,21 +257,30 @@ def prepare_sieve_server(test_context: TestContext):
         learned_mask = os.path.join(test_context.oracle_dir, "mask.json")
         shutil.move(
             configured_field_key_mask_json,
-            "sieve_server/{}".format(configured_field_key_mask_json),
+            os.path.join(sieve_server_dir, configured_field_key_mask_json),
         )
         shutil.move(
             configured_field_path_mask_json,
-            "sieve_server/{}".format(configured_field_path_mask_json),
+            os.path.join(sieve_server_dir, configured_field_path_mask_json),
         )
-        shutil.copy(learned_mask, "sieve_server/learned_field_path_mask.json")
-    shutil.copy(test_context.test_plan, "sieve_server/server.yaml")
-    org_dir = os.getcwd()
-    os.chdir("sieve_server")
-    os_system("go mod tidy")
-    # TODO: we should build a container image for sieve server.
-    os_system("env GOOS=linux GOARCH=amd64 go build")
-    os.chdir(org_dir)
-    os_system("docker cp sieve_server kind-control-plane:/sieve_server")
+        shutil.copy(
+            learned_mask, os.path.join(sieve_server_dir, "learned_field_path_mask.json")
+        )
+    shutil.copy(test_context.test_plan, os.path.join(sieve_server_dir, "server.yaml"))
+    with sieve_file_lock("sieve_server"):
+        org_dir = os.getcwd()
+        os.chdir("sieve_server")
+        os_system("go mod tidy")
+        # TODO: we should build a container image for sieve server.
+        os_system("env GOOS=linux GOARCH=amd64 go build")
+        os.chdir(org_dir)
+        if os.path.abspath(sieve_server_dir) != os.path.abspath("sieve_server"):
+            shutil.copy("sieve_server/sieve-server", sieve_server_dir)
+    os_system(
+        "docker cp {} {}:/sieve_server".format(
+            sieve_server_dir, test_context.cluster.control_plane()
+        )
+    )
 
 
 def start_sieve_server(test_context: TestContext):
@@ -230,20 +290,21 @@ def start_sieve_server(test_context: TestContext):
         else sieve_modes.LEARN
     )
     os_system(
-        "docker exec kind-control-plane bash -c 'cd /sieve_server && ./sieve-server {} &> sieve-server.log &'".format(
-            sieve_server_mode
+        "docker exec {} bash -c 'cd /sieve_server && ./sieve-server {} {} &> sieve-server.log &'".format(
+            test_context.cluster.control_plane(),
+            sieve_server_mode,
+            test_context.cluster.sieve_server_port,
         )
     )
 
 
-def stop_sieve_server():
-    os_system("docker exec kind-control-plane bash -c 'pkill sieve-server'")
+def stop_sieve_server(cluster: KindCluster):
+    os_system(
+        "docker exec {} bash -c 'pkill sieve-server'".format(cluster.control_plane())
+    )
 
 
-def setup_kind_cluster(test_context: TestContext):
-    kind_config = create_kind_config(
-        test_context.num_apiservers, test_context.num_workers
-    )
+def kind_node_image(test_context: TestContext):
     platform = ""
     if sys.platform == "darwin":
         platform = "macos-"
@@ -251,11 +312,216 @@ def setup_kind_cluster(test_context: TestContext):
     k8s_image_tag = (
         test_context.controller_config.kubernetes_version + "-" + platform + test_context.image_tag
     )
+    return "{}/node:{}".format(k8s_container_registry, k8s_image_tag)
+
+
+def controller_image(test_context: TestContext):
+    return "{}/{}:{}".format(
+        test_context.container_registry,
+        test_context.controller,
+        test_context.image_tag,
+    )
+
+
+def command_output_lines(cmd):
+    return subprocess.run(
+        cmd, shell=True, check=True, stdout=subprocess.PIPE, universal_newlines=True
+    ).stdout.split()
+
+
+def warm_cluster_state_file(cluster: KindCluster):
+    return os.path.join(SIEVE_CLUSTERS_DIR, cluster.name, "warm_cluster.json")
+
+
+def warm_cluster_fingerprint(test_context: TestContext):
+    """
+    The warm cluster can be reused only if the test run needs exactly the same cluster,
+    i.e., the same nodes, node image, controller image, csi driver and redirection.
+    """
+    return {
+        "num_apiservers": test_context.num_apiservers,
+        "num_workers": test_context.num_workers,
+        "use_csi_driver": test_context.use_csi_driver,
+        "kubernetes_version": test_context.controller_config.kubernetes_version,
+        "node_image": kind_node_image(test_context),
+        "controller_image": controller_image(test_context),
+        "redirected": "reconnectController" in test_context.action_types,
+    }
+
+
+def list_test_namespace_objects(test_context: TestContext):
+    resource_types = [
+        resource_type
+        for resource_type in command_output_lines(
+            "kubectl api-resources --verbs=list,delete --namespaced -o name"
+        )
+        if resource_type not in ["events", "events.events.k8s.io"]
+    ]
+    return command_output_lines(
+        "kubectl get {} -n {} -o name".format(
+            ",".join(resource_types), test_context.common_config.namespace
+        )
+    )
+
+
+def list_cluster_scoped_objects():
+    # the crds are deleted separately before the other objects
+    resource_types = [
+        resource_type
+        for resource_type in command_output_lines(
+            "kubectl api-resources --verbs=list,delete --namespaced=false -o name"
+        )
+        if resource_type != "customresourcedefinitions.apiextensions.k8s.io"
+    ]
+    return command_output_lines(
+        "kubectl get {} -o name".format(",".join(resource_types))
+    )
+
+
+def list_api_events(cluster: KindCluster, i):
+    # the state changes logged by the i-th apiserver so far
+    return [
+        line
+        for line in subprocess.run(
+            "kubectl logs {} -n kube-system".format(cluster.apiserver_pod(i)),
+            shell=True,
+            check=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout.splitlines(keepends=True)
+        if SIEVE_API_EVENT_MARK in line
+    ]
+
+
+def save_warm_cluster_state(test_context: TestContext):
+    """
+    Record the fingerprint of the newly set up warm cluster
+    and the objects that belong to the cluster itself (i.e., not created by the test run),
+    which are kept when resetting the cluster.
+    The state changes of the kept objects logged by each apiserver so far are also recorded,
+    as the apiserver logs of a test run on the reset cluster start from the reset.
+    """
+    state = {
+        "fingerprint": warm_cluster_fingerprint(test_context),
+        "crds": command_output_lines("kubectl get crd -o name"),
+        "objects": list_test_namespace_objects(test_context),
+        "cluster_scoped_objects": list_cluster_scoped_objects(),
+        "api_events": [
+            list_api_events(test_context.cluster, i)
+            for i in range(test_context.num_apiservers)
+        ],
+    }
+    state_file = warm_cluster_state_file(test_context.cluster)
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    json.dump(state, open(state_file, "w"), indent=4)
+
+
+def reset_warm_cluster(test_context: TestContext) -> bool:
+    """
+    Reset the warm cluster left by the previous test run so that it can be used by this test run.
+    The crds (with the custom resources), the controller, the sieve configmap
+    and the other objects created in the test namespace or outside any namespace
+    (e.g., namespaces, cluster roles and webhook configurations) by the previous test run
+    are deleted, while the nodes and the loaded images are kept.
+    The Sieve server is stopped here and started with the new test plan later.
+    Return False if the cluster cannot be reused and needs to be rebuilt.
+    """
+    cluster = test_context.cluster
+    state_file = warm_cluster_state_file(cluster)
+    if not os.path.exists(state_file):
+        return False
+    state = json.load(open(state_file))
+    if state["fingerprint"] != warm_cluster_fingerprint(test_context):
+        print(
+            "The warm cluster {} needs to be rebuilt for {}".format(
+                cluster.name, warm_cluster_fingerprint(test_context)
+            )
+        )
+        return False
+    start_time = time.time()
+    namespace = test_context.common_config.namespace
+    try:
+        if cluster.name not in command_output_lines("kind get clusters"):
+            return False
+        cprint("Resetting the warm cluster {}...".format(cluster.name), bcolors.OKGREEN)
+        os_system(
+            "docker exec {} bash -c 'pkill sieve-server; rm -rf /sieve_server'".format(
+                cluster.control_plane()
+            ),
+            early_exit=False,
+        )
+        # Delete the custom resources (by deleting the crds) before the controller
+        # so that the controller can still handle their finalizers.
+        crds = [
+            crd
+            for crd in command_output_lines("kubectl get crd -o name")
+            if crd not in state["crds"]
+        ]
+        if len(crds) != 0:
+            os_system("kubectl delete {} --timeout=120s".format(" ".join(crds)))
+        os_system(
+            "kubectl delete configmap sieve-testing-global-config --ignore-not-found"
+        )
+        for tick in range(60):
+            objects = [
+                obj
+                for obj in list_test_namespace_objects(test_context)
+                if obj not in state["objects"]
+            ]
+            cluster_scoped_objects = [
+                obj
+                for obj in list_cluster_scoped_objects()
+                if obj not in state["cluster_scoped_objects"]
+            ]
+            if len(objects) == 0 and len(cluster_scoped_objects) == 0:
+                break
+            if len(objects) != 0:
+                os_system(
+                    "kubectl delete {} -n {} --ignore-not-found --timeout=120s".format(
+                        " ".join(objects), namespace
+                    ),
+                    early_exit=False,
+                )
+            if len(cluster_scoped_objects) != 0:
+                os_system(
+                    "kubectl delete {} --ignore-not-found --timeout=120s".format(
+                        " ".join(cluster_scoped_objects)
+                    ),
+                    early_exit=False,
+                )
+            time.sleep(1)
+        else:
+            print(
+                "Objects left after resetting the cluster: {}".format(
+                    objects + cluster_scoped_objects
+                )
+            )
+            return False
+    except Exception:
+        print(traceback.format_exc())
+        return False
+    # The logs before this time belong to the previous test runs.
+    cluster.since_time = datetime.datetime.now(datetime.timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%S.%fZ"
+    )
+    ok("Warm cluster reset in {:.1f} seconds".format(time.time() - start_time))
+    return True
+
+
+def setup_kind_cluster(test_context: TestContext):
+    cluster = test_context.cluster
+    kind_config = create_kind_config(
+        test_context.num_apiservers, test_context.num_workers, cluster.name
+    )
+    # The state of the previous warm cluster is invalid once the cluster is recreated.
+    if os.path.exists(warm_cluster_state_file(cluster)):
+        os.remove(warm_cluster_state_file(cluster))
+    cluster.since_time = None
     retry_cnt = 0
     # Retry cluster creation for 5 times.
     while retry_cnt < 5:
         try:
-            os_system("kind delete cluster")
+            os_system("kind delete cluster {}".format(cluster.kind_options()))
             # Sleep here in case if the machine is slow and kind cluster deletion is not done before creating a new cluster.
             time.sleep(10 * retry_cnt)
             if retry_cnt == 0:
@@ -266,12 +532,16 @@ def setup_kind_cluster(test_context: TestContext):
                 )
             retry_cnt += 1
             os_system(
-                "kind create cluster --image {}/node:{} --config {}".format(
-                    k8s_container_registry, k8s_image_tag, kind_config
+                "kind create cluster {} --image {} --config {}".format(
+                    cluster.kind_options(),
+                    kind_node_image(test_context),
+                    kind_config,
                 )
             )
             os_system(
-                "docker exec kind-control-plane bash -c 'mkdir -p /root/.kube/ && cp /etc/kubernetes/admin.conf /root/.kube/config'"
+                "docker exec {} bash -c 'mkdir -p /root/.kube/ && cp /etc/kubernetes/admin.conf /root/.kube/config'".format(
+                    cluster.control_plane()
+                )
             )
             return
         except Exception:
@@ -281,47 +551,52 @@ def setup_kind_cluster(test_context: TestContext):
 def setup_cluster(test_context: TestContext):
     """
     Set up the kind cluster for testing and wait until the control plane is ready.
+    A warm cluster left by the previous test run is reset and reused if it fits this test run.
     """
-    setup_kind_cluster(test_context)
-    print("\n\n")
-
-    # When testing stale-state, we need to pause the apiserver
-    # if workers talks to the paused apiserver, the whole cluster will be slowed down.
-    # In a multi-apiserver set up (HA mode), each worker (kubelet) talks to a load balancer
-    # which might forward the request to any backend apiserver.
-    # We want to focus on testing how the controller handles staleness
-    # so here we redirect the workers to an apiserver (configurable in config.json)
-    # which Sieve will NOT slow down later.
-    if "reconnectController" in test_context.action_types:
-        cprint(
-            "Redirecting workers and kubectl to the leading API server...",
-            bcolors.OKGREEN,
-        )
-        redirect_workers(test_context)  # Redirect the kubelet on each worker node.
-        redirect_kubectl()  # Redirect the local kubectl.
-        ok("Redirection done")
-
-    kubernetes.config.load_kube_config()
-    core_v1 = kubernetes.client.CoreV1Api()
+    cluster = test_context.cluster
+    cluster.reused = cluster.warm and reset_warm_cluster(test_context)
+    if not cluster.reused:
+        setup_kind_cluster(test_context)
+        print("\n\n")
+
+        # When testing stale-state, we need to pause the apiserver
+        # if workers talks to the paused apiserver, the whole cluster will be slowed down.
+        # In a multi-apiserver set up (HA mode), each worker (kubelet) talks to a load balancer
+        # which might forward the request to any backend apiserver.
+        # We want to focus on testing how the controller handles staleness
+        # so here we redirect the workers to an apiserver (configurable in config.json)
+        # which Sieve will NOT slow down later.
+        if "reconnectController" in test_context.action_types:
+            cprint(
+                "Redirecting workers and kubectl to the leading API server...",
+                bcolors.OKGREEN,
+            )
+            redirect_workers(test_context)  # Redirect the kubelet on each worker node.
+            redirect_kubectl(cluster)  # Redirect the local kubectl.
+            ok("Redirection done")
+
+        kubernetes.config.load_kube_config(config_file=cluster.kubeconfig_path())
+        core_v1 = kubernetes.client.CoreV1Api()
+
+        # Then we wait apiservers to be ready.
+        print("Waiting for apiservers to be ready...")
+        apiserver_list = []
+        for i in range(test_context.num_apiservers):
+            apiserver_list.append(cluster.apiserver_pod(i))
+
+        def apiservers_ready(created):
+            return len(created) == len(apiserver_list) and len(created) == len(
+                [item for item in created if item.status.phase == "Running"]
+            )
 
-    # Then we wait apiservers to be ready.
-    print("Waiting for apiservers to be ready...")
-    apiserver_list = []
-    for i in range(test_context.num_apiservers):
-        apiserver_name = "kube-apiserver-kind-control-plane" + (
-            "" if i == 0 else str(i + 1)
-        )
-        apiserver_list.append(apiserver_name)
-    # TODO: this can be better replaced by a watch.
-    for tick in range(600):
-        created = core_v1.list_namespaced_pod(
-            "kube-system", watch=False, label_selector="component=kube-apiserver"
-        ).items
-        if len(created) == len(apiserver_list) and len(created) == len(
-            [item for item in created if item.status.phase == "Running"]
-        ):
-            break
-        time.sleep(1)
+        wait_until(
+            core_v1.list_namespaced_pod,
+            apiservers_ready,
+            600,
+            "wait for apiservers",
+            namespace="kube-system",
+            label_selector="component=kube-apiserver",
+        )
 
     if test_context.mode != sieve_modes.VANILLA:
         # Start the Sieve server.
@@ -342,14 +617,16 @@ def setup_cluster(test_context: TestContext):
     configmap = create_configmap(test_context.test_plan)
     os_system("kubectl apply -f {}".format(configmap))
 
+    if cluster.reused:
+        # The controller image has been loaded to the warm cluster.
+        return
+
     # Preload controller image to kind nodes.
     # This makes it faster to start the controller.
-    image = "{}/{}:{}".format(
-        test_context.container_registry,
-        test_context.controller,
-        test_context.image_tag,
+    image = controller_image(test_context)
+    kind_load_cmd = "kind load docker-image {} --name {}".format(
+        image, test_context.cluster.name
     )
-    kind_load_cmd = "kind load docker-image {}".format(image)
     print("Loading image {} to kind nodes...".format(image))
     if os_system(kind_load_cmd, early_exit=False) != 0:
         print("Cannot load image {} locally, try to pull from remote".format(image))
@@ -359,13 +636,24 @@ def setup_cluster(test_context: TestContext):
 
 def deploy_controller(test_context: TestContext):
     # Install csi driver if some controller needs it.
-    if test_context.use_csi_driver:
+    # The warm cluster keeps the csi driver installed by the first test run.
+    if test_context.use_csi_driver and not test_context.cluster.reused:
         print("Installing csi provisioner...")
         org_dir = os.getcwd()
         os.chdir("sieve_aux/csi-driver")
         os_system("./install.sh")
         os.chdir(org_dir)
 
+    if test_context.cluster.warm and not test_context.cluster.reused:
+        save_warm_cluster_state(test_context)
+
+    # The deployment file is modified in place
+    # so the test runs in parallel deploy the controller one by one.
+    with sieve_file_lock("deploy-" + test_context.controller):
+        deploy_controller_with_deployment_file(test_context)
+
+
+def deploy_controller_with_deployment_file(test_context: TestContext):
     deployment_file = test_context.controller_config.controller_deployment_file_path
 
     # Backup the provided deployment file.
@@ -402,24 +690,25 @@ def start_controller(test_context: TestContext):
     num_apiservers = test_context.num_apiservers
     deploy_controller(test_context)
 
-    kubernetes.config.load_kube_config()
+    kubernetes.config.load_kube_config(
+        config_file=test_context.cluster.kubeconfig_path()
+    )
     core_v1 = kubernetes.client.CoreV1Api()
 
     # Wait for controller pod to be ready
-    # TODO: this can be better replaced by a watch.
     print("Wait for the controller pod to be ready...")
-    pod_ready = False
-    for tick in range(600):
-        controller_pod = core_v1.list_namespaced_pod(
-            test_context.common_config.namespace,
-            watch=False,
-            label_selector="sievetag=" + controller,
-        ).items
-        if len(controller_pod) >= 1:
-            if controller_pod[0].status.phase == "Running":
-                pod_ready = True
-                break
-        time.sleep(1)
+
+    def controller_pod_ready(controller_pod):
+        return len(controller_pod) >= 1 and controller_pod[0].status.phase == "Running"
+
+    pod_ready = wait_until(
+        core_v1.list_namespaced_pod,
+        controller_pod_ready,
+        600,
+        "wait for controller pod",
+        namespace=test_context.common_config.namespace,
+        label_selector="sievetag=" + controller,
+    )
     if not pod_ready:
         fail("waiting for the controller pod to be ready")
         raise Exception("Wait timeout after 600 seconds")
@@ -431,7 +720,7 @@ def start_controller(test_context: TestContext):
     # side needs to talk to the Sieve server when certain changes happen to
     # the custom resource objects (depending on the test plan).
     apiserver_addr_list = []
-    apiserver_ports = get_apiserver_ports(num_apiservers)
+    apiserver_ports = get_apiserver_ports(test_context.cluster, num_apiservers)
     for port in apiserver_ports:
         apiserver_addr_list.append("https://127.0.0.1:" + port)
     for addr in apiserver_addr_list:
@@ -439,6 +728,27 @@ def start_controller(test_context: TestContext):
             os_system("kubectl get {} -s {} --ignore-not-found=true".format(crd, addr))
 
 
+def since_time_option(cluster: KindCluster):
+    # Only keep the apiserver logs of this test run when reusing the warm cluster.
+    if cluster.since_time is None:
+        return ""
+    return " --since-time={}".format(cluster.since_time)
+
+
+def write_warm_cluster_api_events(cluster: KindCluster, i, log_file):
+    """
+    When reusing the warm cluster, write the state changes logged by the i-th apiserver
+    before the first test run on the cluster to the apiserver log of this test run,
+    so the objects kept by the reset (e.g., configmap kube-root-ca.crt)
+    appear in the end state and the history as if the cluster was newly created.
+    """
+    if cluster.since_time is None:
+        return
+    state = json.load(open(warm_cluster_state_file(cluster)))
+    log_file.writelines(state["api_events"][i])
+    log_file.flush()
+
+
 def run_workload(
     test_context: TestContext,
 ):
@@ -457,7 +767,9 @@ def run_workload(
         else ""
     )
 
-    kubernetes.config.load_kube_config()
+    kubernetes.config.load_kube_config(
+        config_file=test_context.cluster.kubeconfig_path()
+    )
     pod_name = (
         kubernetes.client.CoreV1Api()
         .list_namespaced_pod(
@@ -494,8 +806,12 @@ def run_workload(
     streamed_api_server_log_file = open(
         os.path.join(test_context.result_dir, "apiserver1.log"), "w+"
     )
+    write_warm_cluster_api_events(test_context.cluster, 0, streamed_api_server_log_file)
     streaming_api_server = subprocess.Popen(
-        "kubectl logs kube-apiserver-kind-control-plane -n kube-system -f",
+        "kubectl logs {} -n kube-system -f{}".format(
+            test_context.cluster.apiserver_pod(),
+            since_time_option(test_context.cluster),
+        ),
         stdout=streamed_api_server_log_file,
         stderr=streamed_api_server_log_file,
         shell=True,
@@ -524,13 +840,18 @@ def run_workload(
 
     # Also save the log of other apiservers (for multi-apiserver set up) for debugging purpose.
     for i in range(1, test_context.num_apiservers):
-        apiserver_name = "kube-apiserver-kind-control-plane" + (
-            "" if i == 0 else str(i + 1)
-        )
+        apiserver_name = test_context.cluster.apiserver_pod(i)
         apiserver_log = "apiserver{}.log".format(str(i + 1))
+        with open(
+            os.path.join(test_context.result_dir, apiserver_log), "w"
+        ) as log_file:
+            write_warm_cluster_api_events(test_context.cluster, i, log_file)
         os_system(
-            "kubectl logs {} -n kube-system > {}/{}".format(
-                apiserver_name, test_context.result_dir, apiserver_log
+            "kubectl logs {} -n kube-system{} >> {}/{}".format(
+                apiserver_name,
+                since_time_option(test_context.cluster),
+                test_context.result_dir,
+                apiserver_log,
             )
         )
 
@@ -539,8 +860,8 @@ def run_workload(
     # which will be used to generate test plans.
     if test_context.mode != sieve_modes.VANILLA:
         os_system(
-            "docker cp kind-control-plane:/sieve_server/sieve-server.log {}/sieve-server.log".format(
-                test_context.result_dir
+            "docker cp {}:/sieve_server/sieve-server.log {}/sieve-server.log".format(
+                test_context.cluster.control_plane(), test_context.result_dir
             )
         )
 
@@ -561,7 +882,7 @@ def run_workload(
     streamed_api_server_log_file.close()
 
     if test_context.mode != sieve_modes.VANILLA:
-        stop_sieve_server()
+        stop_sieve_server(test_context.cluster)
 
 
 def save_history_and_end_state(test_context: TestContext):
@@ -572,10 +893,9 @@ def save_history_and_end_state(test_context: TestContext):
     (2) the entire history, including all the creation, deletion and update events, during the test workload,
     which is used for generating and applying differential oracles.
     (3) the end state after the test workload, which is used for generating and applying differential oracles.
+    All of them are generated in a single pass over the apiserver log.
     """
-    save_controller_related_object_list(test_context)
-    save_history(test_context)
-    save_state(test_context)
+    save_api_event_artifacts(test_context)
 
 
 def post_process(
@@ -600,26 +920,37 @@ def post_process(
         return test_result
 
 
-def teardown_cluster():
-    os_system("kind delete cluster")
+def teardown_cluster(cluster: KindCluster):
+    if cluster.warm:
+        print(
+            "Keeping the warm cluster {} for the next test run; delete it by: kind delete cluster {}".format(
+                cluster.name, cluster.kind_options()
+            )
+        )
+        return
+    os_system("kind delete cluster {}".format(cluster.kind_options()))
 
 
-def save_previous_learn_results(test_context: TestContext):
+def save_previous_learn_results(test_context: TestContext, learn_pass):
     """
-    Move the learn result to a differen folder.
+    Move the learn result of the learn_pass to a differen folder.
     This should be only called in learn mode with build_oracle enabled.
-    To build the differential oracles, we need to run the same workload twice
-    to eliminate the non-determinism from the end state and state updates.
+    To build the differential oracles, we need to run the same workload multiple times
+    (twice by default) to eliminate the non-determinism from the end state and state updates.
     """
     assert test_context.mode == sieve_modes.LEARN and test_context.build_oracle
     learn_res_dir = test_context.result_dir
-    learn_prev_res_dir = first_pass_learn_result_dir(test_context.result_dir)
+    learn_prev_res_dir = learn_pass_result_dir(
+        test_context.result_dir,
+        learn_pass,
+        test_context.common_config.oracle_learn_passes,
+    )
     assert os.path.isdir(
         learn_res_dir
-    ), "{} should exist after first pass of learn run".format(learn_res_dir)
+    ), "{} should exist after pass {} of learn run".format(learn_res_dir, learn_pass)
     print(
-        "Moving the first pass learn result from {} to {}...".format(
-            learn_res_dir, learn_prev_res_dir
+        "Moving the pass {} learn result from {} to {}...".format(
+            learn_pass, learn_res_dir, learn_prev_res_dir
         )
     )
     rmtree_if_exists(learn_prev_res_dir)
@@ -662,21 +993,36 @@ def run_test(test_context: TestContext) -> TestResult:
         prepare_test_plan(test_context)
         setup_cluster(test_context)
         run_workload(test_context)
-        teardown_cluster()
+        teardown_cluster(test_context.cluster)
         save_history_and_end_state(test_context)
         # if the build_oracle is enabled, then we need to run the learn run again
         # to eliminate nondeterminism in the end-state and state-update collected by Sieve
-        if test_context.mode == sieve_modes.LEARN and test_context.build_oracle:
+        if (
+            test_context.mode == sieve_modes.LEARN
+            and test_context.build_oracle
+            and test_context.learn_pass is None
+        ):
+            num_learn_passes = test_context.common_config.oracle_learn_passes
+            print(
+                "\nTo build the differential oracle, we need to run the learn run {} times".format(
+                    num_learn_passes
+                )
+            )
+            for learn_pass in range(2, num_learn_passes + 1):
+                print("Starting learn run pass {}...".format(learn_pass))
+                save_previous_learn_results(test_context, learn_pass - 1)
+                prepare_test_plan(test_context)
+                setup_cluster(test_context)
+                run_workload(test_context)
+                teardown_cluster(test_context.cluster)
+                save_history_and_end_state(test_context)
+        if test_context.learn_pass is not None:
             print(
-                "\nTo build the differential oracle, we need to run the learn run twice"
+                "Learn run pass {} is done, the oracle is built by --postprocess after all the passes are done".format(
+                    test_context.learn_pass
+                )
             )
-            print("Starting the second learn run...")
-            save_previous_learn_results(test_context)
-            prepare_test_plan(test_context)
-            setup_cluster(test_context)
-            run_workload(test_context)
-            teardown_cluster()
-            save_history_and_end_state(test_context)
+            return None
         return post_process(test_context)
     except Exception:
         print(traceback.format_exc())
@@ -697,6 +1043,9 @@ def create_plan_for_test_mode(test_context: TestContext):
     test_plan_content["annotatedReconcileStackFrame"] = [
         i for i in test_context.controller_config.annotated_reconcile_functions.values()
     ]
+    test_plan_content = test_context.cluster.customize_plan(
+        test_plan_content, test_context.common_config
+    )
     yaml.dump(test_plan_content, open(test_context.test_plan, "w"), sort_keys=False)
 
 
@@ -713,11 +1062,16 @@ def create_plan_for_learn_mode(test_context: TestContext):
     learn_plan_content["annotatedReconcileStackFrame"] = [
         i for i in test_context.controller_config.annotated_reconcile_functions.values()
     ]
+    learn_plan_content = test_context.cluster.customize_plan(
+        learn_plan_content, test_context.common_config
+    )
     yaml.dump(learn_plan_content, open(test_context.test_plan, "w"), sort_keys=False)
 
 
 def create_plan_for_vanilla_mode(test_context: TestContext):
-    vanilla_plan_content = {}
+    vanilla_plan_content = test_context.cluster.customize_plan(
+        {}, test_context.common_config
+    )
     yaml.dump(vanilla_plan_content, open(test_context.test_plan, "w"), sort_keys=False)
 
 
@@ -758,10 +1112,14 @@ def run(
     container_registry,
     postprocess,
     build_oracle,
+    cluster=None,
+    learn_pass=None,
 ):
     """
     Prepare the test context based on the input options and the configurations
     and start to run the test.
+    If learn_pass is set, only that pass of the learn run for building the oracle is run,
+    and its result goes to the result dir of the pass (see learn_pass_result_dir).
     """
     controller_config = load_controller_config(controller_config_dir)
     if test_workload is None:
@@ -796,8 +1154,23 @@ def run(
             mode,
         )
 
+    if learn_pass is not None:
+        result_dir = learn_pass_result_dir(
+            result_dir, learn_pass, common_config.oracle_learn_passes
+        )
+    elif mode == sieve_modes.LEARN and build_oracle and postprocess:
+        # the oracle is built from the results of all the passes
+        for i in range(1, common_config.oracle_learn_passes + 1):
+            learn_pass_dir = learn_pass_result_dir(
+                result_dir, i, common_config.oracle_learn_passes
+            )
+            assert os.path.isdir(
+                learn_pass_dir
+            ), "{} should exist after pass {} of learn run".format(learn_pass_dir, i)
+
     image_tag = mode
     test_plan_to_run = os.path.join(result_dir, os.path.basename(test_plan))
+    reset_wait_durations()
     # Prepare the context for testing the controller
     test_context = TestContext(
         controller=controller_config.controller_name,
@@ -818,11 +1191,72 @@ def run(
         use_csi_driver=use_csi_driver,
         common_config=common_config,
         controller_config=controller_config,
+        cluster=cluster,
+        learn_pass=learn_pass,
     )
+    if mode == sieve_modes.TEST:
+        record_test_plan_running(
+            result_root_dir,
+            controller_config.controller_name,
+            test_workload,
+            mode,
+            test_plan,
+        )
     test_result = run_test(test_context)
+    for phase in wait_durations:
+        print("{}: {:.3f} seconds".format(phase, wait_durations[phase]))
     return test_result, test_context
 
 
+# the cluster used by the current batch worker process
+batch_worker_cluster = None
+
+
+def batch_cluster(slot, warm):
+    name = "sieve-{}".format(slot)
+    cluster_dir = os.path.abspath(os.path.join(SIEVE_CLUSTERS_DIR, name))
+    return KindCluster(
+        name=name,
+        kubeconfig=os.path.join(cluster_dir, "kubeconfig"),
+        sieve_server_port=DEFAULT_SIEVE_SERVER_PORT + slot,
+        sieve_server_dir=os.path.join(cluster_dir, "sieve_server"),
+        warm=warm,
+    )
+
+
+def init_batch_worker(slots, warm):
+    """
+    Each batch worker takes a free slot and runs its test plans on the cluster of the slot.
+    The output of the worker goes to sieve.log under the cluster dir.
+    """
+    global batch_worker_cluster
+    batch_worker_cluster = batch_cluster(slots.get(), warm)
+    cluster_dir = os.path.dirname(batch_worker_cluster.kubeconfig)
+    os.makedirs(cluster_dir, exist_ok=True)
+    # kubectl, the deploy script and the test workload find the cluster by $KUBECONFIG
+    os.environ["KUBECONFIG"] = batch_worker_cluster.kubeconfig
+    log_file = open(os.path.join(cluster_dir, "sieve.log"), "a")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(log_file.fileno(), sys.stdout.fileno())
+    os.dup2(log_file.fileno(), sys.stderr.fileno())
+
+
+def run_batch_test_plan(args):
+    test_plan, run_args = args
+    start_time = time.time()
+    test_result, test_context = run(
+        *run_args[:4], test_plan, *run_args[4:], cluster=batch_worker_cluster
+    )
+    save_run_result(
+        test_context,
+        test_result,
+        start_time,
+    )
+    sys.stdout.flush()
+    return test_plan, batch_worker_cluster.name, time.time() - start_time
+
+
 def run_batch(
     controller,
     test_workload,
@@ -832,19 +1266,112 @@ def run_batch(
     docker,
     postprocess,
     build_oracle,
+    jobs=1,
+    warm_cluster=False,
+    time_budget=None,
+    rerun_finished=False,
 ):
     """
     Run multiple test plans in the test_plan_folder in a batch.
+    The test plans are run in the order of how likely they find bugs (see TestPlanQueue),
+    and no more test plans are started after time_budget seconds if time_budget is set.
+    If jobs > 1, the test plans are run by jobs worker processes at the same time,
+    each of which uses its own kind cluster (sieve-0, sieve-1, ...), kubeconfig and Sieve server port.
+    If warm_cluster is enabled, each cluster is reset and reused by the following test plans.
+    The test plans finished by earlier batches (according to the result database in dir)
+    are skipped unless rerun_finished is enabled, so an interrupted batch can be resumed.
     """
     assert mode == sieve_modes.TEST, "batch mode only allowed in test mode for now"
     assert os.path.isdir(test_plan_folder), "{} should be a folder".format(
         test_plan_folder
     )
     test_plans = glob.glob(os.path.join(test_plan_folder, "*.yaml"))
-    # test_plans.sort(key=lambda test_plan: test_plan.split("-")[-1].split(".")[0])
-    print("Test plans to run:")
-    print("\n".join(test_plans))
-    for test_plan in test_plans:
+    # only run one test plan of each group of equivalent test plans
+    test_plans = unique_test_plans(
+        test_plans, get_common_config().test_plan_dedup_enabled
+    )
+    controller_name = load_controller_config(controller).controller_name
+    if not rerun_finished:
+        finished = finished_test_plans(dir, controller_name)
+        for test_plan in test_plans:
+            if normalize_test_plan(test_plan) in finished:
+                print("Skip {} as it is already finished".format(test_plan))
+        test_plans = [
+            test_plan
+            for test_plan in test_plans
+            if normalize_test_plan(test_plan) not in finished
+        ]
+    queue_test_plans(
+        dir,
+        controller_name,
+        {
+            test_plan: test_workload
+            if test_workload is not None
+            else get_test_workload_from_test_plan(test_plan)
+            for test_plan in test_plans
+        },
+        mode,
+    )
+    test_plan_queue = TestPlanQueue(test_plans, dir, time_budget, jobs)
+    print("Test plans to run (with scores):")
+    print(test_plan_queue.describe())
+    if jobs > 1 and not postprocess:
+        run_args = (
+            controller,
+            test_workload,
+            dir,
+            mode,
+            docker,
+            postprocess,
+            build_oracle,
+        )
+        context = multiprocessing.get_context("fork")
+        slots = context.Queue()
+        for slot in range(jobs):
+            slots.put(slot)
+        with context.Pool(jobs, init_batch_worker, (slots, warm_cluster)) as pool:
+            # hand a test plan to the pool only when a worker becomes free,
+            # so the time budget of the queue is checked when each test plan starts
+            results = queue.Queue()
+            pending = iter(test_plan_queue)
+
+            def submit_next():
+                test_plan = next(pending, None)
+                if test_plan is None:
+                    return False
+                pool.apply_async(
+                    run_batch_test_plan,
+                    ((test_plan, run_args),),
+                    callback=results.put,
+                    error_callback=results.put,
+                )
+                return True
+
+            in_flight = 0
+            while in_flight < jobs and submit_next():
+                in_flight += 1
+            finished = 0
+            while in_flight > 0:
+                result = results.get()
+                in_flight -= 1
+                if isinstance(result, BaseException):
+                    raise result
+                if submit_next():
+                    in_flight += 1
+                test_plan, cluster_name, duration = result
+                finished += 1
+                print(
+                    "[{}/{}] {} finished on cluster {} in {:.1f} seconds".format(
+                        finished,
+                        len(test_plan_queue),
+                        test_plan,
+                        cluster_name,
+                        duration,
+                    )
+                )
+        return
+    cluster = KindCluster(warm=warm_cluster)
+    for test_plan in test_plan_queue:
         start_time = time.time()
         test_result, test_context = run(
             controller,
@@ -855,6 +1382,7 @@ def run_batch(
             docker,
             postprocess,
             build_oracle,
+            cluster,
         )
         save_run_result(
             test_context,
@@ -919,6 +1447,49 @@ if __name__ == "__main__":
         help="batch mode or not",
         default=False,
     )
+    parser.add_option(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        help="run JOBS test plans at the same time in batch mode",
+        metavar="JOBS",
+        default="1",
+    )
+    parser.add_option(
+        "--warm-cluster",
+        dest="warm_cluster",
+        action="store_true",
+        help="keep the kind cluster after the run and reset it for the next run instead of recreating it",
+        default=False,
+    )
+    parser.add_option(
+        "--learn-pass",
+        dest="learn_pass",
+        help="only run PASS (from 1 to oracle_learn_passes) of the learn run when building the oracle, and build the oracle by --postprocess after all the passes are done",
+        metavar="PASS",
+        default=None,
+    )
+    parser.add_option(
+        "--cluster-slot",
+        dest="cluster_slot",
+        help="run on the cluster of SLOT (sieve-SLOT) instead of the default kind cluster, so multiple single runs can share the host",
+        metavar="SLOT",
+        default=None,
+    )
+    parser.add_option(
+        "--time-budget",
+        dest="time_budget",
+        help="do not start more test plans after SECONDS in batch mode",
+        metavar="SECONDS",
+        default=None,
+    )
+    parser.add_option(
+        "--rerun-finished",
+        dest="rerun_finished",
+        action="store_true",
+        help="also run the test plans already finished by earlier batches in batch mode",
+        default=False,
+    )
     parser.add_option(
         "--postprocess",
         dest="postprocess",
@@ -930,7 +1501,7 @@ if __name__ == "__main__":
         "--build-oracle",
         dest="build_oracle",
         action="store_true",
-        help="build the oracle by running learn twice",
+        help="build the oracle by running learn multiple times (oracle_learn_passes in config.json)",
         default=False,
     )
 
@@ -960,10 +1531,22 @@ if __name__ == "__main__":
     if options.mode != sieve_modes.LEARN and options.build_oracle:
         parser.error("parameter build_oracle cannot be enabled when mode is not learn")
 
-    if options.postprocess and options.build_oracle:
-        parser.error(
-            "parameter postprocess cannot be enabled when build_oracle is enabled"
-        )
+    if options.batch and options.cluster_slot is not None:
+        parser.error("parameter cluster_slot cannot be enabled in batch mode")
+
+    if options.learn_pass is not None:
+        if not options.build_oracle:
+            parser.error("parameter learn_pass requires build_oracle")
+        if options.postprocess:
+            parser.error(
+                "parameter learn_pass cannot be enabled when postprocess is enabled"
+            )
+        if not 1 <= int(options.learn_pass) <= common_config.oracle_learn_passes:
+            parser.error(
+                "parameter learn_pass should be between 1 and {}".format(
+                    common_config.oracle_learn_passes
+                )
+            )
 
     print("Running Sieve with mode: {}...".format(options.mode))
 
@@ -977,8 +1560,19 @@ if __name__ == "__main__":
             options.registry,
             options.postprocess,
             options.build_oracle,
+            int(options.jobs),
+            options.warm_cluster,
+            None if options.time_budget is None else float(options.time_budget),
+            options.rerun_finished,
         )
     else:
+        if options.cluster_slot is None:
+            cluster = KindCluster(warm=options.warm_cluster)
+        else:
+            cluster = batch_cluster(int(options.cluster_slot), options.warm_cluster)
+            os.makedirs(os.path.dirname(cluster.kubeconfig), exist_ok=True)
+            # kubectl, the deploy script and the test workload find the cluster by $KUBECONFIG
+            os.environ["KUBECONFIG"] = cluster.kubeconfig
         test_result, test_context = run(
             options.controller_config_dir,
             options.test_workload,
@@ -988,6 +1582,8 @@ if __name__ == "__main__":
             options.registry,
             options.postprocess,
             options.build_oracle,
+            cluster,
+            None if options.learn_pass is None else int(options.learn_pass),
         )
 
         save_run_result(
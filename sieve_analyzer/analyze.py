@@ -1,6 +1,6 @@
-import copy
 import os
-from typing import List
+import multiprocessing
+from typing import Dict, List, Union
 from sieve_common.common import (
     TestContext,
     fail,
@@ -11,276 +11,420 @@ from sieve_perturbation_policies.intermediate_state import intermediate_state_an
 from sieve_perturbation_policies.stale_state import stale_state_analysis
 from sieve_perturbation_policies.unobserved_state import unobserved_state_analysis
 from sieve_common.k8s_event import *
+from sieve_common.artifact_cache import load_json_artifact
+from sieve_common.trace import SieveTrace, is_sieve_trace
+from sieve_common.test_plan import write_test_plan_manifest
 from sieve_analyzer.event_graph import (
+    ControllerHearIntervalIndex,
     EventGraph,
     EventVertex,
 )
 
 
-def sanity_check_sieve_server_log(path):
-    lines = open(path).readlines()
-    reconcile_status = {}
-    controller_write_status = {}
-    controller_hear_status = {}
-    for i in range(len(lines)):
-        line = lines[i]
-        if SIEVE_BEFORE_REST_WRITE_MARK in line:
-            controller_write_id = parse_controller_write_id_only(line).id
-            assert controller_write_id not in controller_write_status, line
-            controller_write_status[controller_write_id] = 1
-        elif SIEVE_AFTER_REST_WRITE_MARK in line:
-            controller_write_id = parse_controller_write_id_only(line).id
-            assert controller_write_id in controller_write_status, line
-            controller_write_status[controller_write_id] += 1
-        elif SIEVE_BEFORE_HEAR_MARK in line:
-            controller_hear_id = parse_controller_hear_id_only(line).id
-            assert controller_hear_id not in controller_hear_status, line
-            controller_hear_status[controller_hear_id] = 1
-        elif SIEVE_AFTER_HEAR_MARK in line:
-            controller_hear_id = parse_controller_hear_id_only(line).id
-            assert controller_hear_id in controller_hear_status, line
-            controller_hear_status[controller_hear_id] += 1
-        elif SIEVE_BEFORE_RECONCILE_MARK in line:
-            reconcile_fun = parse_reconcile(line).reconcile_fun
-            if reconcile_fun not in reconcile_status:
-                reconcile_status[reconcile_fun] = 0
-            reconcile_status[reconcile_fun] += 1
-            assert reconcile_status[reconcile_fun] == 1, line
-        elif SIEVE_AFTER_RECONCILE_MARK in line:
-            reconcile_fun = parse_reconcile(line).reconcile_fun
-            assert reconcile_fun in reconcile_status, line
-            reconcile_status[reconcile_fun] -= 1
-            assert reconcile_status[reconcile_fun] == 0, line
-    for key in controller_write_status:
-        assert controller_write_status[key] == 1 or controller_write_status[key] == 2
-    for key in controller_hear_status:
-        assert controller_hear_status[key] == 1 or controller_hear_status[key] == 2
-    for key in reconcile_status:
-        assert (
-            reconcile_status[reconcile_fun] == 0 or reconcile_status[reconcile_fun] == 1
-        )
-
-
-def parse_receiver_events(path):
-    # { controller_hear id -> controller_hear }
-    controller_hear_id_map = {}
-    # we need this map to later find the previous controller_hear for each crucial controller_hear
-    controller_hear_list = []
-    lines = open(path).readlines()
-    largest_timestamp = len(lines)
-    for i in range(len(lines)):
-        line = lines[i]
-        if SIEVE_BEFORE_HEAR_MARK in line:
-            controller_hear = parse_controller_hear(line)
-            controller_hear.start_timestamp = i
-            # We initially set the controller_hear end time as the largest timestamp
-            # so that if we never meet SIEVE_AFTER_HEAR_MARK for this controller_hear,
-            # we will not pose any constraint on its end time in range_overlap
+class SieveServerLogSanityChecker:
+    def __init__(self):
+        self.reconcile_status = {}
+        self.controller_write_status = {}
+        self.controller_hear_status = {}
+
+    def consume(self, timestamp: int, mark: str, event, line: str):
+        if mark == SIEVE_BEFORE_REST_WRITE_MARK:
+            assert event.id not in self.controller_write_status, line
+            self.controller_write_status[event.id] = 1
+        elif mark == SIEVE_AFTER_REST_WRITE_MARK:
+            assert event.id in self.controller_write_status, line
+            assert self.controller_write_status[event.id] == 1, line
+            self.controller_write_status[event.id] += 1
+        elif mark == SIEVE_BEFORE_HEAR_MARK:
+            assert event.id not in self.controller_hear_status, line
+            self.controller_hear_status[event.id] = 1
+        elif mark == SIEVE_AFTER_HEAR_MARK:
+            assert event.id in self.controller_hear_status, line
+            assert self.controller_hear_status[event.id] == 1, line
+            self.controller_hear_status[event.id] += 1
+        elif mark == SIEVE_BEFORE_RECONCILE_MARK:
+            reconcile_fun = event.reconcile_fun
+            if reconcile_fun not in self.reconcile_status:
+                self.reconcile_status[reconcile_fun] = 0
+            self.reconcile_status[reconcile_fun] += 1
+            assert self.reconcile_status[reconcile_fun] == 1, line
+        elif mark == SIEVE_AFTER_RECONCILE_MARK:
+            reconcile_fun = event.reconcile_fun
+            assert reconcile_fun in self.reconcile_status, line
+            self.reconcile_status[reconcile_fun] -= 1
+            assert self.reconcile_status[reconcile_fun] == 0, line
+
+    def finish(self, largest_timestamp: int):
+        for key in self.reconcile_status:
+            assert self.reconcile_status[key] == 0 or self.reconcile_status[key] == 1
+
+
+class ControllerHearCollector:
+    def __init__(self):
+        # we need this list to later find the previous controller_hear for each crucial controller_hear
+        self.controller_hear_list = []
+        # { controller_hear id -> controller_hear } for the hears not finished yet
+        self.ongoing_controller_hears = {}
+
+    def consume(self, timestamp: int, mark: str, event, line: str):
+        if mark == SIEVE_BEFORE_HEAR_MARK:
+            controller_hear = event
+            controller_hear.start_timestamp = timestamp
+            self.ongoing_controller_hears[controller_hear.id] = controller_hear
+            self.controller_hear_list.append(controller_hear)
+        elif mark == SIEVE_AFTER_HEAR_MARK:
+            controller_hear = self.ongoing_controller_hears.pop(event.id)
+            controller_hear.end_timestamp = timestamp
+
+    def finish(self, largest_timestamp: int):
+        # If we never meet SIEVE_AFTER_HEAR_MARK for a controller_hear,
+        # we set its end time as the largest timestamp
+        # so that we will not pose any constraint on its end time in range_overlap
+        for controller_hear in self.ongoing_controller_hears.values():
             controller_hear.end_timestamp = largest_timestamp
-            controller_hear_id_map[controller_hear.id] = controller_hear
-        elif SIEVE_AFTER_HEAR_MARK in line:
-            controller_hear_id_only = parse_controller_hear_id_only(line)
-            controller_hear_id_map[controller_hear_id_only.id].end_timestamp = i
-    for i in range(len(lines)):
-        line = lines[i]
-        if SIEVE_BEFORE_HEAR_MARK in line:
-            controller_hear = parse_controller_hear(line)
-            controller_hear_list.append(controller_hear_id_map[controller_hear.id])
-    return controller_hear_list
+        self.ongoing_controller_hears = {}
 
 
-def parse_reconciler_events(test_context: TestContext, path):
-    controller_write_start_timestamp_map = {}
-    controller_nk_write_start_timestamp_map = {}
-    read_types_this_reconcile = set()
-    read_keys_this_reconcile = set()
-    prev_reconcile_per_type = {}
-    cur_reconcile_per_type = {}
-    cur_reconcile_is_trivial = {}
-    ts_to_event_map = {}
-    # there could be multiple controllers running concurrently
-    # we need to record all the ongoing controllers
-    # there could be multiple workers running for a single controller
-    # so we need to count each worker for each controller
-    # ongoing_reconcile = { reconcile_fun -> number of ongoing workers for this controller }
-    ongoing_reconciles = {}
-    lines = open(path).readlines()
-    for i in range(len(lines)):
-        line = lines[i]
-        if SIEVE_BEFORE_REST_WRITE_MARK in line:
-            controller_write_id_only = parse_controller_write_id_only(line)
-            controller_write_start_timestamp_map[controller_write_id_only.id] = i
-        elif SIEVE_AFTER_REST_WRITE_MARK in line:
-            for key in cur_reconcile_is_trivial:
-                cur_reconcile_is_trivial[key] = False
+class ReconcilerEventCollector:
+    def __init__(self, test_context: TestContext):
+        self.loosen_reconciler_boundary = (
+            test_context.controller_config.loosen_reconciler_boundary
+        )
+        self.compress_trivial_reconcile_enabled = (
+            test_context.common_config.compress_trivial_reconcile_enabled
+        )
+        self.controller_write_start_timestamp_map = {}
+        self.controller_nk_write_start_timestamp_map = {}
+        self.read_types_this_reconcile = set()
+        self.read_keys_this_reconcile = set()
+        self.prev_reconcile_per_type = {}
+        self.cur_reconcile_per_type = {}
+        self.cur_reconcile_is_trivial = {}
+        self.ts_to_event_map = {}
+        # there could be multiple controllers running concurrently
+        # we need to record all the ongoing controllers
+        # there could be multiple workers running for a single controller
+        # so we need to count each worker for each controller
+        # ongoing_reconcile = { reconcile_fun -> number of ongoing workers for this controller }
+        self.ongoing_reconciles = {}
+        self.reconciler_event_list = []
+
+    def set_reconcile_range(
+        self, event: Union[ControllerWrite, ControllerNonK8sWrite], timestamp: int
+    ):
+        prev_reconcile = self.prev_reconcile_per_type[event.reconcile_fun]
+        cur_reconcile = self.cur_reconcile_per_type[event.reconcile_fun]
+        earliest_timestamp = -1
+        if prev_reconcile is not None:
+            earliest_timestamp = prev_reconcile.end_timestamp
+        event.set_range(earliest_timestamp, timestamp)
+        event.reconcile_id = cur_reconcile.reconcile_id
+
+    def consume(self, timestamp: int, mark: str, event, line: str):
+        if mark == SIEVE_BEFORE_REST_WRITE_MARK:
+            self.controller_write_start_timestamp_map[event.id] = timestamp
+        elif mark == SIEVE_AFTER_REST_WRITE_MARK:
+            for key in self.cur_reconcile_is_trivial:
+                self.cur_reconcile_is_trivial[key] = False
             # If we have not met any reconcile yet, skip the controller_write since it is not caused by reconcile
             # though it should not happen at all.
             # TODO: handle the writes that are not in any reconcile
-            controller_write = parse_controller_write(line)
-            if controller_write.reconcile_fun not in cur_reconcile_per_type:
-                if not test_context.controller_config.loosen_reconciler_boundary:
-                    continue
-            # Do deepcopy here to ensure the later changes to the two sets
+            controller_write = event
+            if controller_write.reconcile_fun not in self.cur_reconcile_per_type:
+                if not self.loosen_reconciler_boundary:
+                    self.controller_write_start_timestamp_map.pop(
+                        controller_write.id, None
+                    )
+                    return
+            # Copy here to ensure the later changes to the two sets
             # will not affect this controller_write.
             # cache read during that possible interval
-            controller_write.read_keys = copy.deepcopy(read_keys_this_reconcile)
-            controller_write.read_types = copy.deepcopy(read_types_this_reconcile)
-            controller_write.start_timestamp = controller_write_start_timestamp_map[
-                controller_write.id
-            ]
-            controller_write.end_timestamp = i
-            if controller_write.reconcile_fun in cur_reconcile_per_type:
-                prev_reconcile = prev_reconcile_per_type[controller_write.reconcile_fun]
-                cur_reconcile = cur_reconcile_per_type[controller_write.reconcile_fun]
-                earliest_timestamp = -1
-                if prev_reconcile is not None:
-                    earliest_timestamp = prev_reconcile.end_timestamp
-                controller_write.set_range(earliest_timestamp, i)
-                controller_write.reconcile_id = cur_reconcile.reconcile_id
-            ts_to_event_map[controller_write.start_timestamp] = controller_write
-        elif SIEVE_BEFORE_ANNOTATED_API_INVOCATION_MARK in line:
-            id_only = parse_controller_non_k8s_write_id_only(line)
-            controller_nk_write_start_timestamp_map[id_only.id] = i
-        elif SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK in line:
-            for key in cur_reconcile_is_trivial:
-                cur_reconcile_is_trivial[key] = False
-            controller_nk_write = parse_controller_non_k8s_write(line)
-            if controller_nk_write.reconcile_fun not in cur_reconcile_per_type:
-                if not test_context.controller_config.loosen_reconciler_boundary:
-                    continue
+            controller_write.read_keys = set(self.read_keys_this_reconcile)
+            controller_write.read_types = set(self.read_types_this_reconcile)
+            controller_write.start_timestamp = (
+                self.controller_write_start_timestamp_map.pop(controller_write.id)
+            )
+            controller_write.end_timestamp = timestamp
+            if controller_write.reconcile_fun in self.cur_reconcile_per_type:
+                self.set_reconcile_range(controller_write, timestamp)
+            self.ts_to_event_map[controller_write.start_timestamp] = controller_write
+        elif mark == SIEVE_BEFORE_ANNOTATED_API_INVOCATION_MARK:
+            self.controller_nk_write_start_timestamp_map[event.id] = timestamp
+        elif mark == SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK:
+            for key in self.cur_reconcile_is_trivial:
+                self.cur_reconcile_is_trivial[key] = False
+            controller_nk_write = event
+            if controller_nk_write.reconcile_fun not in self.cur_reconcile_per_type:
+                if not self.loosen_reconciler_boundary:
+                    self.controller_nk_write_start_timestamp_map.pop(
+                        controller_nk_write.id, None
+                    )
+                    return
             controller_nk_write.start_timestamp = (
-                controller_nk_write_start_timestamp_map[controller_nk_write.id]
+                self.controller_nk_write_start_timestamp_map.pop(controller_nk_write.id)
             )
-            controller_nk_write.end_timestamp = i
-            if controller_nk_write.reconcile_fun in cur_reconcile_per_type:
-                prev_reconcile = prev_reconcile_per_type[
-                    controller_nk_write.reconcile_fun
-                ]
-                cur_reconcile = cur_reconcile_per_type[
-                    controller_nk_write.reconcile_fun
-                ]
-                earliest_timestamp = -1
-                if prev_reconcile is not None:
-                    earliest_timestamp = prev_reconcile.end_timestamp
-                controller_nk_write.set_range(earliest_timestamp, i)
-                controller_nk_write.reconcile_id = cur_reconcile.reconcile_id
-            ts_to_event_map[controller_nk_write.start_timestamp] = controller_nk_write
+            controller_nk_write.end_timestamp = timestamp
+            if controller_nk_write.reconcile_fun in self.cur_reconcile_per_type:
+                self.set_reconcile_range(controller_nk_write, timestamp)
+            self.ts_to_event_map[
+                controller_nk_write.start_timestamp
+            ] = controller_nk_write
             print("nk write end")
-        elif SIEVE_AFTER_REST_READ_MARK in line:
+        elif mark == SIEVE_AFTER_REST_READ_MARK:
             # TODO: Consider rest read when calculating causality
-            controller_rest_read = parse_controller_read(line)
-            if controller_rest_read.reconcile_fun not in cur_reconcile_per_type:
-                continue
-            controller_rest_read.end_timestamp = i
-            cur_reconcile = cur_reconcile_per_type[controller_rest_read.reconcile_fun]
+            controller_rest_read = event
+            if controller_rest_read.reconcile_fun not in self.cur_reconcile_per_type:
+                return
+            controller_rest_read.end_timestamp = timestamp
+            cur_reconcile = self.cur_reconcile_per_type[
+                controller_rest_read.reconcile_fun
+            ]
             controller_rest_read.reconcile_id = cur_reconcile.reconcile_id
-            ts_to_event_map[controller_rest_read.end_timestamp] = controller_rest_read
-        elif SIEVE_AFTER_CACHE_READ_MARK in line:
-            controller_cache_read = parse_controller_cache_read(line)
-            if controller_cache_read.reconcile_fun not in cur_reconcile_per_type:
-                continue
-            controller_cache_read.end_timestamp = i
-            cur_reconcile = cur_reconcile_per_type[controller_cache_read.reconcile_fun]
+            self.ts_to_event_map[
+                controller_rest_read.end_timestamp
+            ] = controller_rest_read
+        elif mark == SIEVE_AFTER_CACHE_READ_MARK:
+            controller_cache_read = event
+            if controller_cache_read.reconcile_fun not in self.cur_reconcile_per_type:
+                return
+            controller_cache_read.end_timestamp = timestamp
+            cur_reconcile = self.cur_reconcile_per_type[
+                controller_cache_read.reconcile_fun
+            ]
             controller_cache_read.reconcile_id = cur_reconcile.reconcile_id
-            ts_to_event_map[controller_cache_read.end_timestamp] = controller_cache_read
+            self.ts_to_event_map[
+                controller_cache_read.end_timestamp
+            ] = controller_cache_read
             if controller_cache_read.etype == "Get":
-                read_keys_this_reconcile.update(controller_cache_read.key_set)
+                self.read_keys_this_reconcile.update(controller_cache_read.key_set)
             else:
-                read_types_this_reconcile.add(controller_cache_read.rtype)
-        elif SIEVE_BEFORE_RECONCILE_MARK in line:
-            reconcile_begin = parse_reconcile(line)
-            reconcile_begin.end_timestamp = i
-            ts_to_event_map[reconcile_begin.end_timestamp] = reconcile_begin
+                self.read_types_this_reconcile.add(controller_cache_read.rtype)
+        elif mark == SIEVE_BEFORE_RECONCILE_MARK:
+            reconcile_begin = event
+            reconcile_begin.end_timestamp = timestamp
+            self.ts_to_event_map[reconcile_begin.end_timestamp] = reconcile_begin
             reconcile_fun = reconcile_begin.reconcile_fun
-            if reconcile_fun not in ongoing_reconciles:
-                ongoing_reconciles[reconcile_fun] = 1
+            if reconcile_fun not in self.ongoing_reconciles:
+                self.ongoing_reconciles[reconcile_fun] = 1
             else:
-                ongoing_reconciles[reconcile_fun] += 1
+                self.ongoing_reconciles[reconcile_fun] += 1
             # NOTE: We assume there is only one worker for each reconciler here
-            assert ongoing_reconciles[reconcile_fun] == 1
-            if reconcile_fun not in cur_reconcile_per_type:
-                prev_reconcile_per_type[reconcile_fun] = None
-                cur_reconcile_per_type[reconcile_fun] = reconcile_begin
+            assert self.ongoing_reconciles[reconcile_fun] == 1
+            if reconcile_fun not in self.cur_reconcile_per_type:
+                self.prev_reconcile_per_type[reconcile_fun] = None
+                self.cur_reconcile_per_type[reconcile_fun] = reconcile_begin
             else:
-                if not test_context.common_config.compress_trivial_reconcile_enabled:
-                    prev_reconcile_per_type[reconcile_fun] = cur_reconcile_per_type[
+                if not self.compress_trivial_reconcile_enabled:
+                    self.prev_reconcile_per_type[
                         reconcile_fun
-                    ]
-                    cur_reconcile_per_type[reconcile_fun] = reconcile_begin
+                    ] = self.cur_reconcile_per_type[reconcile_fun]
+                    self.cur_reconcile_per_type[reconcile_fun] = reconcile_begin
                 elif (
-                    test_context.common_config.compress_trivial_reconcile_enabled
-                    and not cur_reconcile_is_trivial[reconcile_fun]
+                    self.compress_trivial_reconcile_enabled
+                    and not self.cur_reconcile_is_trivial[reconcile_fun]
                 ):
-                    prev_reconcile_per_type[reconcile_fun] = cur_reconcile_per_type[
+                    self.prev_reconcile_per_type[
                         reconcile_fun
-                    ]
-                    cur_reconcile_per_type[reconcile_fun] = reconcile_begin
-            cur_reconcile_is_trivial[reconcile_fun] = True
-        elif SIEVE_AFTER_RECONCILE_MARK in line:
-            reconcile_end = parse_reconcile(line)
-            reconcile_end.end_timestamp = i
-            ts_to_event_map[reconcile_end.end_timestamp] = reconcile_end
+                    ] = self.cur_reconcile_per_type[reconcile_fun]
+                    self.cur_reconcile_per_type[reconcile_fun] = reconcile_begin
+            self.cur_reconcile_is_trivial[reconcile_fun] = True
+        elif mark == SIEVE_AFTER_RECONCILE_MARK:
+            reconcile_end = event
+            reconcile_end.end_timestamp = timestamp
+            self.ts_to_event_map[reconcile_end.end_timestamp] = reconcile_end
             reconcile_fun = reconcile_end.reconcile_fun
-            ongoing_reconciles[reconcile_fun] -= 1
-            if ongoing_reconciles[reconcile_fun] == 0:
-                del ongoing_reconciles[reconcile_fun]
+            self.ongoing_reconciles[reconcile_fun] -= 1
+            if self.ongoing_reconciles[reconcile_fun] == 0:
+                del self.ongoing_reconciles[reconcile_fun]
             # Clear the read keys and types set since all the ongoing reconciles are done
-            if len(ongoing_reconciles) == 0:
-                read_keys_this_reconcile = set()
-                read_types_this_reconcile = set()
-    reconciler_event_list = [event for ts, event in sorted(ts_to_event_map.items())]
-    return reconciler_event_list
+            if len(self.ongoing_reconciles) == 0:
+                self.read_keys_this_reconcile = set()
+                self.read_types_this_reconcile = set()
+
+    def finish(self, largest_timestamp: int):
+        # writes are indexed by their start timestamps but collected at their end,
+        # so the events need to be sorted by timestamp at the end
+        self.reconciler_event_list = [
+            event for ts, event in sorted(self.ts_to_event_map.items())
+        ]
+        self.ts_to_event_map = {}
+
+
+def stream_sieve_trace(path, consumers, parsers=sieve_server_log_parsers):
+    """
+    Feed each event recorded in the binary trace to all the consumers,
+    the same as streaming the sieve server log the trace is converted from.
+    """
+    trace = SieveTrace(path)
+    try:
+        for i in range(len(trace)):
+            mark = trace.mark(i)
+            if mark not in parsers:
+                continue
+            timestamp = trace.timestamp(i)
+            event = trace.event(i, parsers[mark])
+            line = "{} at {} of {}".format(mark, timestamp, path)
+            for consumer in consumers:
+                consumer.consume(timestamp, mark, event, line)
+        largest_timestamp = trace.largest_timestamp
+    finally:
+        trace.close()
+    for consumer in consumers:
+        consumer.finish(largest_timestamp)
+
+
+def stream_sieve_server_log(path, consumers, parsers=sieve_server_log_parsers):
+    """
+    Read the sieve server log once and feed each parsed event to all the consumers.
+    Each line is parsed (at most) once regardless of the number of consumers,
+    and the timestamp of each event is the index of its line in the log.
+    The path can also be a binary trace converted from the log.
+    """
+    if is_sieve_trace(path):
+        stream_sieve_trace(path, consumers, parsers)
+        return
+    largest_timestamp = 0
+    with open(path) as log_file:
+        for timestamp, line in enumerate(log_file):
+            largest_timestamp = timestamp + 1
+            mark = extract_sieve_mark(line)
+            if mark not in parsers:
+                continue
+            event = parsers[mark](line)
+            for consumer in consumers:
+                consumer.consume(timestamp, mark, event, line)
+    for consumer in consumers:
+        consumer.finish(largest_timestamp)
+
+
+def sanity_check_sieve_server_log(path):
+    stream_sieve_server_log(
+        path, [SieveServerLogSanityChecker()], sieve_server_log_id_only_parsers
+    )
+
+
+def parse_receiver_events(path):
+    controller_hear_collector = ControllerHearCollector()
+    stream_sieve_server_log(path, [controller_hear_collector])
+    return controller_hear_collector.controller_hear_list
+
+
+def parse_reconciler_events(test_context: TestContext, path):
+    reconciler_event_collector = ReconcilerEventCollector(test_context)
+    stream_sieve_server_log(path, [reconciler_event_collector])
+    return reconciler_event_collector.reconciler_event_list
+
+
+def parse_sieve_server_log(test_context: TestContext, path):
+    """
+    Sanity check the sieve server log and collect the controller hears
+    and the reconciler events in a single pass.
+    """
+    controller_hear_collector = ControllerHearCollector()
+    reconciler_event_collector = ReconcilerEventCollector(test_context)
+    stream_sieve_server_log(
+        path,
+        [
+            SieveServerLogSanityChecker(),
+            controller_hear_collector,
+            reconciler_event_collector,
+        ],
+    )
+    return (
+        controller_hear_collector.controller_hear_list,
+        reconciler_event_collector.reconciler_event_list,
+    )
+
+
+def group_controller_hear_vertices(
+    controller_hear_vertices: List[EventVertex], group_by
+) -> Dict[str, List[EventVertex]]:
+    # each group preserves the start_timestamp order of controller_hear_vertices
+    groups = {}
+    for controller_hear_vertex in controller_hear_vertices:
+        group = group_by(controller_hear_vertex.content)
+        if group not in groups:
+            groups[group] = []
+        groups[group].append(controller_hear_vertex)
+    return groups
 
 
 def base_pass(
     controller_hear_vertices: List[EventVertex],
     controller_write_vertices: List[EventVertex],
     controller_non_k8s_write_vertices: List[EventVertex],
+    hear_read_overlap_filtering=False,
 ):
+    """
+    Pair each controller_write with the controller_hears that can lead to it, i.e.,
+    the hears that start before the write and end after the write's reconcile range starts.
+    The candidate hears for each write come from an interval index over the hears
+    instead of checking every <hear, write> combination.
+    If hear_read_overlap_filtering is enabled, a controller_write is only paired with
+    the hears on the keys or types read in its reconcile, so the pairs to be pruned
+    by the hear-read-overlap-filtering pass are never built.
+    """
     print("Running base pass...")
+    if hear_read_overlap_filtering:
+        print("Running optional pass: hear-read-overlap-filtering...")
     vertex_pairs = []
+    hear_index = ControllerHearIntervalIndex(controller_hear_vertices)
+    hear_index_per_key = {}
+    hear_index_per_type = {}
+    if hear_read_overlap_filtering:
+        for key, vertices in group_controller_hear_vertices(
+            controller_hear_vertices, lambda hear: hear.key
+        ).items():
+            hear_index_per_key[key] = ControllerHearIntervalIndex(vertices)
+        for rtype, vertices in group_controller_hear_vertices(
+            controller_hear_vertices, lambda hear: hear.rtype
+        ).items():
+            hear_index_per_type[rtype] = ControllerHearIntervalIndex(vertices)
     write_vertices = controller_write_vertices + controller_non_k8s_write_vertices
     for controller_write_vertex in write_vertices:
-        for controller_hear_vertex in controller_hear_vertices:
-            if controller_write_vertex.content.reconcile_id == -1:
-                continue
-            # controller_hears can lead to that controller_write
-            hear_within_reconcile_scope = (
-                controller_write_vertex.content.range_start_timestamp
-                < controller_hear_vertex.content.end_timestamp
+        controller_write = controller_write_vertex.content
+        if controller_write.reconcile_id == -1:
+            continue
+        # controller_hears can lead to that controller_write if
+        # (1) hear_within_reconcile_scope: write.range_start_timestamp < hear.end_timestamp
+        # (2) write_after_hear: write.start_timestamp > hear.start_timestamp
+        if (
+            hear_read_overlap_filtering
+            and controller_write_vertex.is_controller_write()
+        ):
+            matched_hear_vertices = {}
+            matched_indices = [
+                hear_index_per_key[key]
+                for key in controller_write.read_keys
+                if key in hear_index_per_key
+            ] + [
+                hear_index_per_type[rtype]
+                for rtype in controller_write.read_types
+                if rtype in hear_index_per_type
+            ]
+            for index in matched_indices:
+                for controller_hear_vertex in index.overlapping(
+                    controller_write.range_start_timestamp,
+                    controller_write.start_timestamp,
+                ):
+                    matched_hear_vertices[
+                        controller_hear_vertex.gid
+                    ] = controller_hear_vertex
+            controller_hear_candidates = sorted(
+                matched_hear_vertices.values(),
+                key=lambda vertex: vertex.content.start_timestamp,
             )
-            write_after_hear = (
-                controller_write_vertex.content.start_timestamp
-                > controller_hear_vertex.content.start_timestamp
+        else:
+            controller_hear_candidates = hear_index.overlapping(
+                controller_write.range_start_timestamp,
+                controller_write.start_timestamp,
             )
-            if hear_within_reconcile_scope and write_after_hear:
-                vertex_pairs.append([controller_hear_vertex, controller_write_vertex])
+        for controller_hear_vertex in controller_hear_candidates:
+            vertex_pairs.append([controller_hear_vertex, controller_write_vertex])
+    print("<e, s> pairs: {}".format(len(vertex_pairs)))
     return vertex_pairs
 
 
-def hear_read_overlap_filtering_pass(vertex_pairs: List[List[EventVertex]]):
-    print("Running optional pass: hear-read-overlap-filtering...")
-    pruned_vertex_pairs = []
-    for pair in vertex_pairs:
-        controller_hear_vertex = pair[0]
-        controller_write_vertex = pair[1]
-        if controller_write_vertex.is_controller_write():
-            key_match = (
-                controller_hear_vertex.content.key
-                in controller_write_vertex.content.read_keys
-            )
-            type_match = (
-                controller_hear_vertex.content.rtype
-                in controller_write_vertex.content.read_types
-            )
-            if key_match or type_match:
-                pruned_vertex_pairs.append(pair)
-        else:
-            pruned_vertex_pairs.append(pair)
-    print("<e, s> pairs: {} -> {}".format(len(vertex_pairs), len(pruned_vertex_pairs)))
-    return pruned_vertex_pairs
-
-
 def error_msg_filtering_pass(vertex_pairs: List[List[EventVertex]]):
     print("Running optional pass: error-message-filtering...")
     pruned_vertex_pairs = []
@@ -303,9 +447,8 @@ def generate_hear_write_pairs(event_graph: EventGraph):
         controller_hear_vertices,
         controller_write_vertices,
         controller_non_k8s_write_vertices,
+        HEAR_READ_FILTER_FLAG,
     )
-    if HEAR_READ_FILTER_FLAG:
-        vertex_pairs = hear_read_overlap_filtering_pass(vertex_pairs)
     return vertex_pairs
 
 
@@ -335,10 +478,11 @@ def generate_write_hear_pairs(event_graph: EventGraph):
 
 
 def build_controller_event_graph(test_context: TestContext, log_path, oracle_dir):
-    learned_masked_paths = json.load(open(os.path.join(oracle_dir, "mask.json")))
+    learned_masked_paths = load_json_artifact(os.path.join(oracle_dir, "mask.json"))
 
-    controller_hear_list = parse_receiver_events(log_path)
-    reconciler_event_list = parse_reconciler_events(test_context, log_path)
+    controller_hear_list, reconciler_event_list = parse_sieve_server_log(
+        test_context, log_path
+    )
 
     event_graph = EventGraph(
         learned_masked_paths,
@@ -382,6 +526,36 @@ def generate_test_plans(
         )
 
 
+# the event graph shared with the forked processes generating test plans
+# it is only set while the processes are running
+shared_event_graph = None
+shared_test_context = None
+
+
+def generate_test_plans_with_shared_event_graph(analysis_mode):
+    return generate_test_plans(shared_test_context, analysis_mode, shared_event_graph)
+
+
+def generate_test_plans_in_parallel(
+    test_context: TestContext, analysis_modes, event_graph: EventGraph
+):
+    """
+    Run the analysis modes concurrently in forked processes.
+    The analysis only reads the event graph and writes test plans to separate dirs,
+    so each forked process can share the same event graph copy-on-write
+    instead of receiving a serialized copy.
+    """
+    global shared_event_graph, shared_test_context
+    shared_event_graph = event_graph
+    shared_test_context = test_context
+    try:
+        with multiprocessing.get_context("fork").Pool(len(analysis_modes)) as pool:
+            return pool.map(generate_test_plans_with_shared_event_graph, analysis_modes)
+    finally:
+        shared_event_graph = None
+        shared_test_context = None
+
+
 def generate_test_plans_from_learn_run(
     test_context: TestContext,
 ):
@@ -389,29 +563,49 @@ def generate_test_plans_from_learn_run(
     oracle_dir = test_context.oracle_dir
 
     log_path = os.path.join(log_dir, "sieve-server.log")
-    print("Sanity checking the sieve log {}...".format(log_path))
-    sanity_check_sieve_server_log(log_path)
-
+    trace_path = os.path.join(log_dir, "sieve-server.trace")
+    # use the trace unless the log is rewritten after the trace is converted
+    if os.path.exists(trace_path) and (
+        not os.path.exists(log_path)
+        or os.path.getmtime(trace_path) >= os.path.getmtime(log_path)
+    ):
+        log_path = trace_path
     assert os.path.exists(
         os.path.join(oracle_dir, "mask.json")
     ), "cannot find mask.json"
 
+    print("Parsing and sanity checking the sieve log {}...".format(log_path))
     event_graph = build_controller_event_graph(test_context, log_path, oracle_dir)
     sieve_learn_result = {
         "controller": test_context.controller,
         "test": test_context.test_workload,
     }
-    for analysis_mode in [
+    analysis_modes = [
         sieve_built_in_test_patterns.STALE_STATE,
         sieve_built_in_test_patterns.UNOBSERVED_STATE,
         sieve_built_in_test_patterns.INTERMEDIATE_STATE,
-    ]:
+    ]
+    if (
+        test_context.common_config.parallel_test_plan_generation_enabled
+        and "fork" in multiprocessing.get_all_start_methods()
+    ):
+        print("Generating test plans for {} in parallel...".format(analysis_modes))
+        spec_numbers = generate_test_plans_in_parallel(
+            test_context, analysis_modes, event_graph
+        )
+    else:
+        spec_numbers = [
+            generate_test_plans(test_context, analysis_mode, event_graph)
+            for analysis_mode in analysis_modes
+        ]
+    for i in range(len(analysis_modes)):
+        analysis_mode = analysis_modes[i]
         (
             baseline_spec_number,
             after_p1_spec_number,
             after_p2_spec_number,
             final_spec_number,
-        ) = generate_test_plans(test_context, analysis_mode, event_graph)
+        ) = spec_numbers[i]
         sieve_learn_result[analysis_mode] = {
             "baseline": baseline_spec_number,
             "after_p1": after_p1_spec_number,
@@ -430,3 +624,13 @@ def generate_test_plans_from_learn_run(
             test_result_json,
             indent=4,
         )
+
+    if (
+        test_context.common_config.test_plan_dedup_enabled
+        and test_context.common_config.persist_test_plans_enabled
+    ):
+        # the manifest covers the test plans generated by all the workloads of the controller
+        write_test_plan_manifest(
+            os.path.join(test_context.result_root_dir, test_context.controller),
+            test_context.common_config.test_plan_dedup_across_workloads_enabled,
+        )
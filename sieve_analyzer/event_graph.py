@@ -1,3 +1,5 @@
+import bisect
+from collections import deque
 from typing import Dict, List, Optional, Set, Tuple, Union
 from sieve_common.k8s_event import (
     ControllerHear,
@@ -6,14 +8,19 @@ from sieve_common.k8s_event import (
     ControllerRead,
     ReconcileBegin,
     ReconcileEnd,
+    ControllerHearTypes,
     EVENT_NONE_TYPE,
     generate_key,
     get_event_signature,
-    conflicting_event,
     get_mask_by_resource_key,
     parse_key,
 )
-from sieve_common.event_delta import diff_event
+from sieve_common.event_delta import (
+    diff_event,
+    canonicalized_event,
+    get_event_shape_by_path,
+    part_of_event_constraints,
+)
 
 INTER_RECONCILER_EDGE = "INTER-RECONCILER"
 INTRA_RECONCILER_EDGE = "INTRA-RECONCILER"
@@ -36,6 +43,7 @@ class EventVertex:
         self.__content = content
         self.__out_inter_reconciler_edges = []
         self.__out_intra_reconciler_edges = []
+        self.__out_inter_reconciler_sink_gids = set()
 
     @property
     def gid(self):
@@ -53,8 +61,13 @@ class EventVertex:
     def out_intra_reconciler_edges(self) -> List:
         return self.__out_intra_reconciler_edges
 
+    @property
+    def out_inter_reconciler_sink_gids(self) -> Set[int]:
+        return self.__out_inter_reconciler_sink_gids
+
     def add_out_inter_reconciler_edge(self, edge):
         self.out_inter_reconciler_edges.append(edge)
+        self.out_inter_reconciler_sink_gids.add(edge.sink.gid)
 
     def add_out_intra_reconciler_edge(self, edge):
         self.out_intra_reconciler_edges.append(edge)
@@ -97,6 +110,140 @@ class EventEdge:
         return self.__type
 
 
+class ControllerHearIntervalIndex:
+    """
+    Index over the [start_timestamp, end_timestamp] intervals of controller hears.
+    The hear vertices must be sorted by start_timestamp (as in the event graph).
+    It is a segment tree keeping the max end_timestamp of each range of hears,
+    so finding all the hears that start before a timestamp and end after another
+    timestamp takes O((k + 1) * log(n)) instead of scanning all the n hears.
+    """
+
+    def __init__(self, controller_hear_vertices: List[EventVertex]):
+        self.__vertices = controller_hear_vertices
+        self.__start_timestamps = [
+            vertex.content.start_timestamp for vertex in controller_hear_vertices
+        ]
+        self.__size = 1
+        while self.__size < len(controller_hear_vertices):
+            self.__size *= 2
+        self.__max_end_timestamps = [float("-inf")] * (2 * self.__size)
+        for i in range(len(controller_hear_vertices)):
+            self.__max_end_timestamps[self.__size + i] = controller_hear_vertices[
+                i
+            ].content.end_timestamp
+        for node in range(self.__size - 1, 0, -1):
+            self.__max_end_timestamps[node] = max(
+                self.__max_end_timestamps[2 * node],
+                self.__max_end_timestamps[2 * node + 1],
+            )
+
+    def overlapping(self, end_after: int, start_before: int) -> List[EventVertex]:
+        """
+        Return the hear vertices with end_timestamp > end_after
+        and start_timestamp < start_before, sorted by start_timestamp.
+        """
+        upper = bisect.bisect_left(self.__start_timestamps, start_before)
+        found = []
+        # (node, first leaf covered by node, last leaf covered by node + 1)
+        stack = [(1, 0, self.__size)]
+        while len(stack) != 0:
+            node, lower_leaf, upper_leaf = stack.pop()
+            if lower_leaf >= upper or self.__max_end_timestamps[node] <= end_after:
+                continue
+            if node >= self.__size:
+                found.append(self.__vertices[node - self.__size])
+                continue
+            middle_leaf = (lower_leaf + upper_leaf) // 2
+            # push the right child first so that the left one is visited first
+            stack.append((2 * node + 1, middle_leaf, upper_leaf))
+            stack.append((2 * node, lower_leaf, middle_leaf))
+        return found
+
+
+class ControllerHearCancelIndex:
+    """
+    Find the later controller hears on the same key that conflict with a controller hear,
+    i.e., conflicting_event(vertices[i].content, vertices[j].content) for every j > i.
+    Each hear object is canonicalized only once, and the slim_cur_obj_map of each hear
+    is flattened into (path, shape) checks. For each path, the later hears are grouped
+    by their shape on that path into bitsets, so the conflicting hears of a slim object
+    are the union of a few bitsets instead of a rescan of all the later hears.
+    """
+
+    def __init__(
+        self,
+        controller_hear_vertices: List[EventVertex],
+        masked_keys: Set[str],
+        masked_paths: Set[str],
+    ):
+        self.__vertices = controller_hear_vertices
+        self.__masked_keys = masked_keys
+        self.__masked_paths = masked_paths
+        self.__canonicalized_obj_maps = {}
+        self.__path_to_shape_bitsets = {}
+        self.__deleted_bitset = 0
+        for j in range(len(controller_hear_vertices)):
+            if controller_hear_vertices[j].content.etype == ControllerHearTypes.DELETED:
+                self.__deleted_bitset |= 1 << j
+        self.__not_deleted_bitset = (
+            (1 << len(controller_hear_vertices)) - 1
+        ) & ~self.__deleted_bitset
+
+    def canonicalized_obj_map(self, j: int) -> Dict:
+        if j not in self.__canonicalized_obj_maps:
+            self.__canonicalized_obj_maps[j] = canonicalized_event(
+                self.__vertices[j].content.obj_map,
+                self.__masked_keys,
+                self.__masked_paths,
+            )
+        return self.__canonicalized_obj_maps[j]
+
+    def shape_bitsets(self, path: Tuple) -> Dict[Tuple, int]:
+        # group all the not deleted hears by their shape on the path
+        if path not in self.__path_to_shape_bitsets:
+            shape_bitsets = {}
+            for j in range(len(self.__vertices)):
+                if (self.__not_deleted_bitset >> j) & 1 == 0:
+                    continue
+                shape = get_event_shape_by_path(self.canonicalized_obj_map(j), path)
+                if shape not in shape_bitsets:
+                    shape_bitsets[shape] = 0
+                shape_bitsets[shape] |= 1 << j
+            self.__path_to_shape_bitsets[path] = shape_bitsets
+        return self.__path_to_shape_bitsets[path]
+
+    def conflicting_payload_bitset(self, slim_obj_map: Optional[Dict]) -> int:
+        # the not deleted hears whose canonicalized objects do not contain slim_obj_map
+        if slim_obj_map is None:
+            return 0
+        conflicting_bitset = 0
+        for path, shape in part_of_event_constraints(slim_obj_map):
+            shape_bitsets = self.shape_bitsets(path)
+            matched_bitset = shape_bitsets[shape] if shape in shape_bitsets else 0
+            conflicting_bitset |= self.__not_deleted_bitset & ~matched_bitset
+        return conflicting_bitset
+
+    def cancelled_by(self, i: int) -> Set[int]:
+        cur_controller_hear = self.__vertices[i].content
+        if cur_controller_hear.etype == ControllerHearTypes.DELETED:
+            conflicting_bitset = self.__not_deleted_bitset
+        else:
+            conflicting_bitset = (
+                self.__deleted_bitset
+                | self.conflicting_payload_bitset(cur_controller_hear.slim_cur_obj_map)
+            )
+        conflicting_bitset = (conflicting_bitset >> (i + 1)) << (i + 1)
+        cancelled_by = set()
+        # bin() reverses the bit order, so scan it from the end
+        bits = bin(conflicting_bitset)[:1:-1]
+        j = bits.find("1")
+        while j != -1:
+            cancelled_by.add(self.__vertices[j].content.id)
+            j = bits.find("1", j + 1)
+        return cancelled_by
+
+
 class EventGraph:
     def __init__(
         self,
@@ -121,6 +268,10 @@ class EventGraph:
         self.__controller_hear_controller_write_edges = []
         self.__controller_write_controller_hear_edges = []
         self.__intra_reconciler_edges = []
+        # built by the first reachable() query
+        self.__gid_to_reachability_bit = None
+        self.__gid_to_reachable_bitset = None
+        self.__resource_key_to_masked = {}
 
     @property
     def learned_masked_paths(self) -> Dict:
@@ -195,6 +346,13 @@ class EventGraph:
         return self.__intra_reconciler_edges
 
     def retrieve_masked(self, resource_key):
+        if resource_key not in self.__resource_key_to_masked:
+            self.__resource_key_to_masked[resource_key] = self.compute_masked(
+                resource_key
+            )
+        return self.__resource_key_to_masked[resource_key]
+
+    def compute_masked(self, resource_key):
         masked_keys = set()
         masked_keys.update(
             set(get_mask_by_resource_key(self.configured_masked_keys, resource_key))
@@ -505,31 +663,79 @@ class EventGraph:
 
     def compute_event_cancel(self):
         for key in self.controller_hear_key_to_vertices:
-            for i in range(len(self.controller_hear_key_to_vertices[key]) - 1):
-                cancelled_by = set()
-                cur_controller_hear = self.controller_hear_key_to_vertices[key][
-                    i
-                ].content
-                for j in range(i + 1, len(self.controller_hear_key_to_vertices[key])):
-                    future_controller_hear = self.controller_hear_key_to_vertices[key][
-                        j
-                    ].content
-                    # TODO: why do we always add the future_controller_hear when i == 0?
-                    if i == 0:
-                        cancelled_by.add(future_controller_hear.id)
-                        continue
-                    masked_keys, masked_paths = self.retrieve_masked(
-                        cur_controller_hear.key
+            vertices = self.controller_hear_key_to_vertices[key]
+            if len(vertices) <= 1:
+                continue
+            masked_keys, masked_paths = self.retrieve_masked(key)
+            cancel_index = ControllerHearCancelIndex(
+                vertices, masked_keys, masked_paths
+            )
+            for i in range(len(vertices) - 1):
+                cur_controller_hear = vertices[i].content
+                # TODO: why do we always add the future_controller_hear when i == 0?
+                if i == 0:
+                    cancelled_by = set(
+                        vertices[j].content.id for j in range(1, len(vertices))
                     )
-                    if conflicting_event(
-                        cur_controller_hear,
-                        future_controller_hear,
-                        masked_keys,
-                        masked_paths,
-                    ):
-                        cancelled_by.add(future_controller_hear.id)
+                else:
+                    cancelled_by = cancel_index.cancelled_by(i)
                 cur_controller_hear.cancelled_by = cancelled_by
 
+    def build_reachability_index(self):
+        """
+        Build the transitive closure of the inter-reconciler edges as one bitset per vertex.
+        Every inter-reconciler edge goes from an earlier event to a later one,
+        so visiting the vertices from the latest to the earliest is a reverse topological order
+        and each vertex's bitset is its own bit OR'ed with the bitsets of its sinks.
+        Only the vertices with inter-reconciler edges get a bit, and the later vertices
+        get the lower bits, so the bitsets stay as small as the part of the graph they cover.
+        """
+        vertices = {}
+        for edge in (
+            self.controller_hear_controller_write_edges
+            + self.controller_write_controller_hear_edges
+        ):
+            vertices[edge.source.gid] = edge.source
+            vertices[edge.sink.gid] = edge.sink
+        sorted_vertices = sorted(
+            vertices.values(),
+            key=lambda vertex: vertex.content.start_timestamp,
+            reverse=True,
+        )
+        self.__gid_to_reachability_bit = {}
+        self.__gid_to_reachable_bitset = {}
+        for i in range(len(sorted_vertices)):
+            vertex = sorted_vertices[i]
+            self.__gid_to_reachability_bit[vertex.gid] = i
+            reachable_bitset = 1 << i
+            for edge in vertex.out_inter_reconciler_edges:
+                assert (
+                    edge.source.content.start_timestamp
+                    < edge.sink.content.start_timestamp
+                )
+                reachable_bitset |= self.__gid_to_reachable_bitset[edge.sink.gid]
+            self.__gid_to_reachable_bitset[vertex.gid] = reachable_bitset
+
+    def reachable(self, source: EventVertex, sink: EventVertex) -> bool:
+        """
+        Whether sink can be reached from source via inter-reconciler edges.
+        The index is built by the first query, and the later queries only look it up
+        without traversing the graph.
+        """
+        if source.gid == sink.gid:
+            return True
+        if self.__gid_to_reachable_bitset is None:
+            self.build_reachability_index()
+        if (
+            source.gid not in self.__gid_to_reachable_bitset
+            or sink.gid not in self.__gid_to_reachability_bit
+        ):
+            return False
+        return (
+            self.__gid_to_reachable_bitset[source.gid]
+            >> self.__gid_to_reachability_bit[sink.gid]
+        ) & 1 == 1
+
     def finalize(self):
         self.compute_event_diff()
         self.compute_event_cancel()
@@ -537,14 +743,15 @@ class EventGraph:
 
 def event_vertices_reachable(source: EventVertex, sink: EventVertex):
     # there should be no cycles in the casuality graph
-    queue = []
+    # EventGraph.reachable should be preferred as it does not traverse the graph for each query
+    queue = deque()
     visited = set()
     queue.append(source)
     visited.add(source.gid)
     if source.gid == sink.gid:
         return True
     while len(queue) != 0:
-        cur = queue.pop(0)
+        cur = queue.popleft()
         for edge in cur.out_inter_reconciler_edges:
             assert cur.gid == edge.source.gid
             assert (
@@ -560,7 +767,4 @@ def event_vertices_reachable(source: EventVertex, sink: EventVertex):
 
 
 def event_vertices_connected(source: EventVertex, sink: EventVertex):
-    for edge in source.out_inter_reconciler_edges:
-        if edge.sink.gid == sink.gid:
-            return True
-    return False
+    return sink.gid in source.out_inter_reconciler_sink_gids
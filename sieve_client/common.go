@@ -11,6 +11,7 @@ import (
 	"runtime/debug"
 	"strings"
 	"sync"
+	"sync/atomic"
 
 	"gopkg.in/yaml.v2"
 	"k8s.io/apimachinery/pkg/api/meta"
@@ -43,17 +44,30 @@ const UNKNOWN string = "Unknown"
 
 const NO_ERROR string = "NoError"
 
-var config map[string]interface{} = nil
+// sieveConfig holds everything loaded from one test plan (or learn plan)
+// and the connection to the Sieve server named by the plan.
+// A sieveConfig is fully loaded before it is published and never modified afterwards,
+// so the hooks read it without locking. Each hook loads the current config once
+// and uses that snapshot until it returns. When the plan changes, a new sieveConfig
+// replaces the old one as a whole.
+type sieveConfig struct {
+	planStr                          string
+	triggerDefinitionsByResourceKey  map[string][]map[interface{}]interface{}
+	triggerDefinitionsByAnnotatedAPI map[string][]map[interface{}]interface{}
+	actions                          map[string][]map[interface{}]interface{}
+	annotatedReconcileFunctions      map[string]interface{}
+	crds                             []string
+	sieveServerAddr                  string
+	rpcClientLock                    sync.Mutex
+	rpcClient                        *rpc.Client
+	rpcClientClosed                  bool
+}
+
+// currentSieveConfig stores the *sieveConfig in use
+var currentSieveConfig atomic.Value
 var configLoadingLock sync.Mutex
-var triggerDefinitionsByResourceKey map[string][]map[interface{}]interface{} = make(map[string][]map[interface{}]interface{})
-var triggerDefinitionsByAnnotatedAPI map[string][]map[interface{}]interface{} = make(map[string][]map[interface{}]interface{})
-var actions map[string][]map[interface{}]interface{} = make(map[string][]map[interface{}]interface{})
-var annotatedReconcileFunctions = make(map[string]interface{})
-var sieveServerAddr string = ""
-var crds []string
 
 var apiserverHostname string = ""
-var rpcClient *rpc.Client = nil
 
 var exists = struct{}{}
 var taintMap sync.Map = sync.Map{}
@@ -99,8 +113,8 @@ func HttpVerbToControllerOperation(verb, resourceName, subresource string) strin
 	}
 }
 
-func checkKVPairInAction(actionType, key, val string, matchPrefix bool) bool {
-	for actionKey, actionsOfTheSameType := range actions {
+func (c *sieveConfig) checkKVPairInAction(actionType, key, val string, matchPrefix bool) bool {
+	for actionKey, actionsOfTheSameType := range c.actions {
 		if actionKey == actionType {
 			for _, action := range actionsOfTheSameType {
 				if valInTestPlan, ok := action[key]; ok {
@@ -119,8 +133,8 @@ func checkKVPairInAction(actionType, key, val string, matchPrefix bool) bool {
 	return false
 }
 
-func checkKVPairInAnnotatedAPICallTriggerCondition(apiKey string) bool {
-	if _, ok := triggerDefinitionsByAnnotatedAPI[apiKey]; ok {
+func (c *sieveConfig) checkKVPairInAnnotatedAPICallTriggerCondition(apiKey string) bool {
+	if _, ok := c.triggerDefinitionsByAnnotatedAPI[apiKey]; ok {
 		return true
 	} else {
 		return false
@@ -138,8 +152,8 @@ func checkKVPairInTriggerContent(content map[interface{}]interface{}, key, val s
 	return false
 }
 
-func checkKVPairInTriggerCondition(resourceKey, key, val string, onlyMatchType bool) bool {
-	for triggerResourceKey, triggers := range triggerDefinitionsByResourceKey {
+func (c *sieveConfig) checkKVPairInTriggerCondition(resourceKey, key, val string, onlyMatchType bool) bool {
+	for triggerResourceKey, triggers := range c.triggerDefinitionsByResourceKey {
 		if triggerResourceKey == resourceKey || (onlyMatchType && strings.HasPrefix(triggerResourceKey, resourceKey+"/")) {
 			for _, trigger := range triggers {
 				if triggerCondition, ok := trigger["condition"]; ok {
@@ -155,8 +169,8 @@ func checkKVPairInTriggerCondition(resourceKey, key, val string, onlyMatchType b
 	return false
 }
 
-func checkKVPairInTriggerObservationPoint(resourceKey, key, val string, onlyMatchType bool) bool {
-	for triggerResourceKey, triggers := range triggerDefinitionsByResourceKey {
+func (c *sieveConfig) checkKVPairInTriggerObservationPoint(resourceKey, key, val string, onlyMatchType bool) bool {
+	for triggerResourceKey, triggers := range c.triggerDefinitionsByResourceKey {
 		if triggerResourceKey == resourceKey || (onlyMatchType && strings.HasPrefix(triggerResourceKey, resourceKey+"/")) {
 			for _, trigger := range triggers {
 				if triggerObservationPoint, ok := trigger["observationPoint"]; ok {
@@ -172,7 +186,7 @@ func checkKVPairInTriggerObservationPoint(resourceKey, key, val string, onlyMatc
 	return false
 }
 
-func loadTriggerDefinitions(trigger map[interface{}]interface{}) error {
+func (c *sieveConfig) loadTriggerDefinitions(trigger map[interface{}]interface{}) error {
 	definitions, ok := trigger["definitions"].([]interface{})
 	if !ok {
 		return fmt.Errorf("cannot convert trigger[\"definitions\"] to []interface{}")
@@ -218,10 +232,10 @@ func loadTriggerDefinitions(trigger map[interface{}]interface{}) error {
 				return fmt.Errorf("cannot convert trigger[\"definitions\"][%d][\"condition\"][\"funName\"] to string", idx)
 			}
 			apiKey := receiverType + funName
-			if _, ok := triggerDefinitionsByAnnotatedAPI[apiKey]; !ok {
-				triggerDefinitionsByAnnotatedAPI[apiKey] = []map[interface{}]interface{}{}
+			if _, ok := c.triggerDefinitionsByAnnotatedAPI[apiKey]; !ok {
+				c.triggerDefinitionsByAnnotatedAPI[apiKey] = []map[interface{}]interface{}{}
 			}
-			triggerDefinitionsByAnnotatedAPI[apiKey] = append(triggerDefinitionsByAnnotatedAPI[apiKey], definition)
+			c.triggerDefinitionsByAnnotatedAPI[apiKey] = append(c.triggerDefinitionsByAnnotatedAPI[apiKey], definition)
 		} else {
 			resourceKeyRaw, ok := condition["resourceKey"]
 			if !ok {
@@ -231,46 +245,46 @@ func loadTriggerDefinitions(trigger map[interface{}]interface{}) error {
 			if !ok {
 				return fmt.Errorf("cannot convert trigger[\"definitions\"][%d][\"condition\"][\"resourceKey\"] to string", idx)
 			}
-			if _, ok := triggerDefinitionsByResourceKey[resourceKey]; !ok {
-				triggerDefinitionsByResourceKey[resourceKey] = []map[interface{}]interface{}{}
+			if _, ok := c.triggerDefinitionsByResourceKey[resourceKey]; !ok {
+				c.triggerDefinitionsByResourceKey[resourceKey] = []map[interface{}]interface{}{}
 			}
-			triggerDefinitionsByResourceKey[resourceKey] = append(triggerDefinitionsByResourceKey[resourceKey], definition)
+			c.triggerDefinitionsByResourceKey[resourceKey] = append(c.triggerDefinitionsByResourceKey[resourceKey], definition)
 		}
 	}
 	return nil
 }
 
-func loadActions(action map[interface{}]interface{}) error {
+func (c *sieveConfig) loadActions(action map[interface{}]interface{}) error {
 	actionType, ok := action["actionType"].(string)
 	if !ok {
 		return fmt.Errorf("cannot convert action[\"actionType\"] to string")
 	}
-	if _, ok := actions[actionType]; !ok {
-		actions[actionType] = []map[interface{}]interface{}{}
+	if _, ok := c.actions[actionType]; !ok {
+		c.actions[actionType] = []map[interface{}]interface{}{}
 	}
-	actions[actionType] = append(actions[actionType], action)
+	c.actions[actionType] = append(c.actions[actionType], action)
 	return nil
 }
 
-func loadSieveServerAddr(plan map[string]interface{}) error {
+func (c *sieveConfig) loadSieveServerAddr(plan map[string]interface{}) error {
 	if val, ok := plan["sieveServerAddr"]; ok {
-		sieveServerAddr = val.(string)
+		c.sieveServerAddr = val.(string)
 	} else {
-		sieveServerAddr = DEFAULT_SIEVE_SERVER_ADDR
+		c.sieveServerAddr = DEFAULT_SIEVE_SERVER_ADDR
 	}
 	return nil
 }
 
-func loadReconcileFuns(learnPlan map[string]interface{}) error {
+func (c *sieveConfig) loadReconcileFuns(learnPlan map[string]interface{}) error {
 	if cs, ok := learnPlan["annotatedReconcileStackFrame"]; ok {
 		switch v := cs.(type) {
 		case []interface{}:
-			for _, c := range v {
-				annotatedReconcileFunctions[c.(string)] = exists
+			for _, fun := range v {
+				c.annotatedReconcileFunctions[fun.(string)] = exists
 			}
 		case []string:
-			for _, c := range v {
-				annotatedReconcileFunctions[c] = exists
+			for _, fun := range v {
+				c.annotatedReconcileFunctions[fun] = exists
 			}
 		default:
 			return fmt.Errorf("annotatedReconcileStackFrame wrong type")
@@ -281,11 +295,11 @@ func loadReconcileFuns(learnPlan map[string]interface{}) error {
 	return nil
 }
 
-func loadTestPlan(testPlan map[string]interface{}) error {
-	if err := loadSieveServerAddr(testPlan); err != nil {
+func (c *sieveConfig) loadTestPlan(testPlan map[string]interface{}) error {
+	if err := c.loadSieveServerAddr(testPlan); err != nil {
 		return err
 	}
-	if err := loadReconcileFuns(testPlan); err != nil {
+	if err := c.loadReconcileFuns(testPlan); err != nil {
 		return err
 	}
 	actions, ok := testPlan["actions"].([]interface{})
@@ -294,7 +308,7 @@ func loadTestPlan(testPlan map[string]interface{}) error {
 	}
 	for idx, val := range actions {
 		action, ok := val.(map[interface{}]interface{})
-		err := loadActions(action)
+		err := c.loadActions(action)
 		if err != nil {
 			return nil
 		}
@@ -305,25 +319,25 @@ func loadTestPlan(testPlan map[string]interface{}) error {
 		if !ok {
 			return fmt.Errorf("cannot convert testPlan[\"actions\"][%d][\"trigger\"] to []interface{}", idx)
 		}
-		err = loadTriggerDefinitions(trigger)
+		err = c.loadTriggerDefinitions(trigger)
 		if err != nil {
 			return err
 		}
 	}
-	log.Printf("triggerDefinitionsByResourceKey:\n%v\n", triggerDefinitionsByResourceKey)
+	log.Printf("triggerDefinitionsByResourceKey:\n%v\n", c.triggerDefinitionsByResourceKey)
 	return nil
 }
 
-func loadCRDs(learnPlan map[string]interface{}) error {
-	crds = []string{}
+func (c *sieveConfig) loadCRDs(learnPlan map[string]interface{}) error {
+	c.crds = []string{}
 	if cs, ok := learnPlan["crdList"]; ok {
 		switch v := cs.(type) {
 		case []interface{}:
-			for _, c := range v {
-				crds = append(crds, c.(string))
+			for _, crd := range v {
+				c.crds = append(c.crds, crd.(string))
 			}
 		case []string:
-			crds = append(crds, v...)
+			c.crds = append(c.crds, v...)
 		default:
 			return fmt.Errorf("crdList wrong type")
 		}
@@ -333,27 +347,56 @@ func loadCRDs(learnPlan map[string]interface{}) error {
 	return nil
 }
 
-func loadLearnPlan(learnPlan map[string]interface{}) error {
-	if err := loadCRDs(learnPlan); err != nil {
+func (c *sieveConfig) loadLearnPlan(learnPlan map[string]interface{}) error {
+	if err := c.loadCRDs(learnPlan); err != nil {
 		return err
 	}
-	if err := loadReconcileFuns(learnPlan); err != nil {
+	if err := c.loadReconcileFuns(learnPlan); err != nil {
 		return err
 	}
-	if err := loadSieveServerAddr(learnPlan); err != nil {
+	if err := c.loadSieveServerAddr(learnPlan); err != nil {
 		return err
 	}
 	return nil
 }
 
-func loadSieveConfigFromEnv(testMode bool) error {
-	if config != nil {
-		return nil
+func newSieveConfig(plan map[string]interface{}, planStr string, testMode bool) *sieveConfig {
+	config := &sieveConfig{
+		planStr:                          planStr,
+		triggerDefinitionsByResourceKey:  make(map[string][]map[interface{}]interface{}),
+		triggerDefinitionsByAnnotatedAPI: make(map[string][]map[interface{}]interface{}),
+		actions:                          make(map[string][]map[interface{}]interface{}),
+		annotatedReconcileFunctions:      make(map[string]interface{}),
+	}
+	if testMode {
+		err := config.loadTestPlan(plan)
+		if err != nil {
+			printConfigError(err)
+			log.Println("failure in loadTestPlan")
+		}
+	} else {
+		err := config.loadLearnPlan(plan)
+		if err != nil {
+			printConfigError(err)
+			log.Println("failure in loadLearnPlan")
+		}
+	}
+	return config
+}
+
+func getSieveConfig() *sieveConfig {
+	config, _ := currentSieveConfig.Load().(*sieveConfig)
+	return config
+}
+
+func loadSieveConfigFromEnv(testMode bool) (*sieveConfig, error) {
+	if config := getSieveConfig(); config != nil {
+		return config, nil
 	}
 	configLoadingLock.Lock()
 	defer configLoadingLock.Unlock()
-	if config != nil {
-		return nil
+	if config := getSieveConfig(); config != nil {
+		return config, nil
 	}
 	if _, ok := os.LookupEnv("sieveTestPlan"); ok {
 		configFromEnv := make(map[string]interface{})
@@ -361,39 +404,46 @@ func loadSieveConfigFromEnv(testMode bool) error {
 		err := yaml.Unmarshal([]byte(data), &configFromEnv)
 		if err != nil {
 			printSerializationError(err)
-			return fmt.Errorf("fail to load from env")
+			return nil, fmt.Errorf("fail to load from env")
 		}
 		log.Printf("config from env:\n%v\n", configFromEnv)
-		config = configFromEnv
-		if testMode {
-			err = loadTestPlan(configFromEnv)
-			if err != nil {
-				printConfigError(err)
-				log.Println("failure in loadTestPlan")
-				return nil
-			}
-		} else {
-			err = loadLearnPlan(configFromEnv)
-			if err != nil {
-				printConfigError(err)
-				log.Println("failure in loadLearnPlan")
-				return nil
-			}
-		}
+		config := newSieveConfig(configFromEnv, data, testMode)
+		currentSieveConfig.Store(config)
+		return config, nil
 	} else {
-		return fmt.Errorf("fail to load from env")
+		return nil, fmt.Errorf("fail to load from env")
 	}
-	return nil
 }
 
-func loadSieveConfigFromConfigMap(eventType, key string, object interface{}, testMode bool) error {
-	if config != nil {
-		return nil
+// replaceSieveConfig publishes the config loaded from a new sieve-testing-global-config.
+// This happens when the same cluster is reused to run the next test plan.
+// The old config is never cleared in place as the hooks running concurrently may still use it;
+// its connection to the Sieve server is closed only after the new config is published.
+func replaceSieveConfig(config *sieveConfig) *sieveConfig {
+	configLoadingLock.Lock()
+	oldConfig := getSieveConfig()
+	if oldConfig != nil && oldConfig.planStr == config.planStr {
+		// another hook has published the same test plan
+		configLoadingLock.Unlock()
+		return oldConfig
+	}
+	currentSieveConfig.Store(config)
+	configLoadingLock.Unlock()
+	if oldConfig != nil {
+		oldConfig.closeRPCClient()
+	}
+	return config
+}
+
+func loadSieveConfigFromConfigMap(eventType, key string, object interface{}, testMode bool) (*sieveConfig, error) {
+	config := getSieveConfig()
+	if config != nil && (eventType != "ADDED" || !strings.HasSuffix(key, "/default/sieve-testing-global-config")) {
+		return config, nil
 	}
 	if eventType == "ADDED" {
 		tokens := strings.Split(key, "/")
 		if len(tokens) < 4 {
-			return fmt.Errorf("tokens len should be >= 4")
+			return nil, fmt.Errorf("tokens len should be >= 4")
 		}
 		namespace := tokens[len(tokens)-2]
 		name := tokens[len(tokens)-1]
@@ -404,57 +454,44 @@ func loadSieveConfigFromConfigMap(eventType, key string, object interface{}, tes
 				jsonObject, err := json.Marshal(object)
 				if err != nil {
 					printSerializationError(err)
-					return fmt.Errorf("fail to load from configmap")
+					return nil, fmt.Errorf("fail to load from configmap")
 				}
 				configMapObject := make(map[string]interface{})
 				err = yaml.Unmarshal(jsonObject, &configMapObject)
 				if err != nil {
 					printSerializationError(err)
-					return fmt.Errorf("fail to load from configmap")
+					return nil, fmt.Errorf("fail to load from configmap")
 				}
 				configFromConfigMapData := make(map[string]interface{})
 				configMapData, ok := configMapObject["Data"].(map[interface{}]interface{})
 				if !ok {
 					log.Printf("cannot convert configMapObject[\"Data\"] to map[interface{}]interface{}")
-					return fmt.Errorf("fail to load from configmap")
+					return nil, fmt.Errorf("fail to load from configmap")
 				}
 				if str, ok := configMapData["sieveTestPlan"].(string); ok {
+					if config != nil && str == config.planStr {
+						return config, nil
+					}
 					err = yaml.Unmarshal([]byte(str), &configFromConfigMapData)
 					if err != nil {
 						printSerializationError(err)
-						return fmt.Errorf("fail to load from configmap")
+						return nil, fmt.Errorf("fail to load from configmap")
 					}
 					log.Printf("config from configMap:\n%v\n", configFromConfigMapData)
-					config = configFromConfigMapData
-					if testMode {
-						err = loadTestPlan(configFromConfigMapData)
-						if err != nil {
-							printConfigError(err)
-							log.Println("failure in loadTestPlan")
-							return nil
-						}
-					} else {
-						err = loadLearnPlan(configFromConfigMapData)
-						if err != nil {
-							printConfigError(err)
-							log.Println("failure in loadLearnPlan")
-							return nil
-						}
-					}
+					return replaceSieveConfig(newSieveConfig(configFromConfigMapData, str, testMode)), nil
 				} else {
 					log.Printf("cannot convert %v to string", configMapData["sieveTestPlan"])
-					return fmt.Errorf("fail to load from configmap")
+					return nil, fmt.Errorf("fail to load from configmap")
 				}
 			} else {
-				return fmt.Errorf("have not seen ADDED configmap/default/sieve-testing-global-config yet")
+				return nil, fmt.Errorf("have not seen ADDED configmap/default/sieve-testing-global-config yet")
 			}
 		} else {
-			return fmt.Errorf("have not seen ADDED configmap/default/sieve-testing-global-config yet")
+			return nil, fmt.Errorf("have not seen ADDED configmap/default/sieve-testing-global-config yet")
 		}
 	} else {
-		return fmt.Errorf("have not seen ADDED configmap/default/sieve-testing-global-config yet")
+		return nil, fmt.Errorf("have not seen ADDED configmap/default/sieve-testing-global-config yet")
 	}
-	return nil
 }
 
 func initAPIServerHostName() error {
@@ -475,23 +512,35 @@ func initAPIServerHostName() error {
 	return nil
 }
 
-func initRPCClient() error {
-	if rpcClient != nil {
-		return nil
+// initRPCClient returns the connection to the Sieve server of the config
+// and sets it up on the first call.
+// Once the config is replaced, its connection is closed and never set up again.
+func (c *sieveConfig) initRPCClient() (*rpc.Client, error) {
+	c.rpcClientLock.Lock()
+	defer c.rpcClientLock.Unlock()
+	if c.rpcClientClosed {
+		return nil, fmt.Errorf("the config has been replaced")
 	}
-	configLoadingLock.Lock()
-	defer configLoadingLock.Unlock()
-	if rpcClient != nil {
-		return nil
+	if c.rpcClient != nil {
+		return c.rpcClient, nil
 	}
-	var err error
-	rpcServerAddr := sieveServerAddr
-	rpcClient, err = rpc.Dial("tcp", rpcServerAddr)
+	rpcServerAddr := c.sieveServerAddr
+	rpcClient, err := rpc.Dial("tcp", rpcServerAddr)
 	if err != nil {
 		log.Printf("error in setting up connection to %s due to %v\n", rpcServerAddr, err)
-		return err
+		return nil, err
+	}
+	c.rpcClient = rpcClient
+	return rpcClient, nil
+}
+
+func (c *sieveConfig) closeRPCClient() {
+	c.rpcClientLock.Lock()
+	defer c.rpcClientLock.Unlock()
+	c.rpcClientClosed = true
+	if c.rpcClient != nil {
+		c.rpcClient.Close()
 	}
-	return nil
 }
 
 func checkResponse(response Response) {
@@ -543,13 +592,13 @@ func extractNameNamespaceFromObj(object interface{}) (string, string) {
 	return "", ""
 }
 
-func getMatchedReconcileStackFrame() string {
+func (c *sieveConfig) getMatchedReconcileStackFrame() string {
 	// log.Println(string(debug.Stack()))
 	for _, stackframe := range strings.Split(string(debug.Stack()), "\n") {
 		if strings.HasPrefix(stackframe, "\t") {
 			continue
 		}
-		for annotatedReconcileFun := range annotatedReconcileFunctions {
+		for annotatedReconcileFun := range c.annotatedReconcileFunctions {
 			if strings.HasPrefix(stackframe, annotatedReconcileFun+"(") {
 				return annotatedReconcileFun
 			}
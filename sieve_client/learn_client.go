@@ -18,14 +18,14 @@ func isCRD(rType string, crds []string) bool {
 	return false
 }
 
-func triggerReconcile(object interface{}) bool {
+func (c *sieveConfig) triggerReconcile(object interface{}) bool {
 	rType := getResourceTypeFromObj(object)
-	if isCRD(rType, crds) {
+	if isCRD(rType, c.crds) {
 		return true
 	}
 	if o, err := meta.Accessor(object); err == nil {
 		for _, ref := range o.GetOwnerReferences() {
-			if isCRD(strings.ToLower(ref.Kind), crds) {
+			if isCRD(strings.ToLower(ref.Kind), c.crds) {
 				taintMap.Store(o.GetNamespace()+"-"+rType+"-"+o.GetName(), "")
 				return true
 			} else if _, ok := taintMap.Load(o.GetNamespace() + "-" + strings.ToLower(ref.Kind) + "-" + ref.Name); ok {
@@ -38,13 +38,15 @@ func triggerReconcile(object interface{}) bool {
 }
 
 func NotifyLearnBeforeControllerRecv(operationType string, object interface{}) int {
-	if err := loadSieveConfigFromEnv(false); err != nil {
+	config, err := loadSieveConfigFromEnv(false)
+	if err != nil {
 		return -1
 	}
-	if !triggerReconcile(object) {
+	if !config.triggerReconcile(object) {
 		return -1
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return -1
 	}
 	jsonObject, err := json.Marshal(object)
@@ -68,23 +70,25 @@ func NotifyLearnBeforeControllerRecv(operationType string, object interface{}) i
 }
 
 func NotifyLearnAfterControllerRecv(recvID int, operationType string, object interface{}) {
-	if err := loadSieveConfigFromEnv(false); err != nil {
+	config, err := loadSieveConfigFromEnv(false)
+	if err != nil {
 		return
 	}
-	if !triggerReconcile(object) {
+	if !config.triggerReconcile(object) {
 		return
 	}
 	if recvID == -1 {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	request := &NotifyLearnAfterControllerRecvRequest{
 		EventID: recvID,
 	}
 	var response Response
-	err := rpcClient.Call("LearnListener.NotifyLearnAfterControllerRecv", request, &response)
+	err = rpcClient.Call("LearnListener.NotifyLearnAfterControllerRecv", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -93,10 +97,12 @@ func NotifyLearnAfterControllerRecv(recvID int, operationType string, object int
 }
 
 func NotifyLearnBeforeReconcile(stackFrame string) {
-	if err := loadSieveConfigFromEnv(false); err != nil {
+	config, err := loadSieveConfigFromEnv(false)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	log.Printf("NotifyLearnBeforeReconcile %s", stackFrame)
@@ -104,7 +110,7 @@ func NotifyLearnBeforeReconcile(stackFrame string) {
 		ReconcilerName: stackFrame,
 	}
 	var response Response
-	err := rpcClient.Call("LearnListener.NotifyLearnBeforeReconcile", request, &response)
+	err = rpcClient.Call("LearnListener.NotifyLearnBeforeReconcile", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -113,10 +119,12 @@ func NotifyLearnBeforeReconcile(stackFrame string) {
 }
 
 func NotifyLearnAfterReconcile(stackFrame string) {
-	if err := loadSieveConfigFromEnv(false); err != nil {
+	config, err := loadSieveConfigFromEnv(false)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	log.Printf("NotifyLearnAfterReconcile %s", stackFrame)
@@ -124,7 +132,7 @@ func NotifyLearnAfterReconcile(stackFrame string) {
 		ReconcilerName: stackFrame,
 	}
 	var response Response
-	err := rpcClient.Call("LearnListener.NotifyLearnAfterReconcile", request, &response)
+	err = rpcClient.Call("LearnListener.NotifyLearnAfterReconcile", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -136,13 +144,15 @@ func NotifyLearnBeforeCacheGet(key string, items []interface{}) {
 }
 
 func NotifyLearnAfterCacheGet(key string, item interface{}, exists bool) {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return
 	}
@@ -183,13 +193,15 @@ func NotifyLearnBeforeCacheList(items []interface{}) {
 }
 
 func NotifyLearnAfterCacheList(items []interface{}, listErr error) {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return
 	}
@@ -223,17 +235,19 @@ func NotifyLearnAfterCacheList(items []interface{}, listErr error) {
 
 func NotifyLearnBeforeRestCall(verb string, pathPrefix string, subpath string, namespace string, namespaceSet bool, resourceType string, resourceName string, subresource string, object interface{}) int {
 	log.Printf("NotifyLearnBeforeRestCall")
-	if err := loadSieveConfigFromEnv(false); err != nil {
+	config, err := loadSieveConfigFromEnv(false)
+	if err != nil {
 		return -1
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return -1
 	}
 	// NOTE: sometimes the resourceType is empty string, and we skip these cases
 	if len(resourceType) == 0 {
 		return -1
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return -1
 	}
@@ -269,7 +283,8 @@ func NotifyLearnBeforeRestCall(verb string, pathPrefix string, subpath string, n
 func NotifyLearnAfterRestCall(controllerOperationID int, verb string, pathPrefix string, subpath string, namespace string, namespaceSet bool, resourceType string, resourceName string, subresource string, object interface{}, serializationErr error, respErr error) {
 	log.Printf("NotifyLearnAfterRestCall")
 
-	if err := loadSieveConfigFromEnv(false); err != nil {
+	config, err := loadSieveConfigFromEnv(false)
+	if err != nil {
 		return
 	}
 	if controllerOperationID == -1 {
@@ -282,10 +297,11 @@ func NotifyLearnAfterRestCall(controllerOperationID int, verb string, pathPrefix
 	if len(resourceType) == 0 {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return
 	}
@@ -343,13 +359,15 @@ func NotifyLearnAfterRestCall(controllerOperationID int, verb string, pathPrefix
 }
 
 func NotifyLearnBeforeAnnotatedAPICall(moduleName string, filePath string, receiverType string, funName string) int {
-	if err := loadSieveConfigFromEnv(false); err != nil {
+	config, err := loadSieveConfigFromEnv(false)
+	if err != nil {
 		return -1
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return -1
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	request := &NotifyLearnBeforeAnnotatedAPICallRequest{
 		ModuleName:   moduleName,
 		FilePath:     filePath,
@@ -358,7 +376,7 @@ func NotifyLearnBeforeAnnotatedAPICall(moduleName string, filePath string, recei
 		ReconcileFun: reconcileFun,
 	}
 	var response Response
-	err := rpcClient.Call("LearnListener.NotifyLearnBeforeAnnotatedAPICall", request, &response)
+	err = rpcClient.Call("LearnListener.NotifyLearnBeforeAnnotatedAPICall", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return -1
@@ -368,16 +386,18 @@ func NotifyLearnBeforeAnnotatedAPICall(moduleName string, filePath string, recei
 }
 
 func NotifyLearnAfterAnnotatedAPICall(invocationID int, moduleName string, filePath string, receiverType string, funName string) {
-	if err := loadSieveConfigFromEnv(false); err != nil {
+	config, err := loadSieveConfigFromEnv(false)
+	if err != nil {
 		return
 	}
 	if invocationID == -1 {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	request := &NotifyLearnAfterAnnotatedAPICallRequest{
 		InvocationID: invocationID,
 		ModuleName:   moduleName,
@@ -387,7 +407,7 @@ func NotifyLearnAfterAnnotatedAPICall(invocationID int, moduleName string, fileP
 		ReconcileFun: reconcileFun,
 	}
 	var response Response
-	err := rpcClient.Call("LearnListener.NotifyLearnAfterAnnotatedAPICall", request, &response)
+	err = rpcClient.Call("LearnListener.NotifyLearnAfterAnnotatedAPICall", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -396,7 +416,7 @@ func NotifyLearnAfterAnnotatedAPICall(invocationID int, moduleName string, fileP
 }
 
 func NotifyLearnBeforeAPIServerRecv(eventType, key string, object interface{}) {
-	if err := loadSieveConfigFromConfigMap(eventType, key, object, false); err != nil {
+	if _, err := loadSieveConfigFromConfigMap(eventType, key, object, false); err != nil {
 		return
 	}
 	LogAPIEvent(eventType, key, object)
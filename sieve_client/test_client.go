@@ -7,16 +7,18 @@ import (
 )
 
 func NotifyTestBeforeControllerRecv(operationType string, object interface{}) int {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return -1
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return -1
 	}
 	resourceType := getResourceTypeFromObj(object)
 	name, namespace := extractNameNamespaceFromObj(object)
 	resourceKey := generateResourceKey(resourceType, namespace, name)
-	if !checkKVPairInTriggerObservationPoint(resourceKey, "when", "beforeControllerRecv", false) {
+	if !config.checkKVPairInTriggerObservationPoint(resourceKey, "when", "beforeControllerRecv", false) {
 		return -1
 	}
 	jsonObject, err := json.Marshal(object)
@@ -41,16 +43,18 @@ func NotifyTestBeforeControllerRecv(operationType string, object interface{}) in
 }
 
 func NotifyTestAfterControllerRecv(recvID int, operationType string, object interface{}) {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	resourceType := getResourceTypeFromObj(object)
 	name, namespace := extractNameNamespaceFromObj(object)
 	resourceKey := generateResourceKey(resourceType, namespace, name)
-	if !checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterControllerRecv", false) {
+	if !config.checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterControllerRecv", false) {
 		return
 	}
 	jsonObject, err := json.Marshal(object)
@@ -74,13 +78,14 @@ func NotifyTestAfterControllerRecv(recvID int, operationType string, object inte
 }
 
 func NotifyTestBeforeCacheGet(key string, items []interface{}) {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	if _, err := config.initRPCClient(); err != nil {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return
 	}
@@ -89,20 +94,22 @@ func NotifyTestBeforeCacheGet(key string, items []interface{}) {
 	}
 	resourceKey := path.Join(getResourceTypeFromObj(items[0]), key)
 	log.Printf("NotifyTestBeforeCacheGet %s", resourceKey)
-	NotifyTestBeforeCacheGetPause(resourceKey)
+	NotifyTestBeforeCacheGetPause(config, resourceKey)
 }
 
 func NotifyTestAfterCacheGet(key string, item interface{}, exists bool) {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	if !exists {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return
 	}
@@ -112,11 +119,11 @@ func NotifyTestAfterCacheGet(key string, item interface{}, exists bool) {
 		printSerializationError(err)
 		return
 	}
-	defer NotifyTestAfterCacheGetPause(resourceKey)
-	if !checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterControllerWrite", false) {
+	defer NotifyTestAfterCacheGetPause(config, resourceKey)
+	if !config.checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterControllerWrite", false) {
 		return
 	}
-	if !checkKVPairInTriggerObservationPoint(resourceKey, "by", reconcileFun, false) {
+	if !config.checkKVPairInTriggerObservationPoint(resourceKey, "by", reconcileFun, false) {
 		return
 	}
 	log.Printf("NotifyTestAfterCacheGet %s %s", resourceKey, string(serializedObj))
@@ -135,13 +142,14 @@ func NotifyTestAfterCacheGet(key string, item interface{}, exists bool) {
 }
 
 func NotifyTestBeforeCacheList(items []interface{}) {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	if _, err := config.initRPCClient(); err != nil {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return
 	}
@@ -150,14 +158,16 @@ func NotifyTestBeforeCacheList(items []interface{}) {
 	}
 	resourceType := getResourceTypeFromObj(items[0])
 	log.Printf("NotifyTestBeforeCacheList %s", resourceType)
-	NotifyTestBeforeCacheListPause(resourceType)
+	NotifyTestBeforeCacheListPause(config, resourceType)
 }
 
 func NotifyTestAfterCacheList(items []interface{}, listErr error) {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	if listErr != nil {
@@ -166,7 +176,7 @@ func NotifyTestAfterCacheList(items []interface{}, listErr error) {
 	if len(items) == 0 {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return
 	}
@@ -176,11 +186,11 @@ func NotifyTestAfterCacheList(items []interface{}, listErr error) {
 		return
 	}
 	resourceType := getResourceTypeFromObj(items[0])
-	defer NotifyTestAfterCacheListPause(resourceType)
-	if !checkKVPairInTriggerObservationPoint(resourceType, "when", "afterControllerWrite", true) {
+	defer NotifyTestAfterCacheListPause(config, resourceType)
+	if !config.checkKVPairInTriggerObservationPoint(resourceType, "when", "afterControllerWrite", true) {
 		return
 	}
-	if !checkKVPairInTriggerObservationPoint(resourceType, "by", reconcileFun, true) {
+	if !config.checkKVPairInTriggerObservationPoint(resourceType, "by", reconcileFun, true) {
 		return
 	}
 	log.Printf("NotifyTestAfterCacheList %s %s", resourceType, string(serializedObjList))
@@ -198,11 +208,15 @@ func NotifyTestAfterCacheList(items []interface{}, listErr error) {
 	checkResponse(response)
 }
 
-func NotifyTestBeforeCacheGetPause(resourceKey string) {
-	if !checkKVPairInAction("pauseController", "pauseScope", resourceKey, false) {
+func NotifyTestBeforeCacheGetPause(config *sieveConfig, resourceKey string) {
+	if !config.checkKVPairInAction("pauseController", "pauseScope", resourceKey, false) {
 		return
 	}
-	if !checkKVPairInAction("pauseController", "pauseAt", "beforeControllerRead", false) && !checkKVPairInAction("pauseController", "pauseAt", "afterControllerRead", false) {
+	if !config.checkKVPairInAction("pauseController", "pauseAt", "beforeControllerRead", false) && !config.checkKVPairInAction("pauseController", "pauseAt", "afterControllerRead", false) {
+		return
+	}
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	log.Printf("NotifyTestBeforeCacheGetPause %s\n", resourceKey)
@@ -211,7 +225,7 @@ func NotifyTestBeforeCacheGetPause(resourceKey string) {
 		ResourceKey:   resourceKey,
 	}
 	var response Response
-	err := rpcClient.Call("TestCoordinator.NotifyTestBeforeControllerReadPause", request, &response)
+	err = rpcClient.Call("TestCoordinator.NotifyTestBeforeControllerReadPause", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -219,11 +233,15 @@ func NotifyTestBeforeCacheGetPause(resourceKey string) {
 	checkResponse(response)
 }
 
-func NotifyTestAfterCacheGetPause(resourceKey string) {
-	if !checkKVPairInAction("pauseController", "pauseScope", resourceKey, false) {
+func NotifyTestAfterCacheGetPause(config *sieveConfig, resourceKey string) {
+	if !config.checkKVPairInAction("pauseController", "pauseScope", resourceKey, false) {
+		return
+	}
+	if !config.checkKVPairInAction("pauseController", "pauseAt", "beforeControllerRead", false) && !config.checkKVPairInAction("pauseController", "pauseAt", "afterControllerRead", false) {
 		return
 	}
-	if !checkKVPairInAction("pauseController", "pauseAt", "beforeControllerRead", false) && !checkKVPairInAction("pauseController", "pauseAt", "afterControllerRead", false) {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	log.Printf("NotifyTestAfterCacheGetPause %s\n", resourceKey)
@@ -232,7 +250,7 @@ func NotifyTestAfterCacheGetPause(resourceKey string) {
 		ResourceKey:   resourceKey,
 	}
 	var response Response
-	err := rpcClient.Call("TestCoordinator.NotifyTestAfterControllerReadPause", request, &response)
+	err = rpcClient.Call("TestCoordinator.NotifyTestAfterControllerReadPause", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -240,11 +258,15 @@ func NotifyTestAfterCacheGetPause(resourceKey string) {
 	checkResponse(response)
 }
 
-func NotifyTestBeforeCacheListPause(resourceType string) {
-	if !checkKVPairInAction("pauseController", "pauseScope", resourceType, true) {
+func NotifyTestBeforeCacheListPause(config *sieveConfig, resourceType string) {
+	if !config.checkKVPairInAction("pauseController", "pauseScope", resourceType, true) {
 		return
 	}
-	if !checkKVPairInAction("pauseController", "pauseAt", "beforeControllerRead", false) && !checkKVPairInAction("pauseController", "pauseAt", "afterControllerRead", false) {
+	if !config.checkKVPairInAction("pauseController", "pauseAt", "beforeControllerRead", false) && !config.checkKVPairInAction("pauseController", "pauseAt", "afterControllerRead", false) {
+		return
+	}
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	log.Printf("NotifyTestBeforeCacheListPause %s\n", resourceType)
@@ -253,7 +275,7 @@ func NotifyTestBeforeCacheListPause(resourceType string) {
 		ResourceType:  resourceType,
 	}
 	var response Response
-	err := rpcClient.Call("TestCoordinator.NotifyTestBeforeControllerReadPause", request, &response)
+	err = rpcClient.Call("TestCoordinator.NotifyTestBeforeControllerReadPause", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -261,11 +283,15 @@ func NotifyTestBeforeCacheListPause(resourceType string) {
 	checkResponse(response)
 }
 
-func NotifyTestAfterCacheListPause(resourceType string) {
-	if !checkKVPairInAction("pauseController", "pauseScope", resourceType, true) {
+func NotifyTestAfterCacheListPause(config *sieveConfig, resourceType string) {
+	if !config.checkKVPairInAction("pauseController", "pauseScope", resourceType, true) {
+		return
+	}
+	if !config.checkKVPairInAction("pauseController", "pauseAt", "beforeControllerRead", false) && !config.checkKVPairInAction("pauseController", "pauseAt", "afterControllerRead", false) {
 		return
 	}
-	if !checkKVPairInAction("pauseController", "pauseAt", "beforeControllerRead", false) && !checkKVPairInAction("pauseController", "pauseAt", "afterControllerRead", false) {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	log.Printf("NotifyTestAfterCacheListPause %s\n", resourceType)
@@ -274,7 +300,7 @@ func NotifyTestAfterCacheListPause(resourceType string) {
 		ResourceType:  resourceType,
 	}
 	var response Response
-	err := rpcClient.Call("TestCoordinator.NotifyTestAfterControllerReadPause", request, &response)
+	err = rpcClient.Call("TestCoordinator.NotifyTestAfterControllerReadPause", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -283,17 +309,19 @@ func NotifyTestAfterCacheListPause(resourceType string) {
 }
 
 func NotifyTestBeforeRestCall(verb string, pathPrefix string, subpath string, namespace string, namespaceSet bool, resourceType string, resourceName string, subresource string, object interface{}) int {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return -1
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return -1
 	}
 	// NOTE: sometimes the resourceType is empty string, and we skip these cases
 	if len(resourceType) == 0 {
 		return -1
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return -1
 	}
@@ -312,11 +340,11 @@ func NotifyTestBeforeRestCall(verb string, pathPrefix string, subpath string, na
 		return 1
 	} else {
 		resourceKey := generateResourceKeyFromRestCall(verb, resourceType, namespace, resourceName, object)
-		defer NotifyTestBeforeControllerWritePause(controllerOperationType, resourceKey)
-		if !checkKVPairInTriggerObservationPoint(resourceKey, "when", "beforeControllerWrite", false) {
+		defer NotifyTestBeforeControllerWritePause(config, controllerOperationType, resourceKey)
+		if !config.checkKVPairInTriggerObservationPoint(resourceKey, "when", "beforeControllerWrite", false) {
 			return 1
 		}
-		if !checkKVPairInTriggerObservationPoint(resourceKey, "by", reconcileFun, false) {
+		if !config.checkKVPairInTriggerObservationPoint(resourceKey, "by", reconcileFun, false) {
 			return 1
 		}
 		log.Printf("NotifyTestBeforeRestWrite %s %s %s %s %s %s\n", verb, resourceKey, reconcileFun, pathPrefix, subpath, string(serializedObj))
@@ -338,7 +366,8 @@ func NotifyTestBeforeRestCall(verb string, pathPrefix string, subpath string, na
 }
 
 func NotifyTestAfterRestCall(controllerOperationID int, verb string, pathPrefix string, subpath string, namespace string, namespaceSet bool, resourceType string, resourceName string, subresource string, object interface{}, serializationErr error, respErr error) {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return
 	}
 	if controllerOperationID == -1 {
@@ -350,14 +379,15 @@ func NotifyTestAfterRestCall(controllerOperationID int, verb string, pathPrefix
 	if respErr != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	// NOTE: sometimes the resourceType is empty string, and we skip these cases
 	if len(resourceType) == 0 {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	if reconcileFun == UNKNOWN_RECONCILE_FUN {
 		return
 	}
@@ -371,10 +401,10 @@ func NotifyTestAfterRestCall(controllerOperationID int, verb string, pathPrefix
 		log.Println("Unknown operation")
 	} else if controllerOperationType == GET {
 		resourceKey := generateResourceKeyFromRestCall(verb, resourceType, namespace, resourceName, object)
-		if !checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterControllerWrite", false) {
+		if !config.checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterControllerWrite", false) {
 			return
 		}
-		if !checkKVPairInTriggerObservationPoint(resourceKey, "by", reconcileFun, false) {
+		if !config.checkKVPairInTriggerObservationPoint(resourceKey, "by", reconcileFun, false) {
 			return
 		}
 		log.Printf("NotifyTestAfterRestRead %s %s %s %s %s %s\n", verb, resourceKey, reconcileFun, pathPrefix, subpath, string(serializedObj))
@@ -392,10 +422,10 @@ func NotifyTestAfterRestCall(controllerOperationID int, verb string, pathPrefix
 		checkResponse(response)
 	} else if controllerOperationType == LIST {
 		resourceType = pluralToSingular(resourceType)
-		if !checkKVPairInTriggerObservationPoint(resourceType, "when", "afterControllerWrite", true) {
+		if !config.checkKVPairInTriggerObservationPoint(resourceType, "when", "afterControllerWrite", true) {
 			return
 		}
-		if !checkKVPairInTriggerObservationPoint(resourceType, "by", reconcileFun, true) {
+		if !config.checkKVPairInTriggerObservationPoint(resourceType, "by", reconcileFun, true) {
 			return
 		}
 		log.Printf("NotifyTestAfterRestList %s %s", resourceType, string(serializedObj))
@@ -413,11 +443,11 @@ func NotifyTestAfterRestCall(controllerOperationID int, verb string, pathPrefix
 		checkResponse(response)
 	} else {
 		resourceKey := generateResourceKeyFromRestCall(verb, resourceType, namespace, resourceName, object)
-		defer NotifyTestAfterControllerWritePause(controllerOperationType, resourceKey)
-		if !checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterControllerWrite", false) {
+		defer NotifyTestAfterControllerWritePause(config, controllerOperationType, resourceKey)
+		if !config.checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterControllerWrite", false) {
 			return
 		}
-		if !checkKVPairInTriggerObservationPoint(resourceKey, "by", reconcileFun, false) {
+		if !config.checkKVPairInTriggerObservationPoint(resourceKey, "by", reconcileFun, false) {
 			return
 		}
 		log.Printf("NotifyTestAfterRestWrite %s %s %s %s %s %s\n", verb, resourceKey, reconcileFun, pathPrefix, subpath, string(serializedObj))
@@ -437,12 +467,16 @@ func NotifyTestAfterRestCall(controllerOperationID int, verb string, pathPrefix
 	}
 }
 
-func NotifyTestBeforeControllerWritePause(writeType string, resourceKey string) {
+func NotifyTestBeforeControllerWritePause(config *sieveConfig, writeType string, resourceKey string) {
 	// NOTE: assume the caller has checked the config and created the client
-	if !checkKVPairInAction("pauseController", "pauseScope", resourceKey, false) {
+	if !config.checkKVPairInAction("pauseController", "pauseScope", resourceKey, false) {
 		return
 	}
-	if !checkKVPairInAction("pauseController", "pauseAt", "beforeControllerWrite", false) && !checkKVPairInAction("pauseController", "pauseAt", "afterControllerWrite", false) {
+	if !config.checkKVPairInAction("pauseController", "pauseAt", "beforeControllerWrite", false) && !config.checkKVPairInAction("pauseController", "pauseAt", "afterControllerWrite", false) {
+		return
+	}
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	log.Printf("NotifyTestBeforeControllerWritePause %s %s\n", writeType, resourceKey)
@@ -451,7 +485,7 @@ func NotifyTestBeforeControllerWritePause(writeType string, resourceKey string)
 		ResourceKey: resourceKey,
 	}
 	var response Response
-	err := rpcClient.Call("TestCoordinator.NotifyTestBeforeControllerWritePause", request, &response)
+	err = rpcClient.Call("TestCoordinator.NotifyTestBeforeControllerWritePause", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -459,12 +493,16 @@ func NotifyTestBeforeControllerWritePause(writeType string, resourceKey string)
 	checkResponse(response)
 }
 
-func NotifyTestAfterControllerWritePause(writeType string, resourceKey string) {
+func NotifyTestAfterControllerWritePause(config *sieveConfig, writeType string, resourceKey string) {
 	// NOTE: assume the caller has checked the config and created the client
-	if !checkKVPairInAction("pauseController", "pauseScope", resourceKey, false) {
+	if !config.checkKVPairInAction("pauseController", "pauseScope", resourceKey, false) {
+		return
+	}
+	if !config.checkKVPairInAction("pauseController", "pauseAt", "beforeControllerWrite", false) && !config.checkKVPairInAction("pauseController", "pauseAt", "afterControllerWrite", false) {
 		return
 	}
-	if !checkKVPairInAction("pauseController", "pauseAt", "beforeControllerWrite", false) && !checkKVPairInAction("pauseController", "pauseAt", "afterControllerWrite", false) {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	log.Printf("NotifyTestAfterControllerWritePause %s %s\n", writeType, resourceKey)
@@ -473,7 +511,7 @@ func NotifyTestAfterControllerWritePause(writeType string, resourceKey string) {
 		ResourceKey: resourceKey,
 	}
 	var response Response
-	err := rpcClient.Call("TestCoordinator.NotifyTestAfterControllerWritePause", request, &response)
+	err = rpcClient.Call("TestCoordinator.NotifyTestAfterControllerWritePause", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -482,16 +520,18 @@ func NotifyTestAfterControllerWritePause(writeType string, resourceKey string) {
 }
 
 func NotifyTestBeforeAnnotatedAPICall(moduleName string, filePath string, receiverType string, funName string) int {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return -1
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return -1
 	}
-	if !checkKVPairInAnnotatedAPICallTriggerCondition(receiverType + funName) {
+	if !config.checkKVPairInAnnotatedAPICallTriggerCondition(receiverType + funName) {
 		return -1
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	log.Printf("NotifyTestBeforeAnnotatedAPICall %s %s %s %s\n", moduleName, filePath, receiverType, funName)
 	request := &NotifyTestBeforeAnnotatedAPICallRequest{
 		ModuleName:   moduleName,
@@ -501,7 +541,7 @@ func NotifyTestBeforeAnnotatedAPICall(moduleName string, filePath string, receiv
 		ReconcileFun: reconcileFun,
 	}
 	var response Response
-	err := rpcClient.Call("TestCoordinator.NotifyTestBeforeAnnotatedAPICall", request, &response)
+	err = rpcClient.Call("TestCoordinator.NotifyTestBeforeAnnotatedAPICall", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return -1
@@ -511,16 +551,18 @@ func NotifyTestBeforeAnnotatedAPICall(moduleName string, filePath string, receiv
 }
 
 func NotifyTestAfterAnnotatedAPICall(invocationID int, moduleName string, filePath string, receiverType string, funName string) {
-	if err := loadSieveConfigFromEnv(true); err != nil {
+	config, err := loadSieveConfigFromEnv(true)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
-	if !checkKVPairInAnnotatedAPICallTriggerCondition(receiverType + funName) {
+	if !config.checkKVPairInAnnotatedAPICallTriggerCondition(receiverType + funName) {
 		return
 	}
-	reconcileFun := getMatchedReconcileStackFrame()
+	reconcileFun := config.getMatchedReconcileStackFrame()
 	log.Printf("NotifyTestAfterAnnotatedAPICall %s %s %s %s\n", moduleName, filePath, receiverType, funName)
 	request := &NotifyTestAfterAnnotatedAPICallRequest{
 		ModuleName:   moduleName,
@@ -530,7 +572,7 @@ func NotifyTestAfterAnnotatedAPICall(invocationID int, moduleName string, filePa
 		ReconcileFun: reconcileFun,
 	}
 	var response Response
-	err := rpcClient.Call("TestCoordinator.NotifyTestAfterAnnotatedAPICall", request, &response)
+	err = rpcClient.Call("TestCoordinator.NotifyTestAfterAnnotatedAPICall", request, &response)
 	if err != nil {
 		printRPCError(err)
 		return
@@ -539,12 +581,14 @@ func NotifyTestAfterAnnotatedAPICall(invocationID int, moduleName string, filePa
 }
 
 func NotifyTestBeforeAPIServerRecv(eventType, key string, object interface{}) {
-	if err := loadSieveConfigFromConfigMap(eventType, key, object, true); err != nil {
+	config, err := loadSieveConfigFromConfigMap(eventType, key, object, true)
+	if err != nil {
 		return
 	}
 	// we should log the API event before initializing the client
 	LogAPIEvent(eventType, key, object)
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	if err := initAPIServerHostName(); err != nil {
@@ -556,7 +600,7 @@ func NotifyTestBeforeAPIServerRecv(eventType, key string, object interface{}) {
 		return
 	}
 	resourceKey := generateResourceKey(resourceType, namespace, name)
-	if !checkKVPairInTriggerObservationPoint(resourceKey, "when", "beforeAPIServerRecv", false) {
+	if !config.checkKVPairInTriggerObservationPoint(resourceKey, "when", "beforeAPIServerRecv", false) {
 		return
 	}
 	jsonObject, err := json.Marshal(object)
@@ -581,10 +625,12 @@ func NotifyTestBeforeAPIServerRecv(eventType, key string, object interface{}) {
 }
 
 func NotifyTestAfterAPIServerRecv(eventType, key string, object interface{}) {
-	if err := loadSieveConfigFromConfigMap(eventType, key, object, true); err != nil {
+	config, err := loadSieveConfigFromConfigMap(eventType, key, object, true)
+	if err != nil {
 		return
 	}
-	if err := initRPCClient(); err != nil {
+	rpcClient, err := config.initRPCClient()
+	if err != nil {
 		return
 	}
 	if err := initAPIServerHostName(); err != nil {
@@ -596,7 +642,7 @@ func NotifyTestAfterAPIServerRecv(eventType, key string, object interface{}) {
 		return
 	}
 	resourceKey := generateResourceKey(resourceType, namespace, name)
-	if !checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterAPIServerRecv", false) {
+	if !config.checkKVPairInTriggerObservationPoint(resourceKey, "when", "afterAPIServerRecv", false) {
 		return
 	}
 	jsonObject, err := json.Marshal(object)
@@ -0,0 +1,24 @@
+import json
+import os
+
+# path -> (signature of the file, parsed content)
+json_artifacts = {}
+
+
+def artifact_signature(path: str):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_json_artifact(path: str):
+    """
+    Load the json artifact (e.g., state.json, event.json, mask.json and controller_family.json).
+    The parsed content is cached by the path and the mtime of the file,
+    so the same artifact is only parsed again after the file is rewritten.
+    The returned content is shared by all the callers and should not be modified.
+    """
+    path = os.path.abspath(path)
+    signature = artifact_signature(path)
+    if path not in json_artifacts or json_artifacts[path][0] != signature:
+        json_artifacts[path] = (signature, json.load(open(path)))
+    return json_artifacts[path][1]
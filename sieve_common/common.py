@@ -27,6 +27,9 @@ SIEVE_LEARN_VALUE_MASK = "SIEVE-IGNORE"
 EXIST = True
 NONEXIST = False
 
+# the prefix of the lines in workload.log recording how long each step takes
+WORKLOAD_STEP_LATENCY = "SIEVE-STEP-LATENCY"
+
 METADATA_FIELDS = [
     "name",
     "generateName",
@@ -51,6 +54,7 @@ TIME_REG = "^[0-9]+-[0-9]+-[0-9]+T[0-9]+:[0-9]+:[0-9]+Z$"
 IP_REG = "^((25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$"
 
 MASK_REGS = [TIME_REG, IP_REG]
+MASK_PATTERNS = [re.compile(reg) for reg in MASK_REGS]
 
 
 class sieve_modes:
@@ -67,6 +71,105 @@ class sieve_built_in_test_patterns:
     INTERMEDIATE_STATE = "intermediate-state"
 
 
+DEFAULT_KIND_CLUSTER = "kind"
+DEFAULT_SIEVE_SERVER_PORT = 12345
+KIND_NODE_REG = "^{}-(control-plane[0-9]*|worker[0-9]*|external-load-balancer)$"
+
+
+class KindCluster:
+    """
+    The kind cluster (and the Sieve server running in it) used by one test run.
+    kind names the nodes (i.e., containers) after the cluster,
+    e.g., kind-control-plane, kind-control-plane2, kind-worker and kind-external-load-balancer,
+    so multiple clusters with different names can run on the same host.
+    """
+
+    def __init__(
+        self,
+        name=DEFAULT_KIND_CLUSTER,
+        kubeconfig=None,
+        sieve_server_port=DEFAULT_SIEVE_SERVER_PORT,
+        sieve_server_dir="sieve_server",
+        warm=False,
+    ):
+        self.name = name
+        # None means the kubeconfig specified by $KUBECONFIG
+        self.kubeconfig = kubeconfig
+        self.sieve_server_port = sieve_server_port
+        # the directory copied to the control plane to run the Sieve server
+        self.sieve_server_dir = sieve_server_dir
+        # a warm cluster is kept after the test run and reset for the next test run
+        self.warm = warm
+        # whether the current test run reuses the warm cluster
+        self.reused = False
+        # the time when the warm cluster is reset, the logs before which belong to previous test runs
+        self.since_time = None
+
+    def is_default(self):
+        return (
+            self.name == DEFAULT_KIND_CLUSTER
+            and self.sieve_server_port == DEFAULT_SIEVE_SERVER_PORT
+        )
+
+    def kubeconfig_path(self):
+        if self.kubeconfig is not None:
+            return self.kubeconfig
+        return os.getenv("KUBECONFIG")
+
+    def kind_options(self):
+        options = "--name {}".format(self.name)
+        if self.kubeconfig is not None:
+            options += " --kubeconfig {}".format(self.kubeconfig)
+        return options
+
+    def control_plane(self, i=0):
+        return "{}-control-plane{}".format(self.name, str(i + 1) if i > 0 else "")
+
+    def worker(self, i=0):
+        return "{}-worker{}".format(self.name, str(i + 1) if i > 0 else "")
+
+    def external_load_balancer(self):
+        return "{}-external-load-balancer".format(self.name)
+
+    def apiserver_pod(self, i=0):
+        return "kube-apiserver-" + self.control_plane(i)
+
+    def sieve_server_addr(self):
+        return "{}:{}".format(self.control_plane(), self.sieve_server_port)
+
+    def node(self, default_node):
+        # translate the node name in the default cluster (e.g., kind-control-plane3)
+        # to the node name in this cluster
+        match = re.match(KIND_NODE_REG.format(DEFAULT_KIND_CLUSTER), default_node)
+        if match is None:
+            return default_node
+        return "{}-{}".format(self.name, match.group(1))
+
+    def rename_nodes(self, plan_content):
+        if isinstance(plan_content, dict):
+            return {
+                key: self.rename_nodes(value) for key, value in plan_content.items()
+            }
+        elif isinstance(plan_content, list):
+            return [self.rename_nodes(value) for value in plan_content]
+        elif isinstance(plan_content, str):
+            return self.node(plan_content)
+        return plan_content
+
+    def customize_plan(self, plan_content, common_config: CommonConfig):
+        """
+        Point the test plan to the nodes and the Sieve server of this cluster.
+        The plan is unchanged for the default cluster.
+        """
+        if self.is_default():
+            return plan_content
+        plan_content = self.rename_nodes(plan_content)
+        plan_content["sieveServerAddr"] = self.sieve_server_addr()
+        plan_content["leadingAPIServer"] = self.node(common_config.leading_api)
+        plan_content["followingAPIServer"] = self.node(common_config.following_api)
+        return plan_content
+
+
 class TestContext:
     def __init__(
         self,
@@ -88,6 +191,8 @@ class TestContext:
         use_csi_driver,
         common_config: CommonConfig,
         controller_config: ControllerConfig,
+        cluster: KindCluster = None,
+        learn_pass=None,
     ):
         self.controller = controller
         self.controller_config_dir = controller_config_dir
@@ -108,6 +213,10 @@ class TestContext:
         self.use_csi_driver = use_csi_driver
         self.common_config = common_config
         self.controller_config = controller_config
+        self.cluster = cluster if cluster is not None else KindCluster()
+        # if set, only this pass of the learn run is run when building the oracle,
+        # and the passes are postprocessed together later
+        self.learn_pass = learn_pass
         self.test_plan_content = None
         self.action_types = []
         if self.mode == sieve_modes.TEST:
@@ -148,8 +257,7 @@ class TestResult:
 
 def match_mask_regex(val):
     if type(val) is str:
-        for reg in MASK_REGS:
-            pat = re.compile(reg)
+        for pat in MASK_PATTERNS:
             if pat.match(val):
                 return True
     return False
@@ -192,6 +300,22 @@ def first_pass_learn_result_dir(learn_result_dir):
     return learn_prev_res_dir
 
 
+def learn_pass_result_dir(learn_result_dir, learn_pass, num_learn_passes):
+    """
+    Return the result dir of the learn pass (starting from 1) when building the oracle.
+    The last pass is kept in the learn result dir, the first pass is moved to learn_prev
+    and the other passes (if any) are moved to learn_prev2, learn_prev3 and so on.
+    """
+    if learn_pass == num_learn_passes:
+        return learn_result_dir
+    elif learn_pass == 1:
+        return first_pass_learn_result_dir(learn_result_dir)
+    return os.path.join(
+        os.path.dirname(learn_result_dir),
+        sieve_modes.LEARN + "_prev" + str(learn_pass),
+    )
+
+
 def dump_json_file(dir, data, json_file_name):
     json.dump(
         data, open(os.path.join(dir, json_file_name), "w"), indent=4, sort_keys=True
@@ -252,11 +376,9 @@ def get_all_controllers(dir):
 
 
 def dump_to_yaml(file_content, file_name):
-    yaml.dump(
-        file_content,
-        open(
-            file_name,
-            "w",
-        ),
-        sort_keys=False,
-    )
+    # write to a temporary file first so the readers never see a half-written file,
+    # e.g., the learn runs of the same controller read the test plans of each other
+    tmp_file_name = "{}.{}".format(file_name, os.getpid())
+    with open(tmp_file_name, "w") as tmp_file:
+        yaml.dump(file_content, tmp_file, sort_keys=False)
+    os.replace(tmp_file_name, file_name)
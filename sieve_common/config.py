@@ -17,15 +17,20 @@ class CommonConfig:
         compress_trivial_reconcile_enabled,
         workload_conditional_wait_timeout,
         workload_command_wait_timeout,
+        workload_wait_settle_period,
         generate_debugging_information_enabled,
         causality_pruning_enabled,
         effective_updates_pruning_enabled,
         nondeterministic_pruning_enabled,
         persist_test_plans_enabled,
+        parallel_test_plan_generation_enabled,
+        test_plan_dedup_enabled,
+        test_plan_dedup_across_workloads_enabled,
         field_key_mask,
         field_path_mask,
         state_update_summary_checker_mask,
         update_oracle_file_enabled,
+        oracle_learn_passes,
     ):
         self.container_registry = container_registry
         self.namespace = namespace
@@ -41,6 +46,7 @@ class CommonConfig:
         self.compress_trivial_reconcile_enabled = compress_trivial_reconcile_enabled
         self.workload_conditional_wait_timeout = workload_conditional_wait_timeout
         self.workload_command_wait_timeout = workload_command_wait_timeout
+        self.workload_wait_settle_period = workload_wait_settle_period
         self.generate_debugging_information_enabled = (
             generate_debugging_information_enabled
         )
@@ -48,17 +54,26 @@ class CommonConfig:
         self.effective_updates_pruning_enabled = effective_updates_pruning_enabled
         self.nondeterministic_pruning_enabled = nondeterministic_pruning_enabled
         self.persist_test_plans_enabled = persist_test_plans_enabled
+        self.parallel_test_plan_generation_enabled = (
+            parallel_test_plan_generation_enabled
+        )
+        self.test_plan_dedup_enabled = test_plan_dedup_enabled
+        self.test_plan_dedup_across_workloads_enabled = (
+            test_plan_dedup_across_workloads_enabled
+        )
         self.field_key_mask = field_key_mask
         self.field_path_mask = field_path_mask
         self.state_update_summary_checker_mask = state_update_summary_checker_mask
         self.update_oracle_file_enabled = update_oracle_file_enabled
+        self.oracle_learn_passes = oracle_learn_passes
 
 
-def get_common_config():
-    common_config_path = "config.json"
+def get_common_config(sieve_dir="."):
+    common_config_path = os.path.join(sieve_dir, "config.json")
     common_config = json.load(open(common_config_path))
-    if os.path.isfile("sieve_config.json"):
-        override_config = json.loads(open("sieve_config.json").read())
+    override_config_path = os.path.join(sieve_dir, "sieve_config.json")
+    if os.path.isfile(override_config_path):
+        override_config = json.loads(open(override_config_path).read())
         for key in override_config:
             common_config[key] = override_config[key]
     return CommonConfig(
@@ -84,6 +99,7 @@ def get_common_config():
             "workload_conditional_wait_timeout"
         ],
         workload_command_wait_timeout=common_config["workload_command_wait_timeout"],
+        workload_wait_settle_period=common_config["workload_wait_settle_period"],
         generate_debugging_information_enabled=[
             "generate_debugging_information_enabled"
         ],
@@ -95,12 +111,20 @@ def get_common_config():
             "nondeterministic_pruning_enabled"
         ],
         persist_test_plans_enabled=common_config["persist_test_plans_enabled"],
+        parallel_test_plan_generation_enabled=common_config[
+            "parallel_test_plan_generation_enabled"
+        ],
+        test_plan_dedup_enabled=common_config["test_plan_dedup_enabled"],
+        test_plan_dedup_across_workloads_enabled=common_config[
+            "test_plan_dedup_across_workloads_enabled"
+        ],
         field_key_mask=common_config["field_key_mask"],
         field_path_mask=common_config["field_path_mask"],
         state_update_summary_checker_mask=common_config[
             "state_update_summary_checker_mask"
         ],
         update_oracle_file_enabled=common_config["update_oracle_file_enabled"],
+        oracle_learn_passes=common_config["oracle_learn_passes"],
     )
 
 
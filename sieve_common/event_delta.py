@@ -155,6 +155,220 @@ def canonicalize_event(event: Dict, masked_keys: Set[str], masked_paths: Set[str
     canonicalize_event_as_map(event, "", masked_keys, masked_paths)
 
 
+def join_event_path(parent_path: str, key: str) -> str:
+    # same as os.path.join(parent_path, key) for two strings, without the overhead
+    if key.startswith("/"):
+        return key
+    if parent_path == "" or parent_path.endswith("/"):
+        return parent_path + key
+    return parent_path + "/" + key
+
+
+def canonicalized_event_value(
+    value, current_path: str, masked_keys: Set[str], masked_paths: Set[str]
+):
+    # return the canonicalized copy of value without touching value itself
+    if isinstance(value, dict):
+        return canonicalized_event_as_map(
+            value, current_path, masked_keys, masked_paths
+        )
+    elif isinstance(value, list):
+        return canonicalized_event_as_list(
+            value, current_path, masked_keys, masked_paths
+        )
+    elif isinstance(value, str):
+        return canonicalize_value(value)
+    else:
+        return value
+
+
+def canonicalized_event_as_list(
+    event: List, parent_path: str, masked_keys: Set[str], masked_paths: Set[str]
+) -> List:
+    current_path = join_event_path(parent_path, "*")
+    if current_path in masked_paths:
+        return [SIEVE_VALUE_MASK] * len(event)
+    return [
+        canonicalized_event_value(val, current_path, masked_keys, masked_paths)
+        for val in event
+    ]
+
+
+def canonicalized_event_as_map(
+    event: Dict, parent_path: str, masked_keys: Set[str], masked_paths: Set[str]
+) -> Dict:
+    canonicalized = {}
+    for key in event:
+        current_path = join_event_path(parent_path, key)
+        if key in masked_keys or current_path in masked_paths:
+            canonicalized[key] = SIEVE_VALUE_MASK
+        else:
+            canonicalized[key] = canonicalized_event_value(
+                event[key], current_path, masked_keys, masked_paths
+            )
+    return canonicalized
+
+
+def canonicalized_event(
+    event: Dict, masked_keys: Set[str], masked_paths: Set[str]
+) -> Dict:
+    return canonicalized_event_as_map(event, "", masked_keys, masked_paths)
+
+
+def diff_canonicalized_event_as_list(
+    prev_event: List,
+    cur_event: List,
+    parent_path: str,
+    masked_keys: Set[str],
+    masked_paths: Set[str],
+) -> Tuple[Optional[List], Optional[List]]:
+    # same as diff_event_as_list(canonicalized prev_event, canonicalized cur_event)
+    # but only the parts showing up in the diff get canonicalized (and copied)
+    current_path = join_event_path(parent_path, "*")
+    masked = current_path in masked_paths
+    prev_len = len(prev_event)
+    cur_len = len(cur_event)
+    min_len = min(prev_len, cur_len)
+    diff_prev_event = [SIEVE_IDX_SKIP] * prev_len
+    diff_cur_event = [SIEVE_IDX_SKIP] * cur_len
+    keep = False
+    for i in range(min_len):
+        if masked:
+            # both are masked to the same value
+            continue
+        prev_val = prev_event[i]
+        cur_val = cur_event[i]
+        if prev_val == cur_val:
+            continue
+        if isinstance(cur_val, dict) and isinstance(prev_val, dict):
+            sub_diff_prev_event, sub_diff_cur_event = diff_canonicalized_event_as_map(
+                prev_val, cur_val, current_path, masked_keys, masked_paths
+            )
+            if sub_diff_prev_event is None or sub_diff_cur_event is None:
+                continue
+        elif isinstance(cur_val, list) and isinstance(prev_val, list):
+            sub_diff_prev_event, sub_diff_cur_event = diff_canonicalized_event_as_list(
+                prev_val, cur_val, current_path, masked_keys, masked_paths
+            )
+            if sub_diff_prev_event is None or sub_diff_cur_event is None:
+                continue
+        elif different_canonicalized_event_value(prev_val, cur_val):
+            sub_diff_prev_event = canonicalized_event_value(
+                prev_val, current_path, masked_keys, masked_paths
+            )
+            sub_diff_cur_event = canonicalized_event_value(
+                cur_val, current_path, masked_keys, masked_paths
+            )
+        else:
+            continue
+        diff_prev_event[i] = sub_diff_prev_event
+        diff_cur_event[i] = sub_diff_cur_event
+        if not (
+            sub_diff_prev_event == SIEVE_IDX_SKIP
+            and sub_diff_cur_event == SIEVE_IDX_SKIP
+        ):
+            keep = True
+    for i in range(min_len, prev_len):
+        diff_prev_event[i] = (
+            SIEVE_VALUE_MASK
+            if masked
+            else canonicalized_event_value(
+                prev_event[i], current_path, masked_keys, masked_paths
+            )
+        )
+    for i in range(min_len, cur_len):
+        diff_cur_event[i] = (
+            SIEVE_VALUE_MASK
+            if masked
+            else canonicalized_event_value(
+                cur_event[i], current_path, masked_keys, masked_paths
+            )
+        )
+    if cur_len == prev_len and not keep:
+        return None, None
+    return diff_prev_event, diff_cur_event
+
+
+def diff_canonicalized_event_as_map(
+    prev_event: Dict,
+    cur_event: Dict,
+    parent_path: str,
+    masked_keys: Set[str],
+    masked_paths: Set[str],
+) -> Tuple[Optional[Dict], Optional[Dict]]:
+    # same as diff_event_as_map(canonicalized prev_event, canonicalized cur_event)
+    # but only the parts showing up in the diff get canonicalized (and copied)
+    diff_prev_event = {}
+    diff_cur_event = {}
+
+    common_keys = set(cur_event.keys()).intersection(prev_event.keys())
+    pdc_keys = set(prev_event.keys()).difference(cur_event.keys())
+    cdp_keys = set(cur_event.keys()).difference(prev_event.keys())
+    for key in common_keys:
+        current_path = join_event_path(parent_path, key)
+        if key in masked_keys or current_path in masked_paths:
+            # both are masked to the same value
+            continue
+        prev_val = prev_event[key]
+        cur_val = cur_event[key]
+        if prev_val == cur_val:
+            # canonicalization does not make equal values different
+            continue
+        if isinstance(cur_val, dict) and isinstance(prev_val, dict):
+            sub_diff_prev_event, sub_diff_cur_event = diff_canonicalized_event_as_map(
+                prev_val, cur_val, current_path, masked_keys, masked_paths
+            )
+            if sub_diff_prev_event is None or sub_diff_cur_event is None:
+                continue
+            diff_prev_event[key] = sub_diff_prev_event
+            diff_cur_event[key] = sub_diff_cur_event
+        elif isinstance(cur_val, list) and isinstance(prev_val, list):
+            sub_diff_prev_event, sub_diff_cur_event = diff_canonicalized_event_as_list(
+                prev_val, cur_val, current_path, masked_keys, masked_paths
+            )
+            if sub_diff_prev_event is None or sub_diff_cur_event is None:
+                continue
+            diff_prev_event[key] = sub_diff_prev_event
+            diff_cur_event[key] = sub_diff_cur_event
+        elif different_canonicalized_event_value(prev_val, cur_val):
+            diff_prev_event[key] = canonicalized_event_value(
+                prev_val, current_path, masked_keys, masked_paths
+            )
+            diff_cur_event[key] = canonicalized_event_value(
+                cur_val, current_path, masked_keys, masked_paths
+            )
+    for key in pdc_keys:
+        current_path = join_event_path(parent_path, key)
+        if key in masked_keys or current_path in masked_paths:
+            diff_prev_event[key] = SIEVE_VALUE_MASK
+        else:
+            diff_prev_event[key] = canonicalized_event_value(
+                prev_event[key], current_path, masked_keys, masked_paths
+            )
+    for key in cdp_keys:
+        current_path = join_event_path(parent_path, key)
+        if key in masked_keys or current_path in masked_paths:
+            diff_cur_event[key] = SIEVE_VALUE_MASK
+        else:
+            diff_cur_event[key] = canonicalized_event_value(
+                cur_event[key], current_path, masked_keys, masked_paths
+            )
+    if len(diff_cur_event) == 0 and len(diff_prev_event) == 0:
+        return None, None
+    return diff_prev_event, diff_cur_event
+
+
+def different_canonicalized_event_value(prev_val, cur_val) -> bool:
+    # prev_val and cur_val are not both dicts or both lists
+    if isinstance(prev_val, (dict, list)) or isinstance(cur_val, (dict, list)):
+        return True
+    if isinstance(prev_val, str):
+        prev_val = canonicalize_value(prev_val)
+    if isinstance(cur_val, str):
+        cur_val = canonicalize_value(cur_val)
+    return prev_val != cur_val
+
+
 def diff_event(
     prev_event: Dict,
     cur_event: Dict,
@@ -163,6 +377,33 @@ def diff_event(
     trim_ka=False,
     can=True,
 ) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    Return the slim prev_event and slim cur_event only keeping the different parts.
+    prev_event and cur_event are not modified or copied: the two objects are walked together,
+    and the masks are applied on the way (when can is True) to the parts being compared.
+    If can is False, the returned objects can share sub-objects with prev_event and cur_event.
+    """
+    if trim_ka:
+        prev_event = dict(prev_event)
+        cur_event = dict(cur_event)
+        trim_kind_apiversion(prev_event)
+        trim_kind_apiversion(cur_event)
+    if can:
+        return diff_canonicalized_event_as_map(
+            prev_event, cur_event, "", masked_keys, masked_paths
+        )
+    return diff_event_as_map(prev_event, cur_event)
+
+
+def diff_event_with_copy(
+    prev_event: Dict,
+    cur_event: Dict,
+    masked_keys: Set[str],
+    masked_paths: Set[str],
+    trim_ka=False,
+    can=True,
+) -> Tuple[Optional[Dict], Optional[Dict]]:
+    # the old diff_event which canonicalizes the full copies of both objects before diffing
     prev_event_copy = copy.deepcopy(prev_event)
     cur_event_copy = copy.deepcopy(cur_event)
     if trim_ka:
@@ -226,6 +467,130 @@ def part_of_event_as_map(small_event: Dict, large_event: Dict) -> bool:
     return True
 
 
+def part_of_event_constraints(
+    small_event: Dict, parent_path: Tuple = ()
+) -> List[Tuple[Tuple, Tuple]]:
+    """
+    Flatten small_event into the (path, shape) checks done by part_of_event_as_map,
+    so part_of_event_as_map(small_event, large_event) holds iff
+    get_event_shape_by_path(large_event, path) == shape for every returned check.
+    """
+    constraints = []
+    for key in small_event:
+        constraints += part_of_event_value_constraints(
+            small_event[key], parent_path + (key,)
+        )
+    return constraints
+
+
+def part_of_event_value_constraints(
+    small_val, current_path: Tuple
+) -> List[Tuple[Tuple, Tuple]]:
+    if isinstance(small_val, dict):
+        return [(current_path, ("dict",))] + part_of_event_constraints(
+            small_val, current_path
+        )
+    elif isinstance(small_val, list):
+        constraints = [(current_path, ("list", len(small_val)))]
+        for i in range(len(small_val)):
+            if small_val[i] == SIEVE_IDX_SKIP:
+                continue
+            constraints += part_of_event_value_constraints(
+                small_val[i], current_path + (i,)
+            )
+        return constraints
+    else:
+        return [(current_path, ("value", small_val))]
+
+
+def get_event_shape_by_path(event: Dict, path: Tuple) -> Tuple:
+    value = event
+    for step in path:
+        if isinstance(value, dict) and not isinstance(step, int) and step in value:
+            value = value[step]
+        elif isinstance(value, list) and isinstance(step, int) and step < len(value):
+            value = value[step]
+        else:
+            return ("missing",)
+    if isinstance(value, dict):
+        return ("dict",)
+    elif isinstance(value, list):
+        return ("list", len(value))
+    else:
+        return ("value", value)
+
+
+def part_of_canonicalized_event_as_list(
+    small_event: List,
+    large_event: List,
+    parent_path: str,
+    masked_keys: Set[str],
+    masked_paths: Set[str],
+) -> bool:
+    # same as part_of_event_as_list(small_event, canonicalized large_event)
+    if len(small_event) != len(large_event):
+        return False
+    current_path = join_event_path(parent_path, "*")
+    masked = current_path in masked_paths
+    for i in range(len(small_event)):
+        small_val = small_event[i]
+        if small_val == SIEVE_IDX_SKIP:
+            continue
+        large_val = SIEVE_VALUE_MASK if masked else large_event[i]
+        if not part_of_canonicalized_event_value(
+            small_val, large_val, current_path, masked_keys, masked_paths
+        ):
+            return False
+    return True
+
+
+def part_of_canonicalized_event_as_map(
+    small_event: Dict,
+    large_event: Dict,
+    parent_path: str,
+    masked_keys: Set[str],
+    masked_paths: Set[str],
+) -> bool:
+    # same as part_of_event_as_map(small_event, canonicalized large_event)
+    for key in small_event:
+        if key not in large_event:
+            return False
+    for key in small_event:
+        current_path = join_event_path(parent_path, key)
+        if key in masked_keys or current_path in masked_paths:
+            large_val = SIEVE_VALUE_MASK
+        else:
+            large_val = large_event[key]
+        if not part_of_canonicalized_event_value(
+            small_event[key], large_val, current_path, masked_keys, masked_paths
+        ):
+            return False
+    return True
+
+
+def part_of_canonicalized_event_value(
+    small_val,
+    large_val,
+    current_path: str,
+    masked_keys: Set[str],
+    masked_paths: Set[str],
+) -> bool:
+    if isinstance(small_val, dict):
+        return isinstance(large_val, dict) and part_of_canonicalized_event_as_map(
+            small_val, large_val, current_path, masked_keys, masked_paths
+        )
+    elif isinstance(small_val, list):
+        return isinstance(large_val, list) and part_of_canonicalized_event_as_list(
+            small_val, large_val, current_path, masked_keys, masked_paths
+        )
+    elif isinstance(large_val, (dict, list)):
+        return False
+    elif isinstance(large_val, str):
+        return small_val == canonicalize_value(large_val)
+    else:
+        return small_val == large_val
+
+
 def conflicting_event_payload(
     small_event: Optional[Dict],
     large_event: Dict,
@@ -234,9 +599,9 @@ def conflicting_event_payload(
 ) -> bool:
     if small_event is None:
         return False
-    large_event_copy = copy.deepcopy(large_event)
-    canonicalize_event(large_event_copy, masked_keys, masked_paths)
-    return not part_of_event_as_map(small_event, large_event_copy)
+    return not part_of_canonicalized_event_as_map(
+        small_event, large_event, "", masked_keys, masked_paths
+    )
 
 
 def same_key(prev_event: Dict, cur_event: Dict) -> bool:
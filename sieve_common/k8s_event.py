@@ -1,8 +1,8 @@
 import json
 import resource
-from typing import Dict, List, Set, Union
-from pathlib import PurePath
+from typing import Dict, List, Optional, Set, Union
 from sieve_common.event_delta import conflicting_event_payload
+from sieve_common.mask import compile_key_mask_map
 
 HEAR_READ_FILTER_FLAG = True
 ERROR_MSG_FILTER_FLAG = True
@@ -178,23 +178,28 @@ def parse_key(key: str):
 
 
 def get_mask_by_resource_key(key_mask_map, resource_key):
-    # TODO: converting the list to a string may lead to ambiguity
-    # consider two lists: ["a", "b", "c"] and ["a/b", "c"]
-    # after converting to string they look the same
-    masked_keys = []
-    for key in key_mask_map:
-        if key == resource_key or PurePath("/" + resource_key).match("/" + key):
-            for field_path_list in key_mask_map[key]:
-                assert isinstance(field_path_list, List)
-                assert len(field_path_list) > 0
-                if len(field_path_list) == 1:
-                    masked_keys.append(field_path_list[0])
-                else:
-                    masked_keys.append("/".join(field_path_list))
-    return masked_keys
+    # the masks are compiled once per key_mask_map and cached per resource key
+    return list(compile_key_mask_map(key_mask_map).masks(resource_key))
+
+
+# The event classes below use __slots__ since a learn run can record hundreds of
+# thousands of events. The embedded object (json) is only decoded on the first access
+# to the attributes derived from it, since many events are never looked at again.
+# Assigning None to a slot marks the derived attribute as not decoded yet.
 
 
 class APIEvent:
+    __slots__ = (
+        "etype",
+        "key",
+        "rtype",
+        "namespace",
+        "name",
+        "obj_str",
+        "_original_key",
+        "_obj_map",
+    )
+
     def __init__(
         self,
         etype: str,
@@ -204,42 +209,20 @@ class APIEvent:
         name: str,
         obj_str: str,
     ):
-        self.__etype = etype
-        self.__original_key = orignal_key
-        self.__key = generate_key(rtype, namespace, name)
-        self.__rtype = rtype
-        self.__namespace = namespace
-        self.__name = name
-        self.__obj_str = obj_str
-        self.__obj_map = json.loads(obj_str)
-
-    @property
-    def etype(self):
-        return self.__etype
-
-    @property
-    def key(self):
-        return self.__key
-
-    @property
-    def rtype(self):
-        return self.__rtype
-
-    @property
-    def namespace(self):
-        return self.__namespace
-
-    @property
-    def name(self):
-        return self.__name
-
-    @property
-    def obj_str(self):
-        return self.__obj_str
+        self.etype = etype
+        self._original_key = orignal_key
+        self.key = generate_key(rtype, namespace, name)
+        self.rtype = rtype
+        self.namespace = namespace
+        self.name = name
+        self.obj_str = obj_str
+        self._obj_map = None
 
     @property
     def obj_map(self):
-        return self.__obj_map
+        if self._obj_map is None:
+            self._obj_map = json.loads(self.obj_str)
+        return self._obj_map
 
     def get_metadata_value(self, mkey):
         if mkey in self.obj_map:
@@ -251,112 +234,82 @@ class APIEvent:
 
 
 class ControllerHear:
-    def __init__(self, id: str, etype: str, rtype: str, obj_str: str):
-        self.__id = int(id)
-        self.__etype = etype
-        self.__rtype = rtype
-        self.__obj_str = obj_str
-        self.__obj_map = json.loads(obj_str)
-        self.__namespace, self.__name = extract_namespace_name(self.obj_map)
-        self.__start_timestamp = -1
-        self.__end_timestamp = -1
-        self.__key = generate_key(self.rtype, self.namespace, self.name)
-        self.__slim_prev_obj_map = None
-        self.__slim_cur_obj_map = None
-        self.__prev_etype = EVENT_NONE_TYPE
-        self.__cancelled_by = set()
-        self.__signature_counter = 1
-
-    @property
-    def id(self):
-        return self.__id
-
-    @property
-    def etype(self):
-        return self.__etype
-
-    @property
-    def rtype(self):
-        return self.__rtype
+    __slots__ = (
+        "id",
+        "etype",
+        "rtype",
+        "obj_str",
+        "start_timestamp",
+        "end_timestamp",
+        "slim_prev_obj_map",
+        "slim_cur_obj_map",
+        "prev_etype",
+        "cancelled_by",
+        "signature_counter",
+        "_obj_map",
+        "_namespace",
+        "_name",
+        "_key",
+    )
 
-    @property
-    def obj_str(self):
-        return self.__obj_str
+    def __init__(self, id: str, etype: str, rtype: str, obj_str: str):
+        self.id = int(id)
+        self.etype = etype
+        self.rtype = rtype
+        self.obj_str = obj_str
+        self._obj_map = None
+        self._namespace = None
+        self._name = None
+        self._key = None
+        self.start_timestamp = -1
+        self.end_timestamp = -1
+        self.slim_prev_obj_map = None
+        self.slim_cur_obj_map = None
+        self.prev_etype = EVENT_NONE_TYPE
+        self.cancelled_by = set()
+        self.signature_counter = 1
 
     @property
     def obj_map(self):
-        return self.__obj_map
+        if self._obj_map is None:
+            self._obj_map = json.loads(self.obj_str)
+        return self._obj_map
 
     @property
     def namespace(self):
-        return self.__namespace
+        if self._namespace is None:
+            self._namespace, self._name = extract_namespace_name(self.obj_map)
+        return self._namespace
 
     @property
     def name(self):
-        return self.__name
-
-    @property
-    def start_timestamp(self):
-        return self.__start_timestamp
-
-    @property
-    def end_timestamp(self):
-        return self.__end_timestamp
+        if self._name is None:
+            self._namespace, self._name = extract_namespace_name(self.obj_map)
+        return self._name
 
     @property
     def key(self):
-        return self.__key
-
-    @property
-    def slim_prev_obj_map(self):
-        return self.__slim_prev_obj_map
-
-    @property
-    def slim_cur_obj_map(self):
-        return self.__slim_cur_obj_map
-
-    @property
-    def prev_etype(self):
-        return self.__prev_etype
-
-    @property
-    def cancelled_by(self):
-        return self.__cancelled_by
-
-    @property
-    def signature_counter(self):
-        return self.__signature_counter
-
-    @start_timestamp.setter
-    def start_timestamp(self, start_timestamp: int):
-        self.__start_timestamp = start_timestamp
-
-    @end_timestamp.setter
-    def end_timestamp(self, end_timestamp: int):
-        self.__end_timestamp = end_timestamp
-
-    @slim_prev_obj_map.setter
-    def slim_prev_obj_map(self, slim_prev_obj_map: Dict):
-        self.__slim_prev_obj_map = slim_prev_obj_map
-
-    @slim_cur_obj_map.setter
-    def slim_cur_obj_map(self, slim_cur_obj_map: Dict):
-        self.__slim_cur_obj_map = slim_cur_obj_map
-
-    @prev_etype.setter
-    def prev_etype(self, prev_etype: str):
-        self.__prev_etype = prev_etype
-
-    @cancelled_by.setter
-    def cancelled_by(self, cancelled_by: Set):
-        self.__cancelled_by = cancelled_by
-
-    @signature_counter.setter
-    def signature_counter(self, signature_counter: int):
-        self.__signature_counter = signature_counter
+        if self._key is None:
+            self._key = generate_key(self.rtype, self.namespace, self.name)
+        return self._key
 
 
 class ControllerNonK8sWrite:
+    __slots__ = (
+        "id",
+        "module",
+        "file_path",
+        "recv_type",
+        "fun_name",
+        "reconcile_fun",
+        "reconcile_id",
+        "start_timestamp",
+        "end_timestamp",
+        "range_start_timestamp",
+        "range_end_timestamp",
+        "signature_counter",
+    )
+
     def __init__(
         self,
         id: str,
@@ -366,97 +319,51 @@ class ControllerNonK8sWrite:
         fun_name: str,
         reconcile_fun: str,
     ):
-        self.__id = int(id)
-        self.__module = module
-        self.__file_path = file_path
-        self.__recv_type = recv_type
-        self.__fun_name = fun_name
-        self.__reconcile_fun = reconcile_fun
-        self.__reconcile_id = -1
-        self.__start_timestamp = -1
-        self.__end_timestamp = -1
-        self.__range_start_timestamp = -1
-        self.__range_end_timestamp = -1
-        self.__signature_counter = 1
-
-    @property
-    def id(self):
-        return self.__id
-
-    @property
-    def module(self):
-        return self.__module
-
-    @property
-    def file_path(self):
-        return self.__file_path
-
-    @property
-    def recv_type(self):
-        return self.__recv_type
-
-    @property
-    def fun_name(self):
-        return self.__fun_name
-
-    @property
-    def reconcile_fun(self):
-        return self.__reconcile_fun
-
-    @property
-    def reconcile_id(self):
-        return self.__reconcile_id
-
-    @property
-    def start_timestamp(self):
-        return self.__start_timestamp
-
-    @property
-    def end_timestamp(self):
-        return self.__end_timestamp
-
-    @property
-    def range_start_timestamp(self):
-        return self.__range_start_timestamp
-
-    @property
-    def range_end_timestamp(self):
-        return self.__range_end_timestamp
-
-    @property
-    def signature_counter(self):
-        return self.__signature_counter
-
-    @reconcile_fun.setter
-    def reconcile_fun(self, reconcile_fun: str):
-        self.__reconcile_fun = reconcile_fun
-
-    @reconcile_id.setter
-    def reconcile_id(self, reconcile_id: int):
-        self.__reconcile_id = reconcile_id
-
-    @start_timestamp.setter
-    def start_timestamp(self, start_timestamp: int):
-        self.__start_timestamp = start_timestamp
-
-    @end_timestamp.setter
-    def end_timestamp(self, end_timestamp: int):
-        self.__end_timestamp = end_timestamp
-
-    @range_start_timestamp.setter
-    def range_start_timestamp(self, range_start_timestamp: int):
-        self.__range_start_timestamp = range_start_timestamp
-
-    @range_end_timestamp.setter
-    def range_end_timestamp(self, range_end_timestamp: int):
-        self.__range_end_timestamp = range_end_timestamp
+        self.id = int(id)
+        self.module = module
+        self.file_path = file_path
+        self.recv_type = recv_type
+        self.fun_name = fun_name
+        self.reconcile_fun = reconcile_fun
+        self.reconcile_id = -1
+        self.start_timestamp = -1
+        self.end_timestamp = -1
+        self.range_start_timestamp = -1
+        self.range_end_timestamp = -1
+        self.signature_counter = 1
 
-    @signature_counter.setter
-    def signature_counter(self, signature_counter: int):
-        self.__signature_counter = signature_counter
+    def set_range(self, start_timestamp: int, end_timestamp: int):
+        assert start_timestamp < end_timestamp
+        self.range_start_timestamp = start_timestamp
+        self.range_end_timestamp = end_timestamp
 
 
 class ControllerWrite:
+    __slots__ = (
+        "id",
+        "etype",
+        "rtype",
+        "reconcile_fun",
+        "reconcile_id",
+        "error",
+        "obj_str",
+        "namespace",
+        "start_timestamp",
+        "end_timestamp",
+        "range_start_timestamp",
+        "range_end_timestamp",
+        "read_types",
+        "read_keys",
+        "prev_obj_map",
+        "slim_prev_obj_map",
+        "slim_cur_obj_map",
+        "prev_etype",
+        "signature_counter",
+        "_obj_map",
+        "_name",
+        "_key",
+    )
+
     def __init__(
         self,
         id: str,
@@ -468,170 +375,70 @@ class ControllerWrite:
         name: str,
         obj_str: str,
     ):
-        self.__id = int(id)
+        self.id = int(id)
         # do not handle DELETEALLOF for now
         assert etype != ControllerWriteTypes.DELETEALLOF
-        self.__etype = etype
-        self.__rtype = rtype
-        self.__reconcile_fun = reconcile_fun
-        self.__reconcile_id = -1
-        self.__error = error
-        self.__obj_str = obj_str
-        self.__obj_map = json.loads(obj_str)
-        self.__namespace = namespace
-        self.__name = name if name != "" else extract_name(self.obj_map)
-        self.__start_timestamp = -1
-        self.__end_timestamp = -1
-        self.__range_start_timestamp = -1
-        self.__range_end_timestamp = -1
-        self.__read_types = set()
-        self.__read_keys = set()
-        self.__key = generate_key(self.rtype, self.namespace, self.name)
-        self.__prev_obj_map = None
-        self.__slim_prev_obj_map = None
-        self.__slim_cur_obj_map = None
-        self.__prev_etype = EVENT_NONE_TYPE
-        self.__signature_counter = 1
-
-    @property
-    def id(self):
-        return self.__id
-
-    @property
-    def etype(self):
-        return self.__etype
-
-    @property
-    def rtype(self):
-        return self.__rtype
-
-    @property
-    def reconcile_fun(self):
-        return self.__reconcile_fun
-
-    @property
-    def reconcile_id(self):
-        return self.__reconcile_id
-
-    @property
-    def error(self):
-        return self.__error
-
-    @property
-    def obj_str(self):
-        return self.__obj_str
+        self.etype = etype
+        self.rtype = rtype
+        self.reconcile_fun = reconcile_fun
+        self.reconcile_id = -1
+        self.error = error
+        self.obj_str = obj_str
+        self._obj_map = None
+        self.namespace = namespace
+        # the name is taken from the object if it is not recorded
+        self._name = name if name != "" else None
+        self._key = None
+        self.start_timestamp = -1
+        self.end_timestamp = -1
+        self.range_start_timestamp = -1
+        self.range_end_timestamp = -1
+        self.read_types = set()
+        self.read_keys = set()
+        self.prev_obj_map = None
+        self.slim_prev_obj_map = None
+        self.slim_cur_obj_map = None
+        self.prev_etype = EVENT_NONE_TYPE
+        self.signature_counter = 1
 
     @property
     def obj_map(self):
-        return self.__obj_map
-
-    @property
-    def namespace(self):
-        return self.__namespace
+        if self._obj_map is None:
+            self._obj_map = json.loads(self.obj_str)
+        return self._obj_map
 
     @property
     def name(self):
-        return self.__name
-
-    @property
-    def read_types(self):
-        return self.__read_types
-
-    @property
-    def read_keys(self):
-        return self.__read_keys
-
-    @property
-    def start_timestamp(self):
-        return self.__start_timestamp
-
-    @property
-    def end_timestamp(self):
-        return self.__end_timestamp
-
-    @property
-    def range_start_timestamp(self):
-        return self.__range_start_timestamp
-
-    @property
-    def range_end_timestamp(self):
-        return self.__range_end_timestamp
+        if self._name is None:
+            self._name = extract_name(self.obj_map)
+        return self._name
 
     @property
     def key(self):
-        return self.__key
-
-    @property
-    def prev_obj_map(self):
-        return self.__prev_obj_map
-
-    @property
-    def slim_prev_obj_map(self):
-        return self.__slim_prev_obj_map
-
-    @property
-    def slim_cur_obj_map(self):
-        return self.__slim_cur_obj_map
-
-    @property
-    def prev_etype(self):
-        return self.__prev_etype
-
-    @property
-    def signature_counter(self):
-        return self.__signature_counter
-
-    @reconcile_fun.setter
-    def reconcile_fun(self, reconcile_fun: str):
-        self.__reconcile_fun = reconcile_fun
-
-    @reconcile_id.setter
-    def reconcile_id(self, reconcile_id: int):
-        self.__reconcile_id = reconcile_id
-
-    @start_timestamp.setter
-    def start_timestamp(self, start_timestamp: int):
-        self.__start_timestamp = start_timestamp
-
-    @end_timestamp.setter
-    def end_timestamp(self, end_timestamp: int):
-        self.__end_timestamp = end_timestamp
-
-    @read_types.setter
-    def read_types(self, read_types: Set[str]):
-        self.__read_types = read_types
-
-    @read_keys.setter
-    def read_keys(self, read_keys: Set[str]):
-        self.__read_keys = read_keys
-
-    @prev_obj_map.setter
-    def prev_obj_map(self, prev_obj_map: Dict):
-        self.__prev_obj_map = prev_obj_map
-
-    @slim_prev_obj_map.setter
-    def slim_prev_obj_map(self, slim_prev_obj_map: Dict):
-        self.__slim_prev_obj_map = slim_prev_obj_map
-
-    @slim_cur_obj_map.setter
-    def slim_cur_obj_map(self, slim_cur_obj_map: Dict):
-        self.__slim_cur_obj_map = slim_cur_obj_map
-
-    @prev_etype.setter
-    def prev_etype(self, prev_etype: str):
-        self.__prev_etype = prev_etype
-
-    @signature_counter.setter
-    def signature_counter(self, signature_counter: int):
-        self.__signature_counter = signature_counter
+        if self._key is None:
+            self._key = generate_key(self.rtype, self.namespace, self.name)
+        return self._key
 
     def set_range(self, start_timestamp: int, end_timestamp: int):
         assert start_timestamp < end_timestamp
-        self.__range_start_timestamp = start_timestamp
-        self.__range_end_timestamp = end_timestamp
+        self.range_start_timestamp = start_timestamp
+        self.range_end_timestamp = end_timestamp
 
 
 class ControllerRead:
+    __slots__ = (
+        "etype",
+        "from_cache",
+        "rtype",
+        "reconcile_fun",
+        "reconcile_id",
+        "error",
+        "end_timestamp",
+        "_obj_str",
+        "_key_set",
+        "_key_to_obj",
+    )
+
     def __init__(
         self,
         etype: str,
@@ -643,21 +450,30 @@ class ControllerRead:
         error: str,
         obj_str: str,
     ):
-        self.__etype = etype
-        self.__from_cache = True if from_cache == "true" else False
-        self.__rtype = rtype
-        self.__reconcile_fun = reconcile_fun
-        self.__reconcile_id = -1
-        self.__error = error
-        self.__key_to_obj = {}
-        self.__key_set = set()
-        self.__end_timestamp = -1
+        self.etype = etype
+        self.from_cache = True if from_cache == "true" else False
+        self.rtype = rtype
+        self.reconcile_fun = reconcile_fun
+        self.reconcile_id = -1
+        self.error = error
+        self.end_timestamp = -1
+        self._obj_str = obj_str
+        self._key_to_obj = None
         if etype == "Get":
-            key = generate_key(self.rtype, namespace, name)
-            self.key_set.add(key)
-            self.key_to_obj[key] = json.loads(obj_str)
+            # the key of a Get is known without decoding the object
+            self._key_set = {generate_key(self.rtype, namespace, name)}
         else:
-            objs = json.loads(obj_str)
+            self._key_set = None
+
+    def decode(self):
+        key_set = set()
+        key_to_obj = {}
+        if self.etype == "Get":
+            key = next(iter(self._key_set))
+            key_set.add(key)
+            key_to_obj[key] = json.loads(self._obj_str)
+        else:
+            objs = json.loads(self._obj_str)
             if objs is not None:
                 for obj in objs:
                     key = generate_key(
@@ -667,244 +483,254 @@ class ControllerRead:
                         else DEFAULT_NS,
                         obj["metadata"]["name"],
                     )
-                    assert key not in self.key_set
-                    assert key not in self.key_to_obj
-                    self.key_set.add(key)
-                    self.key_to_obj[key] = obj
-
-    @property
-    def etype(self):
-        return self.__etype
-
-    @property
-    def from_cache(self):
-        return self.__from_cache
-
-    @property
-    def rtype(self):
-        return self.__rtype
-
-    @property
-    def reconcile_fun(self):
-        return self.__reconcile_fun
-
-    @property
-    def reconcile_id(self):
-        return self.__reconcile_id
-
-    @property
-    def error(self):
-        return self.__error
+                    assert key not in key_set
+                    assert key not in key_to_obj
+                    key_set.add(key)
+                    key_to_obj[key] = obj
+        self._key_set = key_set
+        self._key_to_obj = key_to_obj
 
     @property
     def key_set(self):
-        return self.__key_set
+        if self._key_set is None:
+            self.decode()
+        return self._key_set
 
     @property
     def key_to_obj(self):
-        return self.__key_to_obj
-
-    @property
-    def end_timestamp(self):
-        return self.__end_timestamp
-
-    @end_timestamp.setter
-    def end_timestamp(self, end_timestamp: int):
-        self.__end_timestamp = end_timestamp
-
-    @reconcile_id.setter
-    def reconcile_id(self, reconcile_id: int):
-        self.__reconcile_id = reconcile_id
+        if self._key_to_obj is None:
+            self.decode()
+        return self._key_to_obj
 
 
 class ControllerHearIDOnly:
-    def __init__(self, id: str):
-        self.__id = int(id)
+    __slots__ = ("id",)
 
-    @property
-    def id(self):
-        return self.__id
+    def __init__(self, id: str):
+        self.id = int(id)
 
 
 class ControllerWriteIDOnly:
-    def __init__(self, id: str):
-        self.__id = int(id)
+    __slots__ = ("id",)
 
-    @property
-    def id(self):
-        return self.__id
+    def __init__(self, id: str):
+        self.id = int(id)
 
 
 class ControllerNonK8sWriteIDOnly:
-    def __init__(self, id: str):
-        self.__id = int(id)
+    __slots__ = ("id",)
 
-    @property
-    def id(self):
-        return self.__id
+    def __init__(self, id: str):
+        self.id = int(id)
 
 
 class ReconcileBegin:
-    def __init__(self, reconcile_fun: str, reconcile_id: str):
-        self.__reconcile_fun = reconcile_fun
-        self.__reconcile_id = reconcile_id
-        self.__end_timestamp = -1
-
-    @property
-    def reconcile_fun(self):
-        return self.__reconcile_fun
-
-    @property
-    def reconcile_id(self):
-        return self.__reconcile_id
+    __slots__ = ("reconcile_fun", "reconcile_id", "end_timestamp")
 
-    @property
-    def end_timestamp(self):
-        return self.__end_timestamp
-
-    @end_timestamp.setter
-    def end_timestamp(self, end_timestamp: int):
-        self.__end_timestamp = end_timestamp
+    def __init__(self, reconcile_fun: str, reconcile_id: str):
+        self.reconcile_fun = reconcile_fun
+        self.reconcile_id = reconcile_id
+        self.end_timestamp = -1
 
 
 class ReconcileEnd:
-    def __init__(self, reconcile_fun: str, reconcile_id: str):
-        self.__reconcile_fun = reconcile_fun
-        self.__reconcile_id = reconcile_id
-        self.__end_timestamp = -1
-
-    @property
-    def reconcile_fun(self):
-        return self.__reconcile_fun
+    __slots__ = ("reconcile_fun", "reconcile_id", "end_timestamp")
 
-    @property
-    def reconcile_id(self):
-        return self.__reconcile_id
+    def __init__(self, reconcile_fun: str, reconcile_id: str):
+        self.reconcile_fun = reconcile_fun
+        self.reconcile_id = reconcile_id
+        self.end_timestamp = -1
+
+
+# The layout of the events logged by the sieve server, i.e., the index of each field
+# in the tab separated tokens of the line starting from the mark (tokens[0] is the mark).
+# Both the parse_* functions below and the binary trace (sieve_common/trace.py)
+# read the events with these layouts, and the field names are the trace columns.
+SIEVE_BEFORE_HEAR_LAYOUT = {"id": 1, "etype": 2, "rtype": 3, "obj": 4}
+SIEVE_AFTER_HEAR_LAYOUT = {"id": 1}
+SIEVE_BEFORE_REST_WRITE_LAYOUT = {"id": 1}
+SIEVE_AFTER_REST_WRITE_LAYOUT = {
+    "id": 1,
+    "etype": 2,
+    "reconcile_fun": 3,
+    "error": 4,
+    "rtype": 5,
+    "namespace": 6,
+    "name": 7,
+    "obj": 8,
+}
+# the rest reads carry one more token before the read type
+SIEVE_AFTER_REST_READ_ETYPE_INDEX = 2
+SIEVE_AFTER_REST_GET_LAYOUT = {
+    "etype": 2,
+    "reconcile_fun": 3,
+    "error": 4,
+    "rtype": 5,
+    "namespace": 6,
+    "name": 7,
+    "obj": 8,
+}
+SIEVE_AFTER_REST_LIST_LAYOUT = {
+    "etype": 2,
+    "reconcile_fun": 3,
+    "error": 4,
+    "rtype": 5,
+    "obj": 8,
+}
+SIEVE_AFTER_CACHE_READ_ETYPE_INDEX = 1
+SIEVE_AFTER_CACHE_GET_LAYOUT = {
+    "etype": 1,
+    "rtype": 2,
+    "namespace": 3,
+    "name": 4,
+    "reconcile_fun": 5,
+    "error": 6,
+    "obj": 7,
+}
+SIEVE_AFTER_CACHE_LIST_LAYOUT = {
+    "etype": 1,
+    "rtype": 2,
+    "reconcile_fun": 3,
+    "error": 4,
+    "obj": 5,
+}
+SIEVE_BEFORE_ANNOTATED_API_INVOCATION_LAYOUT = {"id": 1}
+SIEVE_AFTER_ANNOTATED_API_INVOCATION_LAYOUT = {
+    "id": 1,
+    "module": 2,
+    "file_path": 3,
+    "recv_type": 4,
+    "fun_name": 5,
+    "reconcile_fun": 6,
+}
+SIEVE_RECONCILE_LAYOUT = {"reconcile_fun": 1, "reconcile_id": 2}
+
+# The layout of each mark, except the reads whose layout depends on the read type
+SIEVE_MARK_LAYOUTS = {
+    SIEVE_BEFORE_HEAR_MARK: SIEVE_BEFORE_HEAR_LAYOUT,
+    SIEVE_AFTER_HEAR_MARK: SIEVE_AFTER_HEAR_LAYOUT,
+    SIEVE_BEFORE_REST_WRITE_MARK: SIEVE_BEFORE_REST_WRITE_LAYOUT,
+    SIEVE_AFTER_REST_WRITE_MARK: SIEVE_AFTER_REST_WRITE_LAYOUT,
+    SIEVE_BEFORE_ANNOTATED_API_INVOCATION_MARK: SIEVE_BEFORE_ANNOTATED_API_INVOCATION_LAYOUT,
+    SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK: SIEVE_AFTER_ANNOTATED_API_INVOCATION_LAYOUT,
+    SIEVE_BEFORE_RECONCILE_MARK: SIEVE_RECONCILE_LAYOUT,
+    SIEVE_AFTER_RECONCILE_MARK: SIEVE_RECONCILE_LAYOUT,
+}
+
+
+def get_event_tokens(line: str, mark: str) -> List[str]:
+    return line[line.find(mark) :].strip("\n").split("\t")
+
+
+def get_event_layout(mark: str, tokens: List[str]) -> Dict[str, int]:
+    if mark == SIEVE_AFTER_REST_READ_MARK:
+        etype = tokens[SIEVE_AFTER_REST_READ_ETYPE_INDEX]
+        get_layout, list_layout = (
+            SIEVE_AFTER_REST_GET_LAYOUT,
+            SIEVE_AFTER_REST_LIST_LAYOUT,
+        )
+    elif mark == SIEVE_AFTER_CACHE_READ_MARK:
+        etype = tokens[SIEVE_AFTER_CACHE_READ_ETYPE_INDEX]
+        get_layout, list_layout = (
+            SIEVE_AFTER_CACHE_GET_LAYOUT,
+            SIEVE_AFTER_CACHE_LIST_LAYOUT,
+        )
+    else:
+        return SIEVE_MARK_LAYOUTS[mark]
+    if etype == "Get":
+        return get_layout
+    elif etype == "List":
+        return list_layout
+    else:
+        assert False, "read type should be: Get, List"
 
-    @property
-    def end_timestamp(self):
-        return self.__end_timestamp
 
-    @end_timestamp.setter
-    def end_timestamp(self, end_timestamp: int):
-        self.__end_timestamp = end_timestamp
+def get_event_fields(line: str, mark: str) -> Dict[str, str]:
+    """
+    Return {field -> token} of the event with the mark in the line.
+    The fields missing in the layout (e.g., the name of a List) are left out.
+    """
+    tokens = get_event_tokens(line, mark)
+    return {
+        field: tokens[index] for field, index in get_event_layout(mark, tokens).items()
+    }
 
 
 def parse_controller_hear(line: str) -> ControllerHear:
     assert SIEVE_BEFORE_HEAR_MARK in line
-    tokens = line[line.find(SIEVE_BEFORE_HEAR_MARK) :].strip("\n").split("\t")
-    return ControllerHear(tokens[1], tokens[2], tokens[3], tokens[4])
+    fields = get_event_fields(line, SIEVE_BEFORE_HEAR_MARK)
+    return ControllerHear(fields["id"], fields["etype"], fields["rtype"], fields["obj"])
 
 
 def parse_controller_write(line: str) -> ControllerWrite:
     assert SIEVE_AFTER_REST_WRITE_MARK in line
-    tokens = line[line.find(SIEVE_AFTER_REST_WRITE_MARK) :].strip("\n").split("\t")
+    fields = get_event_fields(line, SIEVE_AFTER_REST_WRITE_MARK)
     return ControllerWrite(
-        tokens[1],
-        tokens[2],
-        tokens[3],
-        tokens[4],
-        tokens[5],
-        tokens[6],
-        tokens[7],
-        tokens[8],
+        fields["id"],
+        fields["etype"],
+        fields["reconcile_fun"],
+        fields["error"],
+        fields["rtype"],
+        fields["namespace"],
+        fields["name"],
+        fields["obj"],
+    )
+
+
+def parse_read(fields: Dict[str, str], from_cache: bool) -> ControllerRead:
+    # When using List, the resource type is like xxxlist
+    return ControllerRead(
+        fields["etype"],
+        from_cache,
+        fields["rtype"],
+        fields.get("namespace", ""),
+        fields.get("name", ""),
+        fields["reconcile_fun"],
+        fields["error"],
+        fields["obj"],
     )
 
 
 def parse_controller_read(line: str) -> ControllerRead:
     assert SIEVE_AFTER_REST_READ_MARK in line
     print(line)
-    tokens = line[line.find(SIEVE_AFTER_REST_READ_MARK) :].strip("\n").split("\t")
-    tokens = tokens[1:]
-    if tokens[1] == "Get":
-        return ControllerRead(
-            tokens[1],
-            False,
-            tokens[4],
-            tokens[5],
-            tokens[6],
-            tokens[2],
-            tokens[3],
-            tokens[7],
-        )
-    elif tokens[1] == "List":
-        # When using List, the resource type is like xxxlist so we need to trim the last four characters here
-        # assert tokens[3].endswith("list")
-        return ControllerRead(
-            tokens[1],
-            False,
-            tokens[4],
-            "",
-            "",
-            tokens[2],
-            tokens[3],
-            tokens[7],
-        )
-    else:
-        assert False, "read type should be: Get, List"
+    return parse_read(get_event_fields(line, SIEVE_AFTER_REST_READ_MARK), False)
 
 
 def parse_controller_non_k8s_write(line: str) -> ControllerNonK8sWrite:
     assert SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK in line
-    tokens = (
-        line[line.find(SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK) :]
-        .strip("\n")
-        .split("\t")
-    )
+    fields = get_event_fields(line, SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK)
     return ControllerNonK8sWrite(
-        tokens[1], tokens[2], tokens[3], tokens[4], tokens[5], tokens[6]
+        fields["id"],
+        fields["module"],
+        fields["file_path"],
+        fields["recv_type"],
+        fields["fun_name"],
+        fields["reconcile_fun"],
     )
 
 
 def parse_controller_cache_read(line: str) -> ControllerRead:
     assert SIEVE_AFTER_CACHE_READ_MARK in line
-    tokens = line[line.find(SIEVE_AFTER_CACHE_READ_MARK) :].strip("\n").split("\t")
-    if tokens[1] == "Get":
-        return ControllerRead(
-            tokens[1],
-            True,
-            tokens[2],
-            tokens[3],
-            tokens[4],
-            tokens[5],
-            tokens[6],
-            tokens[7],
-        )
-    elif tokens[1] == "List":
-        # When using List, the resource type is like xxxlist so we need to trim the last four characters here
-        # assert tokens[3].endswith("list")
-        return ControllerRead(
-            tokens[1],
-            True,
-            tokens[2],
-            "",
-            "",
-            tokens[3],
-            tokens[4],
-            tokens[5],
-        )
-    else:
-        assert False, "read type should be: Get, List"
+    return parse_read(get_event_fields(line, SIEVE_AFTER_CACHE_READ_MARK), True)
 
 
 def parse_controller_hear_id_only(line: str) -> ControllerHearIDOnly:
     assert SIEVE_AFTER_HEAR_MARK in line or SIEVE_BEFORE_HEAR_MARK in line
     if SIEVE_AFTER_HEAR_MARK in line:
-        tokens = line[line.find(SIEVE_AFTER_HEAR_MARK) :].strip("\n").split("\t")
-        return ControllerHearIDOnly(tokens[1])
+        fields = get_event_fields(line, SIEVE_AFTER_HEAR_MARK)
     else:
-        tokens = line[line.find(SIEVE_BEFORE_HEAR_MARK) :].strip("\n").split("\t")
-        return ControllerHearIDOnly(tokens[1])
+        fields = get_event_fields(line, SIEVE_BEFORE_HEAR_MARK)
+    return ControllerHearIDOnly(fields["id"])
 
 
 def parse_controller_write_id_only(line: str) -> ControllerWriteIDOnly:
     assert SIEVE_AFTER_REST_WRITE_MARK in line or SIEVE_BEFORE_REST_WRITE_MARK in line
     if SIEVE_AFTER_REST_WRITE_MARK in line:
-        tokens = line[line.find(SIEVE_AFTER_REST_WRITE_MARK) :].strip("\n").split("\t")
-        return ControllerWriteIDOnly(tokens[1])
+        fields = get_event_fields(line, SIEVE_AFTER_REST_WRITE_MARK)
     else:
-        tokens = line[line.find(SIEVE_BEFORE_REST_WRITE_MARK) :].strip("\n").split("\t")
-        return ControllerWriteIDOnly(tokens[1])
+        fields = get_event_fields(line, SIEVE_BEFORE_REST_WRITE_MARK)
+    return ControllerWriteIDOnly(fields["id"])
 
 
 def parse_controller_non_k8s_write_id_only(line: str) -> ControllerNonK8sWriteIDOnly:
@@ -913,29 +739,20 @@ def parse_controller_non_k8s_write_id_only(line: str) -> ControllerNonK8sWriteID
         or SIEVE_BEFORE_ANNOTATED_API_INVOCATION_MARK in line
     )
     if SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK in line:
-        tokens = (
-            line[line.find(SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK) :]
-            .strip("\n")
-            .split("\t")
-        )
-        return ControllerNonK8sWriteIDOnly(tokens[1])
+        fields = get_event_fields(line, SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK)
     else:
-        tokens = (
-            line[line.find(SIEVE_BEFORE_ANNOTATED_API_INVOCATION_MARK) :]
-            .strip("\n")
-            .split("\t")
-        )
-        return ControllerNonK8sWriteIDOnly(tokens[1])
+        fields = get_event_fields(line, SIEVE_BEFORE_ANNOTATED_API_INVOCATION_MARK)
+    return ControllerNonK8sWriteIDOnly(fields["id"])
 
 
 def parse_reconcile(line: str) -> Union[ReconcileBegin, ReconcileEnd]:
     assert SIEVE_BEFORE_RECONCILE_MARK in line or SIEVE_AFTER_RECONCILE_MARK in line
     if SIEVE_BEFORE_RECONCILE_MARK in line:
-        tokens = line[line.find(SIEVE_BEFORE_RECONCILE_MARK) :].strip("\n").split("\t")
-        return ReconcileBegin(tokens[1], tokens[2])
+        fields = get_event_fields(line, SIEVE_BEFORE_RECONCILE_MARK)
+        return ReconcileBegin(fields["reconcile_fun"], fields["reconcile_id"])
     else:
-        tokens = line[line.find(SIEVE_AFTER_RECONCILE_MARK) :].strip("\n").split("\t")
-        return ReconcileEnd(tokens[1], tokens[2])
+        fields = get_event_fields(line, SIEVE_AFTER_RECONCILE_MARK)
+        return ReconcileEnd(fields["reconcile_fun"], fields["reconcile_id"])
 
 
 def parse_api_event(line: str) -> APIEvent:
@@ -944,6 +761,44 @@ def parse_api_event(line: str) -> APIEvent:
     return APIEvent(tokens[1], tokens[2], tokens[3], tokens[4], tokens[5], tokens[6])
 
 
+# Each line of sieve-server.log carries at most one mark, and the mark always comes
+# before the (tab separated) payload, so the first "[SIEVE-...]" is the mark.
+def extract_sieve_mark(line: str) -> Optional[str]:
+    start = line.find("[SIEVE-")
+    if start == -1:
+        return None
+    end = line.find("]", start)
+    if end == -1:
+        return None
+    return line[start : end + 1]
+
+
+# The parse_* function to use for each mark when building the event graph.
+sieve_server_log_parsers = {
+    SIEVE_BEFORE_HEAR_MARK: parse_controller_hear,
+    SIEVE_AFTER_HEAR_MARK: parse_controller_hear_id_only,
+    SIEVE_BEFORE_REST_WRITE_MARK: parse_controller_write_id_only,
+    SIEVE_AFTER_REST_WRITE_MARK: parse_controller_write,
+    SIEVE_AFTER_REST_READ_MARK: parse_controller_read,
+    SIEVE_AFTER_CACHE_READ_MARK: parse_controller_cache_read,
+    SIEVE_BEFORE_ANNOTATED_API_INVOCATION_MARK: parse_controller_non_k8s_write_id_only,
+    SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK: parse_controller_non_k8s_write,
+    SIEVE_BEFORE_RECONCILE_MARK: parse_reconcile,
+    SIEVE_AFTER_RECONCILE_MARK: parse_reconcile,
+}
+
+# The cheaper parse_* function to use for each mark when we only need the ids,
+# e.g., for sanity checking the log.
+sieve_server_log_id_only_parsers = {
+    SIEVE_BEFORE_HEAR_MARK: parse_controller_hear_id_only,
+    SIEVE_AFTER_HEAR_MARK: parse_controller_hear_id_only,
+    SIEVE_BEFORE_REST_WRITE_MARK: parse_controller_write_id_only,
+    SIEVE_AFTER_REST_WRITE_MARK: parse_controller_write_id_only,
+    SIEVE_BEFORE_RECONCILE_MARK: parse_reconcile,
+    SIEVE_AFTER_RECONCILE_MARK: parse_reconcile,
+}
+
+
 def conflicting_event(
     prev_controller_hear: ControllerHear,
     cur_controller_hear: ControllerHear,
@@ -0,0 +1,347 @@
+import time
+import threading
+import kubernetes
+
+# phase -> seconds spent on waiting in the phase
+wait_durations = {}
+
+
+def reset_wait_durations():
+    wait_durations.clear()
+
+
+def record_wait_duration(phase, duration):
+    wait_durations[phase] = wait_durations.get(phase, 0) + duration
+
+
+def get_metadata(obj, field, json_field):
+    # obj is either a typed object (e.g., V1Pod) or a dict (e.g., a custom resource)
+    if isinstance(obj, dict):
+        return obj.get("metadata", {}).get(json_field)
+    return getattr(obj.metadata, field)
+
+
+def get_items(object_list):
+    if isinstance(object_list, dict):
+        return object_list["items"]
+    return object_list.items
+
+
+def get_object_key(obj):
+    return (
+        get_metadata(obj, "namespace", "namespace"),
+        get_metadata(obj, "name", "name"),
+    )
+
+
+def is_gone(event):
+    # the resource version is too old to watch from, so we need to LIST again
+    if event["type"] != "ERROR":
+        return False
+    raw_object = event.get("raw_object", event["object"])
+    return isinstance(raw_object, dict) and raw_object.get("code") == 410
+
+
+def wait_until(list_func, condition, timeout, phase, retry_interval=1, **kwargs):
+    """
+    Wait until condition(objects) holds, where objects are the current objects
+    returned by list_func(**kwargs), e.g., core_v1.list_namespaced_pod.
+    It LISTs once and then WATCHes from the resource version of the LIST,
+    and checks the condition whenever an object changes,
+    so it returns as soon as the condition holds instead of polling.
+    If the watch breaks (e.g., the resource version is too old or the apiserver is not up yet),
+    it falls back to LIST again.
+    The time spent on waiting is recorded in wait_durations[phase].
+    Return whether the condition holds before timeout.
+    """
+    start_time = time.time()
+    objects = {}
+    resource_version = None
+    satisfied = False
+    while not satisfied:
+        remaining = timeout - (time.time() - start_time)
+        if remaining <= 0:
+            break
+        try:
+            if resource_version is None:
+                object_list = list_func(watch=False, **kwargs)
+                objects = {}
+                for obj in get_items(object_list):
+                    objects[get_object_key(obj)] = obj
+                resource_version = get_metadata(
+                    object_list, "resource_version", "resourceVersion"
+                )
+                if condition(list(objects.values())):
+                    satisfied = True
+                    break
+            watch = kubernetes.watch.Watch()
+            for event in watch.stream(
+                list_func,
+                resource_version=resource_version,
+                timeout_seconds=max(1, int(remaining)),
+                **kwargs,
+            ):
+                if is_gone(event):
+                    resource_version = None
+                    break
+                if event["type"] not in ["ADDED", "MODIFIED", "DELETED"]:
+                    continue
+                obj = event["object"]
+                resource_version = get_metadata(
+                    obj, "resource_version", "resourceVersion"
+                )
+                if event["type"] == "DELETED":
+                    objects.pop(get_object_key(obj), None)
+                else:
+                    objects[get_object_key(obj)] = obj
+                if condition(list(objects.values())):
+                    satisfied = True
+                    break
+            watch.stop()
+        except kubernetes.client.exceptions.ApiException as e:
+            if e.status != 410:
+                print("watch fails during {}: {}".format(phase, e.reason))
+                time.sleep(retry_interval)
+            resource_version = None
+        except Exception as e:
+            # the apiserver might not be ready to serve LIST and WATCH yet
+            print("watch fails during {}: {}".format(phase, e))
+            time.sleep(retry_interval)
+            resource_version = None
+    duration = time.time() - start_time
+    record_wait_duration(phase, duration)
+    print("{} takes {:.3f} seconds".format(phase, duration))
+    return satisfied
+
+
+# the size of the connection pool of the shared api client,
+# which should be large enough to hold one connection per informer plus the LISTs
+API_CLIENT_CONNECTION_POOL_MAXSIZE = 16
+
+api_client = None
+
+
+def get_api_client():
+    """
+    Return the api client shared by the whole process.
+    The kubeconfig is loaded only once and the connections are pooled by the client,
+    instead of loading the kubeconfig and connecting to the apiserver for every request.
+    """
+    global api_client
+    if api_client is None:
+        configuration = kubernetes.client.Configuration()
+        kubernetes.config.load_kube_config(client_configuration=configuration)
+        configuration.connection_pool_maxsize = API_CLIENT_CONNECTION_POOL_MAXSIZE
+        api_client = kubernetes.client.ApiClient(configuration)
+    return api_client
+
+
+# custom resource type (e.g., nificluster) -> (group, version, plural, namespaced)
+custom_resource_apis = {}
+
+
+def resolve_custom_resource(custom_resource_type):
+    """
+    Find the group, version, plural and scope of the custom resource type
+    from the custom resource definitions.
+    The custom resource type can be the singular name, plural name, kind, short name
+    or the full name of the crd, as accepted by kubectl.
+    """
+    if custom_resource_type not in custom_resource_apis:
+        crds = kubernetes.client.ApiextensionsV1Api(
+            get_api_client()
+        ).list_custom_resource_definition()
+        for crd in crds.items:
+            names = crd.spec.names
+            candidates = [names.singular, names.plural, names.kind.lower()]
+            if names.short_names is not None:
+                candidates += names.short_names
+            if (
+                custom_resource_type.lower() in candidates
+                or custom_resource_type == crd.metadata.name
+            ):
+                version = [v.name for v in crd.spec.versions if v.storage][0]
+                custom_resource_apis[custom_resource_type] = (
+                    crd.spec.group,
+                    version,
+                    names.plural,
+                    crd.spec.scope == "Namespaced",
+                )
+                break
+        else:
+            raise Exception(
+                "cannot find the custom resource definition of %s"
+                % custom_resource_type
+            )
+    return custom_resource_apis[custom_resource_type]
+
+
+def list_custom_resources(custom_resource_type, namespace, **kwargs):
+    group, version, plural, namespaced = resolve_custom_resource(custom_resource_type)
+    custom_objects_api = kubernetes.client.CustomObjectsApi(get_api_client())
+    if namespaced:
+        return custom_objects_api.list_namespaced_custom_object(
+            group, version, namespace, plural, **kwargs
+        )
+    return custom_objects_api.list_cluster_custom_object(
+        group, version, plural, **kwargs
+    )
+
+
+class Informer:
+    """
+    A local cache of the objects returned by list_func(**kwargs),
+    e.g., core_v1.list_namespaced_pod(namespace="default").
+    A background thread LISTs once and then keeps the cache up to date
+    by WATCHing from the resource version of the LIST (and LISTs again if the watch breaks),
+    so reading the objects or waiting for a condition on them does not issue any request.
+    The cached objects are shared, so the readers should not modify them.
+    """
+
+    def __init__(self, list_func, retry_interval=1, **kwargs):
+        self.list_func = list_func
+        self.kwargs = kwargs
+        self.retry_interval = retry_interval
+        self.objects = {}
+        self.resource_version = None
+        self.synced = False
+        self.stopped = False
+        self.watch = None
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        if self.watch is not None:
+            self.watch.stop()
+
+    def relist(self):
+        object_list = self.list_func(watch=False, **self.kwargs)
+        objects = {}
+        for obj in get_items(object_list):
+            objects[get_object_key(obj)] = obj
+        with self.cond:
+            self.objects = objects
+            self.resource_version = get_metadata(
+                object_list, "resource_version", "resourceVersion"
+            )
+            self.synced = True
+            self.cond.notify_all()
+
+    def handle_event(self, event):
+        if event["type"] not in ["ADDED", "MODIFIED", "DELETED"]:
+            return
+        obj = event["object"]
+        with self.cond:
+            self.resource_version = get_metadata(
+                obj, "resource_version", "resourceVersion"
+            )
+            if event["type"] == "DELETED":
+                self.objects.pop(get_object_key(obj), None)
+            else:
+                self.objects[get_object_key(obj)] = obj
+            self.cond.notify_all()
+
+    def run(self):
+        while not self.stopped:
+            try:
+                if self.resource_version is None:
+                    self.relist()
+                self.watch = kubernetes.watch.Watch()
+                for event in self.watch.stream(
+                    self.list_func,
+                    resource_version=self.resource_version,
+                    timeout_seconds=60,
+                    **self.kwargs,
+                ):
+                    if self.stopped:
+                        break
+                    if is_gone(event):
+                        self.resource_version = None
+                        break
+                    self.handle_event(event)
+                self.watch.stop()
+            except kubernetes.client.exceptions.ApiException as e:
+                if e.status != 410:
+                    print("informer fails: {}".format(e.reason))
+                    time.sleep(self.retry_interval)
+                self.resource_version = None
+            except Exception as e:
+                print("informer fails: {}".format(e))
+                time.sleep(self.retry_interval)
+                self.resource_version = None
+
+    def list(self, timeout=None):
+        """
+        Return the cached objects. It blocks until the first LIST finishes.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.synced or self.stopped, timeout)
+            return list(self.objects.values())
+
+    def wait_for(self, condition, timeout, phase, stop_event=None):
+        """
+        Wait until condition(objects) holds on the cached objects.
+        The condition is checked whenever the cache changes.
+        The time spent on waiting is recorded in wait_durations[phase].
+        Return whether the condition holds before timeout.
+        The wait also ends once stop_event (if any) is set and wake_up_informer_waiters() is called.
+        """
+        start_time = time.time()
+        satisfied = False
+        with self.cond:
+            while not self.stopped and not (
+                stop_event is not None and stop_event.is_set()
+            ):
+                if self.synced and condition(list(self.objects.values())):
+                    satisfied = True
+                    break
+                remaining = timeout - (time.time() - start_time)
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+        duration = time.time() - start_time
+        record_wait_duration(phase, duration)
+        print("{} takes {:.3f} seconds".format(phase, duration))
+        return satisfied
+
+
+# (list function name, kwargs) -> informer
+informers = {}
+informers_lock = threading.Lock()
+
+
+def get_informer(list_func, **kwargs):
+    """
+    Return the informer of the objects returned by list_func(**kwargs).
+    There is only one informer (and hence one watch) for each resource type and namespace,
+    which is started on the first use.
+    """
+    key = (list_func.__name__, tuple(sorted(kwargs.items())))
+    with informers_lock:
+        if key not in informers:
+            informers[key] = Informer(list_func, **kwargs).start()
+        return informers[key]
+
+
+def wake_up_informer_waiters():
+    """
+    Wake up the threads waiting on any informer so that they check their stop events.
+    """
+    with informers_lock:
+        for informer in informers.values():
+            with informer.cond:
+                informer.cond.notify_all()
+
+
+def stop_informers():
+    with informers_lock:
+        for informer in informers.values():
+            informer.stop()
+        informers.clear()
@@ -0,0 +1,276 @@
+import fnmatch
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+GLOB_CHARS = set("*?[")
+
+
+def split_pattern_path(path: str) -> List[str]:
+    # the parts of PurePath("/" + path) without the leading "/"
+    return [part for part in path.split("/") if part != "" and part != "."]
+
+
+class PathTrieNode:
+    def __init__(self):
+        self.children = {}
+        self.wildcard_children = []
+        self.values = []
+
+
+class PathTrie:
+    """
+    Trie over the segments of masked paths.
+    A lookup walks the trie segment by segment following the child with the same segment
+    and the wildcard children, so it costs about the depth of the path
+    instead of one comparison per masked path.
+    If use_glob is True, a segment with *, ? or [ matches like fnmatch (as PurePath.match does);
+    otherwise only "*" is a wildcard and it matches any segment (as equal_path does).
+    """
+
+    def __init__(self, use_glob: bool):
+        self.__use_glob = use_glob
+        self.__root = PathTrieNode()
+
+    def is_wildcard(self, segment: str) -> bool:
+        if self.__use_glob:
+            return any(char in GLOB_CHARS for char in segment)
+        return segment == "*"
+
+    def add(self, segments: List[str], value=True):
+        node = self.__root
+        for segment in segments:
+            if self.is_wildcard(segment):
+                child = None
+                for pattern, wildcard_child in node.wildcard_children:
+                    if pattern == segment:
+                        child = wildcard_child
+                if child is None:
+                    child = PathTrieNode()
+                    node.wildcard_children.append((segment, child))
+            else:
+                if segment not in node.children:
+                    node.children[segment] = PathTrieNode()
+                child = node.children[segment]
+            node = child
+        node.values.append(value)
+
+    def step(self, nodes: List[PathTrieNode], segment: str) -> List[PathTrieNode]:
+        next_nodes = []
+        for node in nodes:
+            if segment in node.children:
+                next_nodes.append(node.children[segment])
+            for pattern, child in node.wildcard_children:
+                if pattern == "*" or (
+                    self.__use_glob and fnmatch.fnmatchcase(segment, pattern)
+                ):
+                    next_nodes.append(child)
+        return next_nodes
+
+    def match(self, segments: List[str]) -> List:
+        # values of the masked paths matching the whole segments
+        nodes = [self.__root]
+        for segment in segments:
+            nodes = self.step(nodes, segment)
+            if len(nodes) == 0:
+                return []
+        values = []
+        for node in nodes:
+            values += node.values
+        return values
+
+    def match_prefix(self, segments: List[str]) -> bool:
+        # whether any masked path matches segments[:i] for some i > 0
+        nodes = [self.__root]
+        for segment in segments:
+            nodes = self.step(nodes, segment)
+            if len(nodes) == 0:
+                return False
+            for node in nodes:
+                if len(node.values) != 0:
+                    return True
+        return False
+
+    def match_field_prefix(self, fields: List[str]) -> bool:
+        # whether any masked path matches "/".join(fields[:i]) for some i > 0
+        # each field can contain "/" so the match is only checked between two fields
+        nodes = [self.__root]
+        for field in fields:
+            for segment in split_pattern_path(field):
+                nodes = self.step(nodes, segment)
+                if len(nodes) == 0:
+                    return False
+            for node in nodes:
+                if len(node.values) != 0:
+                    return True
+        return False
+
+
+class ResourceKeyMatcher:
+    """
+    Match resource keys against patterns like "pod/*/*",
+    the same as pattern == resource_key or PurePath("/" + resource_key).match("/" + pattern).
+    The matched patterns are cached per resource key.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.__patterns = patterns
+        self.__pattern_to_indices = {}
+        self.__trie = PathTrie(True)
+        for i in range(len(patterns)):
+            self.__pattern_to_indices.setdefault(patterns[i], []).append(i)
+            self.__trie.add(split_pattern_path(patterns[i]), i)
+        self.__resource_key_to_indices = {}
+
+    def matched_indices(self, resource_key: str) -> List[int]:
+        # indices of the matched patterns, in the order of the patterns
+        if resource_key not in self.__resource_key_to_indices:
+            indices = set(self.__trie.match(split_pattern_path(resource_key)))
+            if resource_key in self.__pattern_to_indices:
+                indices.update(self.__pattern_to_indices[resource_key])
+            self.__resource_key_to_indices[resource_key] = sorted(indices)
+        return self.__resource_key_to_indices[resource_key]
+
+    def matched_patterns(self, resource_key: str) -> List[str]:
+        return [self.__patterns[i] for i in self.matched_indices(resource_key)]
+
+    def match(self, resource_key: str) -> bool:
+        return len(self.matched_indices(resource_key)) != 0
+
+
+class CompiledKeyMaskMap:
+    """
+    Compiled field_key_mask, field_path_mask or learned mask.json, which map
+    resource key patterns to the lists of masked field paths.
+    The masks of each resource key are computed once and cached.
+    """
+
+    def __init__(self, key_mask_map: Dict):
+        self.__key_mask_map = key_mask_map
+        self.__resource_key_matcher = ResourceKeyMatcher(list(key_mask_map.keys()))
+        self.__resource_key_to_masks = {}
+        self.__resource_key_to_path_trie = {}
+
+    def masks(self, resource_key: str) -> List[str]:
+        if resource_key not in self.__resource_key_to_masks:
+            # TODO: converting the list to a string may lead to ambiguity
+            # consider two lists: ["a", "b", "c"] and ["a/b", "c"]
+            # after converting to string they look the same
+            masks = []
+            for key in self.__resource_key_matcher.matched_patterns(resource_key):
+                for field_path_list in self.__key_mask_map[key]:
+                    assert isinstance(field_path_list, List)
+                    assert len(field_path_list) > 0
+                    if len(field_path_list) == 1:
+                        masks.append(field_path_list[0])
+                    else:
+                        masks.append("/".join(field_path_list))
+            self.__resource_key_to_masks[resource_key] = masks
+        return self.__resource_key_to_masks[resource_key]
+
+    def path_trie(self, resource_key: str) -> PathTrie:
+        # the masks of the resource key as templates for equal_path
+        if resource_key not in self.__resource_key_to_path_trie:
+            path_trie = PathTrie(False)
+            for mask in self.masks(resource_key):
+                path_trie.add(mask.split("/"))
+            self.__resource_key_to_path_trie[resource_key] = path_trie
+        return self.__resource_key_to_path_trie[resource_key]
+
+
+class CompiledEndStateCheckerMask:
+    """
+    Compiled end_state_checker_mask of a controller for one test workload.
+    For each resource key, it caches whether the whole object is masked
+    and the trie of the masked field paths.
+    """
+
+    def __init__(self, end_state_checker_mask: Dict, test_workload: str):
+        self.__key_and_masked_paths = []
+        for masked_test_workload in end_state_checker_mask:
+            if masked_test_workload == test_workload or masked_test_workload == "*":
+                for masked_resource_key in end_state_checker_mask[masked_test_workload]:
+                    self.__key_and_masked_paths.append(
+                        (
+                            masked_resource_key,
+                            end_state_checker_mask[masked_test_workload][
+                                masked_resource_key
+                            ],
+                        )
+                    )
+        self.__resource_key_matcher = ResourceKeyMatcher(
+            [key for key, _ in self.__key_and_masked_paths]
+        )
+        self.__resource_key_to_compiled = {}
+
+    def compiled(self, resource_key: str) -> Tuple[bool, PathTrie]:
+        if resource_key not in self.__resource_key_to_compiled:
+            fully_masked = False
+            path_trie = PathTrie(True)
+            for i in self.__resource_key_matcher.matched_indices(resource_key):
+                masked_paths = self.__key_and_masked_paths[i][1]
+                if len(masked_paths) == 0:
+                    fully_masked = True
+                for masked_path in masked_paths:
+                    path_trie.add(split_pattern_path("/".join(masked_path)))
+            self.__resource_key_to_compiled[resource_key] = (fully_masked, path_trie)
+        return self.__resource_key_to_compiled[resource_key]
+
+    def resource_key_masked(self, resource_key: str) -> bool:
+        return self.compiled(resource_key)[0]
+
+    def field_path_masked(self, resource_key: str, field_path_list: List[str]) -> bool:
+        return self.compiled(resource_key)[1].match_field_prefix(field_path_list)
+
+
+# the masks are loaded once and not modified afterwards,
+# so the compiled masks are cached by the identity of the loaded masks;
+# the configs are loaded again for every test plan in a batch,
+# so only the recently used masks are kept
+COMPILED_MASK_CACHE_SIZE = 64
+compiled_masks = OrderedDict()
+
+
+def get_compiled_mask(mask, compiler, *args):
+    cache_key = (compiler, id(mask)) + args
+    # keep a reference to the mask so that its id is not reused while cached
+    if cache_key not in compiled_masks or compiled_masks[cache_key][0] is not mask:
+        compiled_masks[cache_key] = (mask, compiler(mask, *args))
+        if len(compiled_masks) > COMPILED_MASK_CACHE_SIZE:
+            compiled_masks.popitem(last=False)
+    compiled_masks.move_to_end(cache_key)
+    return compiled_masks[cache_key][1]
+
+
+def compile_key_mask_map(key_mask_map: Dict) -> CompiledKeyMaskMap:
+    return get_compiled_mask(key_mask_map, CompiledKeyMaskMap)
+
+
+def compile_end_state_checker_mask(
+    end_state_checker_mask: Dict, test_workload: str
+) -> CompiledEndStateCheckerMask:
+    return get_compiled_mask(
+        end_state_checker_mask, CompiledEndStateCheckerMask, test_workload
+    )
+
+
+def compile_resource_key_patterns(patterns: List[str]) -> ResourceKeyMatcher:
+    return get_compiled_mask(patterns, ResourceKeyMatcher)
+
+
+def workload_resource_key_matcher(
+    workload_mask: Dict, test_workload: str
+) -> ResourceKeyMatcher:
+    patterns = []
+    for masked_test_workload in workload_mask:
+        if masked_test_workload == "*" or masked_test_workload == test_workload:
+            patterns += workload_mask[masked_test_workload]
+    return ResourceKeyMatcher(patterns)
+
+
+def compile_workload_resource_key_patterns(
+    workload_mask: Dict, test_workload: str
+) -> ResourceKeyMatcher:
+    # workload_mask maps test workloads (or "*") to resource key patterns
+    return get_compiled_mask(
+        workload_mask, workload_resource_key_matcher, test_workload
+    )
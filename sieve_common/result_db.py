@@ -0,0 +1,281 @@
+import glob
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# each host records its test results in its own database under the result dir,
+# so the result dirs collected from multiple hosts can be copied into one dir
+RESULT_DB_PREFIX = "sieve-results-"
+RESULT_DB_SUFFIX = ".db"
+
+SIEVE_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+class test_plan_states:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+RESULT_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS test_plan_runs (
+    controller TEXT NOT NULL,
+    test_workload TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    test_plan TEXT NOT NULL,
+    state TEXT NOT NULL,
+    host TEXT,
+    pid INTEGER,
+    start_time REAL,
+    end_time REAL,
+    duration REAL,
+    injection_completed INTEGER,
+    workload_completed INTEGER,
+    no_exception INTEGER,
+    number_errors INTEGER,
+    result_file TEXT,
+    result TEXT,
+    PRIMARY KEY (controller, test_plan)
+)
+"""
+
+
+def result_db_path(result_root_dir, host=None):
+    if host is None:
+        host = socket.gethostname()
+    return os.path.join(result_root_dir, RESULT_DB_PREFIX + host + RESULT_DB_SUFFIX)
+
+
+def result_db_paths(result_root_dir):
+    return sorted(
+        glob.glob(
+            os.path.join(result_root_dir, RESULT_DB_PREFIX + "*" + RESULT_DB_SUFFIX)
+        )
+    )
+
+
+def normalize_test_plan(test_plan):
+    """
+    Return the key of the test plan in the database, i.e., its path relative to the sieve dir,
+    so the same test plan has the same key no matter how its path is spelled
+    (or where sieve is cloned on each host).
+    """
+    return os.path.relpath(os.path.realpath(test_plan), SIEVE_ROOT_DIR)
+
+
+def process_alive(pid):
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def open_result_db(path):
+    """
+    Open the result database at path and commit the changes when leaving the context.
+    The database is in WAL mode so a test run killed in the middle never corrupts it,
+    and the batch workers on the same host can write to it at the same time.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    try:
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(RESULT_DB_SCHEMA)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def queue_test_plans(result_root_dir, controller, test_plan_to_workload, mode):
+    """
+    Record the test plans as queued unless they are already recorded.
+    The test plans left running on this host by an interrupted batch are queued again,
+    but not the ones still being run by a live process (e.g., another batch or a farm worker).
+    """
+    with open_result_db(result_db_path(result_root_dir)) as conn:
+        for test_plan, test_workload in test_plan_to_workload.items():
+            conn.execute(
+                "INSERT OR IGNORE INTO test_plan_runs "
+                "(controller, test_workload, mode, test_plan, state) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    controller,
+                    test_workload,
+                    mode,
+                    normalize_test_plan(test_plan),
+                    test_plan_states.QUEUED,
+                ),
+            )
+        for row in conn.execute(
+            "SELECT test_plan, pid FROM test_plan_runs "
+            "WHERE controller = ? AND state = ? AND host = ?",
+            (controller, test_plan_states.RUNNING, socket.gethostname()),
+        ).fetchall():
+            if not process_alive(row["pid"]):
+                conn.execute(
+                    "UPDATE test_plan_runs SET state = ? "
+                    "WHERE controller = ? AND test_plan = ?",
+                    (test_plan_states.QUEUED, controller, row["test_plan"]),
+                )
+
+
+def record_test_plan_running(
+    result_root_dir, controller, test_workload, mode, test_plan
+):
+    with open_result_db(result_db_path(result_root_dir)) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO test_plan_runs "
+            "(controller, test_workload, mode, test_plan, state, host, pid, start_time) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                controller,
+                test_workload,
+                mode,
+                normalize_test_plan(test_plan),
+                test_plan_states.RUNNING,
+                socket.gethostname(),
+                os.getpid(),
+                time.time(),
+            ),
+        )
+
+
+def record_test_plan_result(
+    result_root_dir, controller, test_workload, mode, test_plan, result, result_file
+):
+    """
+    Record the result of the test plan (the same as the one in the result json file).
+    The test plan is done if Sieve finishes the run without exceptions, otherwise it failed
+    and will be run again by the next batch.
+    """
+    state = test_plan_states.DONE if result["no_exception"] else test_plan_states.FAILED
+    with open_result_db(result_db_path(result_root_dir)) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO test_plan_runs "
+            "(controller, test_workload, mode, test_plan, state, host, "
+            "start_time, end_time, duration, injection_completed, workload_completed, "
+            "no_exception, number_errors, result_file, result) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                controller,
+                test_workload,
+                mode,
+                normalize_test_plan(test_plan),
+                state,
+                result["host"],
+                time.time() - result["duration"],
+                time.time(),
+                result["duration"],
+                result["injection_completed"],
+                result["workload_completed"],
+                result["no_exception"],
+                result["number_errors"],
+                result_file,
+                json.dumps(result),
+            ),
+        )
+
+
+def finished_test_plans(result_root_dir, controller):
+    finished = set()
+    for path in result_db_paths(result_root_dir):
+        with open_result_db(path) as conn:
+            for row in conn.execute(
+                "SELECT test_plan FROM test_plan_runs "
+                "WHERE controller = ? AND state = ?",
+                (controller, test_plan_states.DONE),
+            ):
+                finished.add(row["test_plan"])
+    return finished
+
+
+def query_test_plan_runs(result_root_dir, controller=None, states=None):
+    """
+    Return the rows of all the result databases under result_root_dir (one for each host),
+    only the ones of the controller and in one of the states if they are given.
+    """
+    conditions = []
+    parameters = []
+    if controller is not None:
+        conditions.append("controller = ?")
+        parameters.append(controller)
+    if states is not None:
+        conditions.append("state IN ({})".format(", ".join("?" * len(states))))
+        parameters += states
+    query = "SELECT * FROM test_plan_runs"
+    if len(conditions) > 0:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY controller, test_workload, test_plan"
+    rows = []
+    for path in result_db_paths(result_root_dir):
+        with open_result_db(path) as conn:
+            rows += [dict(row) for row in conn.execute(query, parameters)]
+    return rows
+
+
+def is_potential_bug(result):
+    # the same condition as report_bugs.py always uses
+    return (
+        result["injection_completed"]
+        and result["workload_completed"]
+        and result["no_exception"]
+        and result["number_errors"] > 0
+    )
+
+
+def query_potential_bugs(result_root_dir):
+    return [
+        row
+        for row in query_test_plan_runs(result_root_dir, states=[test_plan_states.DONE])
+        if is_potential_bug(row)
+    ]
+
+
+def unrecorded_test_results(result_root_dir):
+    """
+    Return the result json files under result_root_dir that are not recorded in any result database,
+    e.g., the ones written before the result databases were introduced,
+    or by a host whose database is not copied back, mapped to their content.
+    """
+    recorded = set(
+        os.path.basename(row["result_file"])
+        for row in query_test_plan_runs(result_root_dir)
+        if row["result_file"] is not None
+    )
+    unrecorded = {}
+    for result_file in sorted(glob.glob(os.path.join(result_root_dir, "*.json"))):
+        if os.path.basename(result_file) in recorded:
+            continue
+        try:
+            unrecorded[result_file] = json.load(open(result_file))
+        except ValueError:
+            print("Cannot read test result {}, skipping it".format(result_file))
+    if len(unrecorded) > 0:
+        print(
+            "{} test result(s) in {} are not recorded in the result databases, "
+            "reading the json files instead".format(len(unrecorded), result_root_dir)
+        )
+    return unrecorded
+
+
+def iter_test_results(test_result):
+    # a result json file maps controller -> test workload -> mode -> test plan -> result
+    for controller in test_result:
+        for test_workload in test_result[controller]:
+            for mode in test_result[controller][test_workload]:
+                for test_plan, result in test_result[controller][test_workload][
+                    mode
+                ].items():
+                    yield controller, test_workload, mode, test_plan, result
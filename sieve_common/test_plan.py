@@ -0,0 +1,364 @@
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import time
+import yaml
+from sieve_common.artifact_cache import load_json_artifact
+from sieve_common.result_db import (
+    test_plan_states,
+    query_test_plan_runs,
+    query_potential_bugs,
+)
+
+TEST_PLAN_MANIFEST = "test-plan-manifest.json"
+TEST_PLAN_SIGNALS = "test-plan-signals.json"
+
+# the weight of each signal in the score of a test plan
+TEST_PLAN_SCORE_WEIGHTS = {
+    "hit_rate": 4.0,
+    "crd": 1.0,
+    "out_degree": 0.5,
+    "signature_counter": 1.0,
+    "reconcile_depth": 1.0,
+}
+
+# the estimated duration (in seconds) of a test plan whose pattern has never been run
+DEFAULT_TEST_PLAN_DURATION = 600
+
+# the operators in the trigger expression, the same as isOperator in sieve_server
+TRIGGER_EXPRESSION_OPERATORS = re.compile(r"([;&|()])")
+
+
+def canonicalize_test_plan(test_plan_content, across_workloads):
+    """
+    Return the canonical form of the test plan, so that two test plans inject the same faults
+    at the same time iff they have the same canonical form.
+    The triggers are renamed by the order they appear in the actions,
+    so the trigger names chosen by the perturbation policies do not matter.
+    If across_workloads is enabled, the workload is dropped
+    so the same plan generated by different workloads is considered equivalent.
+    """
+    trigger_names = {}
+
+    def canonical_trigger_name(trigger_name):
+        if trigger_name not in trigger_names:
+            trigger_names[trigger_name] = "trigger{}".format(len(trigger_names) + 1)
+        return trigger_names[trigger_name]
+
+    canonical_test_plan = {}
+    for key in test_plan_content:
+        if key == "actions" or (key == "workload" and across_workloads):
+            continue
+        canonical_test_plan[key] = test_plan_content[key]
+    canonical_actions = []
+    for action in test_plan_content.get("actions") or []:
+        canonical_action = dict(action)
+        if "trigger" in action:
+            trigger = action["trigger"]
+            canonical_definitions = []
+            for definition in trigger.get("definitions", []):
+                canonical_definition = dict(definition)
+                canonical_definition["triggerName"] = canonical_trigger_name(
+                    definition["triggerName"]
+                )
+                canonical_definitions.append(canonical_definition)
+            canonical_expression = "".join(
+                token
+                if token == "" or TRIGGER_EXPRESSION_OPERATORS.match(token)
+                else canonical_trigger_name(token)
+                for token in TRIGGER_EXPRESSION_OPERATORS.split(
+                    trigger.get("expression", "")
+                )
+            )
+            canonical_action["trigger"] = dict(
+                trigger,
+                definitions=canonical_definitions,
+                expression=canonical_expression,
+            )
+        canonical_actions.append(canonical_action)
+    canonical_test_plan["actions"] = canonical_actions
+    return canonical_test_plan
+
+
+def test_plan_signature(test_plan_content, across_workloads):
+    canonical_test_plan = canonicalize_test_plan(test_plan_content, across_workloads)
+    return hashlib.sha256(
+        json.dumps(canonical_test_plan, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def load_test_plan_signature(test_plan, across_workloads):
+    """
+    Return the signature of the test plan file,
+    or None if the file cannot be read as a test plan (e.g., it is gone or malformed).
+    """
+    try:
+        test_plan_content = yaml.safe_load(open(test_plan))
+    except (OSError, yaml.YAMLError):
+        return None
+    if not isinstance(test_plan_content, dict):
+        return None
+    return test_plan_signature(test_plan_content, across_workloads)
+
+
+def test_plan_sort_key(test_plan):
+    # stale-state-test-plan-2.yaml goes before stale-state-test-plan-10.yaml
+    return [
+        int(token) if token.isdigit() else token
+        for token in re.split(r"(\d+)", test_plan)
+    ]
+
+
+def dedup_test_plans(test_plans, across_workloads):
+    """
+    Group the equivalent test plans and return the map from each test plan
+    to (the representative of its group, its signature). The representative
+    is the first one of the group (in the order of workload, pattern and plan number).
+    The test plans that cannot be read are left out, so they are never skipped.
+    """
+    signature_to_representative = {}
+    test_plan_to_representative = {}
+    for test_plan in sorted(test_plans, key=test_plan_sort_key):
+        signature = load_test_plan_signature(test_plan, across_workloads)
+        if signature is None:
+            print("Cannot read test plan {}, not deduplicating it".format(test_plan))
+            continue
+        if signature not in signature_to_representative:
+            signature_to_representative[signature] = test_plan
+        test_plan_to_representative[test_plan] = (
+            signature_to_representative[signature],
+            signature,
+        )
+    return test_plan_to_representative
+
+
+def generated_test_plans(controller_result_dir):
+    # the test plans are generated in <controller>/<workload>/learn/<pattern>/
+    return glob.glob(os.path.join(controller_result_dir, "*", "learn", "*", "*.yaml"))
+
+
+def controller_result_dir_of_test_plan(test_plan):
+    return os.path.abspath(os.path.join(os.path.dirname(test_plan), "..", "..", ".."))
+
+
+def write_test_plan_manifest(controller_result_dir, across_workloads):
+    """
+    Deduplicate all the test plans generated for the controller (by all the workloads)
+    and write the manifest that maps each test plan to its representative and its signature.
+    The paths in the manifest are relative to the controller result dir.
+    """
+    test_plan_entries = {}
+    for test_plan, (representative, signature) in dedup_test_plans(
+        generated_test_plans(controller_result_dir), across_workloads
+    ).items():
+        test_plan_entries[os.path.relpath(test_plan, controller_result_dir)] = {
+            "representative": os.path.relpath(representative, controller_result_dir),
+            "signature": signature,
+        }
+    manifest = {
+        "across_workloads": across_workloads,
+        "test_plans": test_plan_entries,
+    }
+    manifest_path = os.path.join(controller_result_dir, TEST_PLAN_MANIFEST)
+    # write to a temporary file first as other learn runs of the controller
+    # might be reading or writing the manifest at the same time
+    tmp_manifest_path = "{}.{}".format(manifest_path, os.getpid())
+    with open(tmp_manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4, sort_keys=True)
+    os.replace(tmp_manifest_path, manifest_path)
+    num_unique_test_plans = len(
+        set(entry["representative"] for entry in test_plan_entries.values())
+    )
+    print(
+        "{} test plan(s) are deduplicated to {} unique test plan(s) in {}".format(
+            len(test_plan_entries), num_unique_test_plans, manifest_path
+        )
+    )
+    return manifest
+
+
+def get_test_plan_representative(test_plan):
+    """
+    Return the representative of the test plan recorded in the manifest,
+    or the test plan itself if there is no manifest, the test plan is not in the manifest,
+    or the manifest is out of date, i.e., the test plan or its representative has changed
+    (or is gone) since the manifest was written so they are not known to be equivalent.
+    """
+    controller_result_dir = controller_result_dir_of_test_plan(test_plan)
+    manifest_path = os.path.join(controller_result_dir, TEST_PLAN_MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return test_plan
+    manifest = load_json_artifact(manifest_path)
+    test_plan_entries = manifest["test_plans"]
+    relative_test_plan = os.path.relpath(
+        os.path.abspath(test_plan), controller_result_dir
+    )
+    entry = test_plan_entries.get(relative_test_plan)
+    if not isinstance(entry, dict) or entry["representative"] == relative_test_plan:
+        return test_plan
+    representative_entry = test_plan_entries.get(entry["representative"])
+    representative = os.path.join(controller_result_dir, entry["representative"])
+    if not isinstance(representative_entry, dict) or not os.path.isfile(representative):
+        return test_plan
+    across_workloads = manifest["across_workloads"]
+    for path in [test_plan, representative]:
+        signature = load_test_plan_signature(path, across_workloads)
+        if signature != representative_entry["signature"]:
+            return test_plan
+    return representative
+
+
+def unique_test_plans(test_plans, dedup_enabled):
+    """
+    Filter out the test plans that are equivalent to another test plan of test_plans
+    according to the manifest, unless dedup_enabled is off.
+    A test plan whose representative is not in test_plans is kept,
+    as the representative would not be run in its place.
+    """
+    if not dedup_enabled:
+        return test_plans
+    abs_test_plans = set(os.path.abspath(test_plan) for test_plan in test_plans)
+    result = []
+    for test_plan in test_plans:
+        representative = get_test_plan_representative(test_plan)
+        if representative == test_plan:
+            result.append(test_plan)
+        elif os.path.abspath(representative) not in abs_test_plans:
+            print(
+                "Run {} though it is equivalent to {}, which is not run together".format(
+                    test_plan, representative
+                )
+            )
+            result.append(test_plan)
+        else:
+            print("Skip {} as it is equivalent to {}".format(test_plan, representative))
+    return result
+
+
+def dump_test_plan_signals(test_plan_dir, test_plan_signals):
+    with open(os.path.join(test_plan_dir, TEST_PLAN_SIGNALS), "w") as signals_file:
+        json.dump(test_plan_signals, signals_file, indent=4, sort_keys=True)
+
+
+def load_test_plan_signals(test_plan):
+    # the signals are recorded by the perturbation policies next to the test plans
+    signals_path = os.path.join(os.path.dirname(test_plan), TEST_PLAN_SIGNALS)
+    if not os.path.isfile(signals_path):
+        return {}
+    return load_json_artifact(signals_path).get(os.path.basename(test_plan), {})
+
+
+def test_plan_pattern(test_plan):
+    # e.g., stale-state-test-plan-1.yaml => stale-state
+    return os.path.basename(test_plan).split("-test-plan-")[0]
+
+
+def load_test_plan_history(test_result_dir):
+    """
+    Summarize the earlier test results recorded in the result database in test_result_dir by pattern,
+    including how many test plans are run, how many of them find potential bugs
+    (the same as report_bugs.py) and how long they take in total.
+    """
+    history = {}
+    for row in query_test_plan_runs(
+        test_result_dir, states=[test_plan_states.DONE, test_plan_states.FAILED]
+    ):
+        pattern = test_plan_pattern(row["test_plan"])
+        if pattern not in history:
+            history[pattern] = {"runs": 0, "hits": 0, "duration": 0}
+        history[pattern]["runs"] += 1
+        history[pattern]["duration"] += row["duration"]
+    for row in query_potential_bugs(test_result_dir):
+        history[test_plan_pattern(row["test_plan"])]["hits"] += 1
+    return history
+
+
+def score_test_plan(test_plan, history):
+    """
+    Score how likely the test plan finds a bug, the higher the better.
+    A test plan scores higher if its pattern found more bugs before, if it perturbs a custom resource,
+    if more events depend on the perturbed event, and if the perturbed event happens
+    earlier (smaller signature counter and reconcile depth) so the workload reaches it more reliably.
+    """
+    signals = load_test_plan_signals(test_plan)
+    pattern_history = history.get(test_plan_pattern(test_plan), {})
+    # a pattern that has never been run gets a hit rate of 0.5
+    hit_rate = (pattern_history.get("hits", 0) + 1) / (
+        pattern_history.get("runs", 0) + 2
+    )
+    score = TEST_PLAN_SCORE_WEIGHTS["hit_rate"] * hit_rate
+    if signals.get("crd", False):
+        score += TEST_PLAN_SCORE_WEIGHTS["crd"]
+    score += TEST_PLAN_SCORE_WEIGHTS["out_degree"] * math.log1p(
+        signals.get("out_degree", 0)
+    )
+    score += TEST_PLAN_SCORE_WEIGHTS["signature_counter"] / max(
+        1, signals.get("signature_counter", 1)
+    )
+    score += TEST_PLAN_SCORE_WEIGHTS["reconcile_depth"] / (
+        1 + max(0, signals.get("reconcile_depth", 0))
+    )
+    return score
+
+
+def estimate_test_plan_duration(test_plan, history):
+    pattern_history = history.get(test_plan_pattern(test_plan), {})
+    if pattern_history.get("runs", 0) == 0:
+        return DEFAULT_TEST_PLAN_DURATION
+    return pattern_history["duration"] / pattern_history["runs"]
+
+
+class TestPlanQueue:
+    """
+    The test plans ordered by their scores (the highest first), handed out one by one
+    when iterating over the queue, so the test plans most likely to find bugs run first.
+    If time_budget (in seconds) is set, the queue stops handing out test plans
+    once time_budget seconds have passed since the first test plan is handed out,
+    or the estimated duration of the handed out test plans (run by jobs workers) reaches time_budget.
+    """
+
+    def __init__(
+        self, test_plans, test_result_dir="sieve_test_results", time_budget=None, jobs=1
+    ):
+        history = load_test_plan_history(test_result_dir)
+        self.time_budget = time_budget
+        self.jobs = jobs
+        self.entries = sorted(
+            [
+                (
+                    score_test_plan(test_plan, history),
+                    test_plan,
+                    estimate_test_plan_duration(test_plan, history),
+                )
+                for test_plan in test_plans
+            ],
+            key=lambda entry: (-entry[0], test_plan_sort_key(entry[1])),
+        )
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        start_time = time.time()
+        estimated_duration = 0
+        for score, test_plan, test_plan_duration in self.entries:
+            if self.time_budget is not None and (
+                time.time() - start_time >= self.time_budget
+                or estimated_duration / self.jobs >= self.time_budget
+            ):
+                print(
+                    "Time budget {} seconds is used up, skip the remaining test plans".format(
+                        self.time_budget
+                    )
+                )
+                return
+            estimated_duration += test_plan_duration
+            yield test_plan
+
+    def describe(self):
+        return "\n".join(
+            "{:.3f} {}".format(score, test_plan) for score, test_plan, _ in self.entries
+        )
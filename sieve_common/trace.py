@@ -0,0 +1,326 @@
+import array
+import mmap
+import os
+import struct
+import sys
+from sieve_common.k8s_event import *
+
+# The binary trace of the controller events recorded by the sieve server.
+# It carries the same events as the (text) sieve-server.log,
+# but the events do not need to be scanned and tokenized again:
+#   header: magic, version, byte order, number of records, number of blobs
+#           and the largest timestamp (i.e., the number of lines in the log)
+#   columns: one fixed-width array per column below, with one entry per record
+#   blob offsets: (number of blobs + 1) offsets into the blob data
+#   blob data: the deduplicated utf-8 strings, e.g., types, names and objects
+# Each section is aligned to 8 bytes so the file can be memory-mapped
+# and each column can be accessed as an array without reading the whole file.
+
+SIEVE_TRACE_MAGIC = b"SIEVETRC"
+SIEVE_TRACE_VERSION = 1
+SIEVE_TRACE_HEADER = struct.Struct("<8sIIQQQ")
+
+# (column name, typecode of the column array)
+# "q" columns hold integers (-1 if missing), "I" columns hold blob indices
+SIEVE_TRACE_COLUMNS = [
+    ("timestamp", "q"),
+    ("mark", "B"),
+    ("id", "q"),
+    ("etype", "I"),
+    ("rtype", "I"),
+    ("reconcile_fun", "I"),
+    ("reconcile_id", "q"),
+    ("namespace", "I"),
+    ("name", "I"),
+    ("error", "I"),
+    ("obj", "I"),
+    ("module", "I"),
+    ("file_path", "I"),
+    ("recv_type", "I"),
+    ("fun_name", "I"),
+]
+
+# the index of each mark is stored in the mark column, so only append to the list
+SIEVE_TRACE_MARKS = [
+    SIEVE_BEFORE_HEAR_MARK,
+    SIEVE_AFTER_HEAR_MARK,
+    SIEVE_BEFORE_REST_WRITE_MARK,
+    SIEVE_AFTER_REST_WRITE_MARK,
+    SIEVE_AFTER_REST_READ_MARK,
+    SIEVE_AFTER_CACHE_READ_MARK,
+    SIEVE_BEFORE_ANNOTATED_API_INVOCATION_MARK,
+    SIEVE_AFTER_ANNOTATED_API_INVOCATION_MARK,
+    SIEVE_BEFORE_RECONCILE_MARK,
+    SIEVE_AFTER_RECONCILE_MARK,
+]
+
+SIEVE_TRACE_MARK_CODES = {mark: code for code, mark in enumerate(SIEVE_TRACE_MARKS)}
+
+
+def align(offset: int):
+    return (offset + 7) // 8 * 8
+
+
+def pad(trace_file):
+    trace_file.write(b"\0" * (align(trace_file.tell()) - trace_file.tell()))
+
+
+def get_trace_fields(mark: str, line: str):
+    """
+    Extract the fields of the event in the line as {column -> value},
+    using the same layouts as the parse_* functions in k8s_event.
+    """
+    fields = get_event_fields(line, mark)
+    if "id" in fields:
+        fields["id"] = int(fields["id"])
+    if "reconcile_id" in fields:
+        reconcile_id = int(fields["reconcile_id"])
+        assert str(reconcile_id) == fields["reconcile_id"], line
+        fields["reconcile_id"] = reconcile_id
+    return fields
+
+
+class SieveTraceWriter:
+    def __init__(self):
+        self.columns = {
+            column: array.array(typecode) for column, typecode in SIEVE_TRACE_COLUMNS
+        }
+        # blob -> index of the blob, so each distinct string is stored only once
+        self.blob_index = {}
+        self.blobs = []
+        self.largest_timestamp = 0
+
+    def intern(self, blob: str):
+        if blob not in self.blob_index:
+            self.blob_index[blob] = len(self.blobs)
+            self.blobs.append(blob.encode("utf-8"))
+        return self.blob_index[blob]
+
+    def append(self, timestamp: int, mark: str, fields):
+        for column, typecode in SIEVE_TRACE_COLUMNS:
+            if column == "timestamp":
+                value = timestamp
+            elif column == "mark":
+                value = SIEVE_TRACE_MARK_CODES[mark]
+            elif typecode == "q":
+                value = fields.get(column, -1)
+            else:
+                value = self.intern(fields.get(column, ""))
+            self.columns[column].append(value)
+
+    def write(self, path: str):
+        blob_offsets = array.array("Q", [0])
+        for blob in self.blobs:
+            blob_offsets.append(blob_offsets[-1] + len(blob))
+        with open(path, "wb") as trace_file:
+            trace_file.write(
+                SIEVE_TRACE_HEADER.pack(
+                    SIEVE_TRACE_MAGIC,
+                    SIEVE_TRACE_VERSION,
+                    1 if sys.byteorder == "little" else 0,
+                    len(self.columns["timestamp"]),
+                    len(self.blobs),
+                    self.largest_timestamp,
+                )
+            )
+            for column, _ in SIEVE_TRACE_COLUMNS:
+                pad(trace_file)
+                trace_file.write(self.columns[column].tobytes())
+            pad(trace_file)
+            trace_file.write(blob_offsets.tobytes())
+            for blob in self.blobs:
+                trace_file.write(blob)
+
+
+def convert_sieve_server_log(log_path: str, trace_path: str):
+    """
+    Convert the sieve server log to the binary trace.
+    The timestamp of each event is the index of its line in the log,
+    the same as the one used when streaming the log.
+    """
+    writer = SieveTraceWriter()
+    with open(log_path) as log_file:
+        for timestamp, line in enumerate(log_file):
+            writer.largest_timestamp = timestamp + 1
+            mark = extract_sieve_mark(line)
+            if mark not in SIEVE_TRACE_MARK_CODES:
+                continue
+            writer.append(timestamp, mark, get_trace_fields(mark, line))
+    writer.write(trace_path)
+
+
+def is_sieve_trace(path: str):
+    with open(path, "rb") as trace_file:
+        return trace_file.read(len(SIEVE_TRACE_MAGIC)) == SIEVE_TRACE_MAGIC
+
+
+class SieveTrace:
+    """
+    The memory-mapped binary trace. The records can be accessed randomly by index,
+    and only the accessed columns and blobs are read from the file.
+    """
+
+    def __init__(self, path: str):
+        self.__file = open(path, "rb")
+        self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            little_endian,
+            self.__num_records,
+            num_blobs,
+            self.__largest_timestamp,
+        ) = SIEVE_TRACE_HEADER.unpack_from(self.__mmap)
+        assert magic == SIEVE_TRACE_MAGIC, "{} is not a sieve trace".format(path)
+        assert version == SIEVE_TRACE_VERSION
+        assert little_endian == (1 if sys.byteorder == "little" else 0)
+        self.__views = []
+        self.__columns = {}
+        offset = align(SIEVE_TRACE_HEADER.size)
+        for column, typecode in SIEVE_TRACE_COLUMNS:
+            size = self.__num_records * array.array(typecode).itemsize
+            self.__columns[column] = self.__view(offset, size, typecode)
+            offset = align(offset + size)
+        self.__blob_offsets = self.__view(offset, (num_blobs + 1) * 8, "Q")
+        self.__blob_data_offset = offset + (num_blobs + 1) * 8
+        self.__blob_cache = {}
+
+    def __view(self, offset: int, size: int, typecode: str):
+        view = memoryview(self.__mmap)[offset : offset + size].cast(typecode)
+        self.__views.append(view)
+        return view
+
+    def __len__(self):
+        return self.__num_records
+
+    @property
+    def largest_timestamp(self):
+        return self.__largest_timestamp
+
+    def column(self, column: str):
+        return self.__columns[column]
+
+    def blob(self, index: int) -> str:
+        if index not in self.__blob_cache:
+            start = self.__blob_data_offset + self.__blob_offsets[index]
+            end = self.__blob_data_offset + self.__blob_offsets[index + 1]
+            self.__blob_cache[index] = self.__mmap[start:end].decode("utf-8")
+        return self.__blob_cache[index]
+
+    def timestamp(self, i: int) -> int:
+        return self.__columns["timestamp"][i]
+
+    def mark(self, i: int) -> str:
+        return SIEVE_TRACE_MARKS[self.__columns["mark"][i]]
+
+    def field(self, i: int, column: str):
+        value = self.__columns[column][i]
+        if column in ["id", "reconcile_id"]:
+            return value
+        return self.blob(value)
+
+    def event(self, i: int, parser):
+        """
+        Build the event of the i-th record as parser would build it from the log line.
+        """
+        return sieve_trace_decoders[parser](self, i)
+
+    def close(self):
+        for view in self.__views:
+            view.release()
+        self.__views = []
+        self.__mmap.close()
+        self.__file.close()
+
+
+def decode_controller_hear(trace: SieveTrace, i: int):
+    return ControllerHear(
+        trace.field(i, "id"),
+        trace.field(i, "etype"),
+        trace.field(i, "rtype"),
+        trace.field(i, "obj"),
+    )
+
+
+def decode_controller_hear_id_only(trace: SieveTrace, i: int):
+    return ControllerHearIDOnly(trace.field(i, "id"))
+
+
+def decode_controller_write(trace: SieveTrace, i: int):
+    return ControllerWrite(
+        trace.field(i, "id"),
+        trace.field(i, "etype"),
+        trace.field(i, "reconcile_fun"),
+        trace.field(i, "error"),
+        trace.field(i, "rtype"),
+        trace.field(i, "namespace"),
+        trace.field(i, "name"),
+        trace.field(i, "obj"),
+    )
+
+
+def decode_controller_write_id_only(trace: SieveTrace, i: int):
+    return ControllerWriteIDOnly(trace.field(i, "id"))
+
+
+def decode_controller_read(trace: SieveTrace, i: int):
+    return ControllerRead(
+        trace.field(i, "etype"),
+        False,
+        trace.field(i, "rtype"),
+        trace.field(i, "namespace"),
+        trace.field(i, "name"),
+        trace.field(i, "reconcile_fun"),
+        trace.field(i, "error"),
+        trace.field(i, "obj"),
+    )
+
+
+def decode_controller_cache_read(trace: SieveTrace, i: int):
+    return ControllerRead(
+        trace.field(i, "etype"),
+        True,
+        trace.field(i, "rtype"),
+        trace.field(i, "namespace"),
+        trace.field(i, "name"),
+        trace.field(i, "reconcile_fun"),
+        trace.field(i, "error"),
+        trace.field(i, "obj"),
+    )
+
+
+def decode_controller_non_k8s_write(trace: SieveTrace, i: int):
+    return ControllerNonK8sWrite(
+        trace.field(i, "id"),
+        trace.field(i, "module"),
+        trace.field(i, "file_path"),
+        trace.field(i, "recv_type"),
+        trace.field(i, "fun_name"),
+        trace.field(i, "reconcile_fun"),
+    )
+
+
+def decode_controller_non_k8s_write_id_only(trace: SieveTrace, i: int):
+    return ControllerNonK8sWriteIDOnly(trace.field(i, "id"))
+
+
+def decode_reconcile(trace: SieveTrace, i: int):
+    reconcile_fun = trace.field(i, "reconcile_fun")
+    reconcile_id = str(trace.field(i, "reconcile_id"))
+    if trace.mark(i) == SIEVE_BEFORE_RECONCILE_MARK:
+        return ReconcileBegin(reconcile_fun, reconcile_id)
+    return ReconcileEnd(reconcile_fun, reconcile_id)
+
+
+# parse_* function -> the function building the same event from a trace record
+sieve_trace_decoders = {
+    parse_controller_hear: decode_controller_hear,
+    parse_controller_hear_id_only: decode_controller_hear_id_only,
+    parse_controller_write: decode_controller_write,
+    parse_controller_write_id_only: decode_controller_write_id_only,
+    parse_controller_read: decode_controller_read,
+    parse_controller_cache_read: decode_controller_cache_read,
+    parse_controller_non_k8s_write: decode_controller_non_k8s_write,
+    parse_controller_non_k8s_write_id_only: decode_controller_non_k8s_write_id_only,
+    parse_reconcile: decode_reconcile,
+}
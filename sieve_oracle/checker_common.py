@@ -1,6 +1,7 @@
 from sieve_common.common import *
-import copy
-from deepdiff import DeepDiff
+from sieve_common.artifact_cache import load_json_artifact
+import json
+import collections
 from sieve_common.k8s_event import (
     APIEventTypes,
     ControllerWriteTypes,
@@ -26,85 +27,150 @@ def kind_native_objects(key: str):
 
 
 def get_reference_controller_related_list(test_context: TestContext):
-    return json.load(
-        open(os.path.join(test_context.oracle_dir, "controller_family.json"))
+    return load_json_artifact(
+        os.path.join(test_context.oracle_dir, "controller_family.json")
     )
 
 
 def get_current_controller_related_list(test_context: TestContext):
-    return json.load(
-        open(os.path.join(test_context.result_dir, "controller_family.json"))
+    return load_json_artifact(
+        os.path.join(test_context.result_dir, "controller_family.json")
     )
 
 
-def generate_controller_related_list(test_context: TestContext):
-    log_dir = test_context.result_dir
-    api_log_path = os.path.join(log_dir, "apiserver1.log")
-    api_event_list = []
-    controller_related_list = []
-    controller_related_uid_set = set()
-    for line in open(api_log_path).readlines():
-        if SIEVE_API_EVENT_MARK not in line:
-            continue
-        api_event = parse_api_event(line)
-        api_event_list.append(api_event)
-    for api_event in api_event_list:
+def stream_api_events(api_log_path, consumers):
+    """
+    Read the apiserver log once and feed each api event to all the consumers.
+    Each event is parsed once regardless of the number of consumers,
+    and its object is decoded only if some consumer looks at it.
+    """
+    with open(api_log_path) as api_log_file:
+        for line in api_log_file:
+            if SIEVE_API_EVENT_MARK not in line:
+                continue
+            api_event = parse_api_event(line)
+            for consumer in consumers:
+                consumer.consume(api_event)
+    for consumer in consumers:
+        consumer.finish()
+
+
+class ControllerRelatedObjectCollector:
+    def __init__(self):
+        # only the ownership of each event is kept instead of the event itself
+        # uid -> keys of the objects with the uid
+        self.uid_to_keys = {}
+        # uid -> uids of its owners
+        self.uid_to_owner_uids = {}
+        # uid -> uids of the objects it owns
+        self.uid_to_owned_uids = {}
+        # the uids of the sievetag (controller) pods and their owners
+        self.controller_uid_set = set()
+        self.controller_related_list = []
+
+    def consume(self, api_event):
+        uid = api_event.get_metadata_value("uid")
+        self.uid_to_keys.setdefault(uid, set()).add(api_event.key)
         if api_event.rtype == "pod":
             pod_as_map = api_event.obj_map
             if "labels" in pod_as_map and "sievetag" in pod_as_map["labels"]:
-                controller_related_uid_set.add(pod_as_map["uid"])
+                self.controller_uid_set.add(pod_as_map["uid"])
                 for owner_reference in pod_as_map["ownerReferences"]:
-                    controller_related_uid_set.add(owner_reference["uid"])
-    keep_tainting = True
-    while keep_tainting:
-        keep_tainting = False
-        for api_event in api_event_list:
-            if api_event.get_metadata_value("ownerReferences") is None:
-                continue
-            if api_event.get_metadata_value("uid") in controller_related_uid_set:
-                for owner_reference in api_event.get_metadata_value("ownerReferences"):
-                    if owner_reference["uid"] not in controller_related_uid_set:
-                        controller_related_uid_set.add(owner_reference["uid"])
-                        keep_tainting = True
-            else:
-                for owner_reference in api_event.get_metadata_value("ownerReferences"):
-                    if owner_reference["uid"] in controller_related_uid_set:
-                        controller_related_uid_set.add(
-                            api_event.get_metadata_value("uid")
-                        )
-                        keep_tainting = True
-    for api_event in api_event_list:
-        if (
-            api_event.get_metadata_value("uid") in controller_related_uid_set
-            and api_event.key not in controller_related_list
-        ):
-            controller_related_list.append(api_event.key)
-    controller_related_list.sort()
-    return controller_related_list
-
-
-def second_pass_learn_trim(base_resources, twice_resources):
-    def nested_set(dic, keys, value):
-        for key in keys[:-1]:
-            dic = dic[key]
-        dic[keys[-1]] = value
-
-    stored_learn = copy.deepcopy(base_resources)
-    ddiff = DeepDiff(twice_resources, base_resources, ignore_order=False, view="tree")
-
-    if "values_changed" in ddiff:
-        for key in ddiff["values_changed"]:
-            nested_set(
-                stored_learn, key.path(output_format="list"), SIEVE_LEARN_VALUE_MASK
-            )
+                    self.controller_uid_set.add(owner_reference["uid"])
+        owner_references = api_event.get_metadata_value("ownerReferences")
+        if owner_references is not None:
+            for owner_reference in owner_references:
+                owner_uid = owner_reference["uid"]
+                self.uid_to_owner_uids.setdefault(uid, set()).add(owner_uid)
+                self.uid_to_owned_uids.setdefault(owner_uid, set()).add(uid)
+
+    def finish(self):
+        # An object is controller related if it is owned by or owns
+        # a controller related object, so the controller related objects are
+        # the ones reachable from the controller pods following the owner references
+        # in either direction.
+        controller_related_uid_set = set(self.controller_uid_set)
+        queue = collections.deque(controller_related_uid_set)
+        while queue:
+            uid = queue.popleft()
+            for neighbor_index in [self.uid_to_owner_uids, self.uid_to_owned_uids]:
+                for neighbor_uid in neighbor_index.get(uid, ()):
+                    if neighbor_uid not in controller_related_uid_set:
+                        controller_related_uid_set.add(neighbor_uid)
+                        queue.append(neighbor_uid)
+        controller_related_key_set = set()
+        for uid in controller_related_uid_set:
+            controller_related_key_set.update(self.uid_to_keys.get(uid, ()))
+        self.controller_related_list = sorted(controller_related_key_set)
 
-    if "dictionary_item_added" in ddiff:
-        for key in ddiff["dictionary_item_added"]:
-            nested_set(
-                stored_learn, key.path(output_format="list"), SIEVE_LEARN_VALUE_MASK
-            )
 
-    return stored_learn
+def generate_controller_related_list(test_context: TestContext):
+    api_log_path = os.path.join(test_context.result_dir, "apiserver1.log")
+    controller_related_object_collector = ControllerRelatedObjectCollector()
+    stream_api_events(api_log_path, [controller_related_object_collector])
+    return controller_related_object_collector.controller_related_list
+
+
+def learn_passes_trim(base_resources, other_resources_list):
+    """
+    Merge the resources (e.g., the end state) collected by multiple learn passes
+    in a single walk over all the passes.
+    A value in base_resources (from the first pass) is replaced by SIEVE_LEARN_VALUE_MASK
+    if any other pass has a different value of the same type at the same path,
+    or does not have the dict key at all.
+    The subtrees of different types, the dict keys that only appear in other passes
+    and the extra list items are left as they are in base_resources.
+    """
+    other_resources_list = [
+        other_resources
+        for other_resources in other_resources_list
+        if type(other_resources) == type(base_resources)
+    ]
+    if isinstance(base_resources, dict):
+        trimmed_resources = {}
+        for key in base_resources:
+            other_values = []
+            for other_resources in other_resources_list:
+                if key not in other_resources:
+                    trimmed_resources[key] = SIEVE_LEARN_VALUE_MASK
+                    break
+                other_values.append(other_resources[key])
+            else:
+                trimmed_resources[key] = learn_passes_trim(
+                    base_resources[key], other_values
+                )
+        return trimmed_resources
+    elif isinstance(base_resources, list):
+        return [
+            learn_passes_trim(
+                base_resources[i],
+                [
+                    other_resources[i]
+                    for other_resources in other_resources_list
+                    if i < len(other_resources)
+                ],
+            )
+            for i in range(len(base_resources))
+        ]
+    for other_resources in other_resources_list:
+        if other_resources != base_resources:
+            return SIEVE_LEARN_VALUE_MASK
+    return base_resources
+
+
+def load_learn_passes_artifact(test_context: TestContext, file_name):
+    """
+    Load the json artifact (e.g., state.json) of every learn pass, in the order of passes.
+    """
+    assert test_context.mode == sieve_modes.LEARN and test_context.build_oracle
+    num_learn_passes = test_context.common_config.oracle_learn_passes
+    artifacts = []
+    for learn_pass in range(1, num_learn_passes + 1):
+        learn_dir = learn_pass_result_dir(
+            test_context.result_dir, learn_pass, num_learn_passes
+        )
+        artifacts.append(json.loads(open(os.path.join(learn_dir, file_name)).read()))
+    return artifacts
 
 
 def readable_resource_diff(event_type, diff_content):
@@ -1,9 +1,9 @@
 from sieve_common.common import *
 import json
+import copy
 from sieve_oracle.checker_common import *
 from sieve_common.k8s_event import get_mask_by_resource_key, parse_key
-from deepdiff import DeepDiff
-from pathlib import PurePath
+from sieve_common.mask import compile_key_mask_map, compile_end_state_checker_mask
 
 
 def get_resource_helper(func, namespace):
@@ -35,36 +35,37 @@ def get_crd(crd):
     return data
 
 
-def generate_state(test_context: TestContext):
-    end_state = {}
-    deleted = set()
-    api_log_path = os.path.join(test_context.result_dir, "apiserver1.log")
-    lines = open(api_log_path).readlines()
-    lines.reverse()
-    for line in lines:
-        if SIEVE_API_EVENT_MARK not in line:
-            continue
-        api_event = parse_api_event(line)
-        if api_event.key in deleted or api_event.key in end_state:
-            continue
+class EndStateCollector:
+    def __init__(self):
+        # only the objects alive at the end are kept, so the object of each event is
+        # kept as the raw string until it is overwritten or deleted by a later event
+        # key -> object string of the last event of the key
+        self.live_objects = {}
+        self.end_state = {}
+
+    def consume(self, api_event):
         if api_event.etype == APIEventTypes.DELETED:
-            deleted.add(api_event.key)
+            self.live_objects.pop(api_event.key, None)
         else:
-            end_state[api_event.key] = api_event.obj_map
-    return end_state
+            self.live_objects[api_event.key] = api_event.obj_str
+
+    def finish(self):
+        self.end_state = {}
+        for key, obj_str in self.live_objects.items():
+            self.end_state[key] = json.loads(obj_str)
+        self.live_objects = {}
+
+
+def generate_state(test_context: TestContext):
+    api_log_path = os.path.join(test_context.result_dir, "apiserver1.log")
+    end_state_collector = EndStateCollector()
+    stream_api_events(api_log_path, [end_state_collector])
+    return end_state_collector.end_state
 
 
 def canonicalize_state(test_context: TestContext):
-    assert test_context.mode == sieve_modes.LEARN and test_context.build_oracle
-    second_pass_learn_dir = test_context.result_dir
-    cur_state = json.loads(
-        open(os.path.join(second_pass_learn_dir, "state.json")).read()
-    )
-    first_pass_learn_dir = first_pass_learn_result_dir(test_context.result_dir)
-    prev_state = json.loads(
-        open(os.path.join(first_pass_learn_dir, "state.json")).read()
-    )
-    canonicalized_state = second_pass_learn_trim(prev_state, cur_state)
+    states = load_learn_passes_artifact(test_context, "state.json")
+    canonicalized_state = learn_passes_trim(states[0], states[1:])
     return canonicalized_state
 
 
@@ -133,8 +134,8 @@ def equal_path(template, value):
 
 
 def get_canonicalized_state(test_context: TestContext):
-    canonicalized_state = json.load(
-        open(os.path.join(test_context.oracle_dir, "state.json"))
+    canonicalized_state = load_json_artifact(
+        os.path.join(test_context.oracle_dir, "state.json")
     )
     return canonicalized_state
 
@@ -225,15 +226,10 @@ def resource_key_should_be_masked(
         ):
             return True
         state_mask = test_context.controller_config.end_state_checker_mask
-        for test_workload in state_mask:
-            if test_workload == test_context.test_workload or test_workload == "*":
-                for masked_resource_key in state_mask[test_workload]:
-                    if masked_resource_key == resource_key or PurePath(
-                        "/" + resource_key
-                    ).match("/" + masked_resource_key):
-                        if len(state_mask[test_workload][masked_resource_key]) == 0:
-                            # print("skip", masked_resource_key)
-                            return True
+        if compile_end_state_checker_mask(
+            state_mask, test_context.test_workload
+        ).resource_key_masked(resource_key):
+            return True
     return False
 
 
@@ -257,28 +253,181 @@ def resource_field_path_should_be_masked(
 ):
     # TODO: we should also mask fields as specified in the common_config
     state_mask = test_context.controller_config.end_state_checker_mask
-    for test_workload in state_mask:
-        if test_workload == test_context.test_workload or test_workload == "*":
-            for masked_resource_key in state_mask[test_workload]:
-                if masked_resource_key == resource_key or PurePath(
-                    "/" + resource_key
-                ).match("/" + masked_resource_key):
-                    for masked_path in state_mask[test_workload][masked_resource_key]:
-                        masked_path_str = "/".join(masked_path)
-                        field_path_list_prefix = []
-                        for field in field_path_list:
-                            field_path_list_prefix.append(field)
-                            field_path_list_prefix_str = "/".join(
-                                field_path_list_prefix
-                            )
-                            if (
-                                masked_path_str == field_path_list_prefix_str
-                                or PurePath("/" + field_path_list_prefix_str).match(
-                                    "/" + masked_path_str
-                                )
-                            ):
-                                return True
-    return False
+    return compile_end_state_checker_mask(
+        state_mask, test_context.test_workload
+    ).field_path_masked(resource_key, field_path_list)
+
+
+def diff_state_objects(reference_object, testing_object, path, subtree_masked):
+    """
+    Yield (delta_type, path, reference_value, testing_value) for every difference
+    between the two objects, which is the same as what
+    DeepDiff(reference_object, testing_object, ignore_order=False, view="tree") reports
+    except that each path is prefixed by path and the missing value is None.
+    A dict or list is not compared at all if subtree_masked(path) holds,
+    so the masked subtrees are skipped during the walk instead of afterwards.
+    """
+    if type(reference_object) != type(testing_object):
+        yield "type_changes", path, reference_object, testing_object
+    elif isinstance(reference_object, dict):
+        if subtree_masked(path):
+            return
+        for key in reference_object:
+            if key not in testing_object:
+                removed_value = reference_object[key]
+                yield "dictionary_item_removed", path + [key], removed_value, None
+        for key in testing_object:
+            if key not in reference_object:
+                yield "dictionary_item_added", path + [key], None, testing_object[key]
+            elif reference_object[key] is not testing_object[key]:
+                yield from diff_state_objects(
+                    reference_object[key],
+                    testing_object[key],
+                    path + [key],
+                    subtree_masked,
+                )
+    elif isinstance(reference_object, list):
+        if subtree_masked(path):
+            return
+        for i in range(max(len(reference_object), len(testing_object))):
+            if i >= len(testing_object):
+                yield "iterable_item_removed", path + [i], reference_object[i], None
+            elif i >= len(reference_object):
+                yield "iterable_item_added", path + [i], None, testing_object[i]
+            else:
+                yield from diff_state_objects(
+                    reference_object[i], testing_object[i], path + [i], subtree_masked
+                )
+    elif reference_object != testing_object:
+        yield "values_changed", path, reference_object, testing_object
+
+
+def translate_state_path(test_context: TestContext, untranslated_path):
+    resource_type, namespace, name = parse_key(untranslated_path[0])
+    if resource_type in test_context.controller_config.custom_resource_definitions:
+        return untranslated_path
+    return tranlate_apiserver_shape_to_controller_shape(untranslated_path)
+
+
+def state_path_masked(
+    test_context: TestContext, resource_key, path, mask_keys, mask_path_trie
+):
+    # if a path is masked then every path under it is also masked
+    # Search for boring keys
+    for kp in path:
+        if kp in mask_keys:
+            return True
+    # Search for boring paths
+    # same as equal_path(rule, "/".join(...)) for any rule in the masked paths
+    if len(path) > 2:
+        if mask_path_trie.match_prefix("/".join([str(x) for x in path[1:]]).split("/")):
+            return True
+    return resource_field_path_should_be_masked(
+        test_context, resource_key, [str(field) for field in path[1:]]
+    )
+
+
+def get_state_masks(test_context: TestContext, resource_key):
+    mask_keys = set(
+        get_mask_by_resource_key(
+            test_context.common_config.field_key_mask,
+            resource_key,
+        )
+    )
+    mask_path_trie = compile_key_mask_map(
+        test_context.common_config.field_path_mask
+    ).path_trie(resource_key)
+    return mask_keys, mask_path_trie
+
+
+def state_subtree_masker(test_context: TestContext, resource_key):
+    mask_keys, mask_path_trie = get_state_masks(test_context, resource_key)
+
+    def subtree_masked(untranslated_path):
+        path = translate_state_path(test_context, untranslated_path)
+        return state_path_masked(
+            test_context, resource_key, path, mask_keys, mask_path_trie
+        )
+
+    return subtree_masked
+
+
+def generate_state_delta_message(
+    test_context: TestContext, delta_type, untranslated_path, t1, t2
+):
+    """
+    Return the alarm message of the difference at untranslated_path
+    between the reference state (t1) and the testing state (t2),
+    or None if the difference is masked.
+    """
+    resource_key = untranslated_path[0]
+    if kind_native_objects(resource_key):
+        return None
+    path = translate_state_path(test_context, untranslated_path)
+
+    # the difference of the whole object is checked by the resource existence checking
+    if len(path) == 1:
+        return None
+
+    if delta_type in ["values_changed", "type_changes"]:
+        if t1 == SIEVE_LEARN_VALUE_MASK or match_mask_regex(t1) or match_mask_regex(t2):
+            return None
+
+    if resource_key_should_be_masked(test_context, resource_key):
+        return None
+
+    mask_keys, mask_path_trie = get_state_masks(test_context, resource_key)
+    if state_path_masked(test_context, resource_key, path, mask_keys, mask_path_trie):
+        return None
+
+    field_path_for_print = ""
+    for field in map(str, path[1:]):
+        if field.isdigit():
+            field_path_for_print += "[{}]".format(field)
+        else:
+            field_path_for_print += '["{}"]'.format(field)
+
+    if delta_type in ["dictionary_item_added", "iterable_item_added"]:
+        return generate_alarm(
+            "End state inconsistency - more object fields than reference:",
+            "{}{} {} {} {}".format(
+                resource_key,
+                field_path_for_print,
+                "not seen after reference run, but is",
+                t2,
+                "after testing run",
+            ),
+        )
+    elif delta_type in ["dictionary_item_removed", "iterable_item_removed"]:
+        learned_value = t1
+        if learned_value == SIEVE_LEARN_VALUE_MASK:
+            learned_value = "a nondeterministic value"
+        return generate_alarm(
+            "End state inconsistency - fewer object fields than reference:",
+            "{}{} {} {} {}".format(
+                resource_key,
+                field_path_for_print,
+                "is",
+                learned_value,
+                "after reference run, but not seen after testing run",
+            ),
+        )
+    elif delta_type == "values_changed" or delta_type == "type_changes":
+        return generate_alarm(
+            "End state inconsistency - object field has a different value:",
+            "{}{} {} {} {} {} {}".format(
+                resource_key,
+                field_path_for_print,
+                "is",
+                t1,
+                "after reference run, but",
+                t2,
+                "after testing run",
+            ),
+        )
+    else:
+        print(delta_type)
+        assert False
 
 
 def compare_states(test_context: TestContext):
@@ -390,135 +539,30 @@ def compare_states(test_context: TestContext):
                 )
             )
 
-    tdiff = DeepDiff(reference_state, testing_state, ignore_order=False, view="tree")
-    resource_map = {}
-
-    for delta_type in tdiff:
-        for key in tdiff[delta_type]:
-            untranslated_path = key.path(output_format="list")
-            resource_key = untranslated_path[0]
-            if kind_native_objects(resource_key):
-                continue
-            resource_type, namespace, name = parse_key(resource_key)
-            path = untranslated_path
-            if (
-                resource_type
-                not in test_context.controller_config.custom_resource_definitions
-            ):
-                path = tranlate_apiserver_shape_to_controller_shape(untranslated_path)
-            mask_keys = set(
-                get_mask_by_resource_key(
-                    test_context.common_config.field_key_mask,
-                    resource_key,
-                )
-            )
-            mask_paths = set(
-                get_mask_by_resource_key(
-                    test_context.common_config.field_path_mask,
-                    resource_key,
-                )
-            )
-
-            # Handle for resource size diff
-            if len(path) == 1:
-                if key.t1 == SIEVE_LEARN_VALUE_MASK:
-                    name = SIEVE_LEARN_VALUE_MASK
-                resource_map[resource_type] = {"add": [], "remove": []}
-                resource_map[resource_type][
-                    "add" if delta_type == "dictionary_item_added" else "remove"
-                ].append(name)
+    for resource_key in keys_in_testing_state.intersection(keys_in_reference_state):
+        if kind_native_objects(resource_key):
+            continue
+        reference_object = reference_state[resource_key]
+        testing_object = testing_state[resource_key]
+        # the difference of the whole object (e.g., a masked object) is not reported
+        if not isinstance(reference_object, dict) or not isinstance(
+            testing_object, dict
+        ):
+            continue
+        if resource_key_should_be_masked(test_context, resource_key):
+            continue
+        subtree_masked = state_subtree_masker(test_context, resource_key)
+        for delta in diff_state_objects(
+            reference_object, testing_object, [resource_key], subtree_masked
+        ):
+            delta_type = delta[0]
+            message = generate_state_delta_message(test_context, *delta)
+            if message is None:
                 continue
-
             if delta_type in ["values_changed", "type_changes"]:
-                if (
-                    key.t1 == SIEVE_LEARN_VALUE_MASK
-                    or match_mask_regex(key.t1)
-                    or match_mask_regex(key.t2)
-                ):
-                    continue
-
-            should_be_masked = False
-            # Search for boring keys
-            for kp in path:
-                if kp in mask_keys:
-                    should_be_masked = True
-                    break
-            # Search for boring paths
-            if len(path) > 2:
-                for rule in mask_paths:
-                    if equal_path(rule, "/".join([str(x) for x in path[1:]])):
-                        should_be_masked = True
-                        break
-            if should_be_masked:
-                continue
-
-            field_path_for_print = ""
-            field_path_list = []
-            for field in map(str, path[1:]):
-                field_path_list.append(str(field))
-                if field.isdigit():
-                    field_path_for_print += "[{}]".format(field)
-                else:
-                    field_path_for_print += '["{}"]'.format(field)
-
-            if resource_key_should_be_masked(
-                test_context,
-                resource_key,
-            ):
-                continue
-
-            if resource_field_path_should_be_masked(
-                test_context, resource_key, field_path_list
-            ):
-                continue
-
-            if delta_type in ["dictionary_item_added", "iterable_item_added"]:
-                fields_existence_messages.append(
-                    generate_alarm(
-                        "End state inconsistency - more object fields than reference:",
-                        "{}{} {} {} {}".format(
-                            resource_key,
-                            field_path_for_print,
-                            "not seen after reference run, but is",
-                            key.t2,
-                            "after testing run",
-                        ),
-                    )
-                )
-            elif delta_type in ["dictionary_item_removed", "iterable_item_removed"]:
-                learned_value = key.t1
-                if learned_value == SIEVE_LEARN_VALUE_MASK:
-                    learned_value = "a nondeterministic value"
-                fields_existence_messages.append(
-                    generate_alarm(
-                        "End state inconsistency - fewer object fields than reference:",
-                        "{}{} {} {} {}".format(
-                            resource_key,
-                            field_path_for_print,
-                            "is",
-                            learned_value,
-                            "after reference run, but not seen after testing run",
-                        ),
-                    )
-                )
-            elif delta_type == "values_changed" or delta_type == "type_changes":
-                fields_diff_messages.append(
-                    generate_alarm(
-                        "End state inconsistency - object field has a different value:",
-                        "{}{} {} {} {} {} {}".format(
-                            resource_key,
-                            field_path_for_print,
-                            "is",
-                            key.t1,
-                            "after reference run, but",
-                            key.t2,
-                            "after testing run",
-                        ),
-                    )
-                )
+                fields_diff_messages.append(message)
             else:
-                print(delta_type)
-                assert False
+                fields_existence_messages.append(message)
 
     resource_existence_messages.sort()
     fields_diff_messages.sort()
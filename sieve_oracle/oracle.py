@@ -29,6 +29,46 @@ def save_controller_related_object_list(test_context: TestContext):
     )
 
 
+def save_api_event_artifacts(test_context: TestContext):
+    """
+    Generate the controller family list, the history, the state update summary
+    and the end state together by reading the apiserver log only once.
+    The history is written as the events come,
+    so only the ownership and the live objects are kept in memory.
+    """
+    cprint(
+        "Generating controller family list, state update summary and end state...",
+        bcolors.OKGREEN,
+    )
+    api_log_path = os.path.join(test_context.result_dir, "apiserver1.log")
+    controller_related_object_collector = ControllerRelatedObjectCollector()
+    history_writer = HistoryWriter(
+        os.path.join(test_context.result_dir, "history.json")
+    )
+    history_digest_collector = HistoryDigestCollector(test_context)
+    end_state_collector = EndStateCollector()
+    stream_api_events(
+        api_log_path,
+        [
+            controller_related_object_collector,
+            history_writer,
+            history_digest_collector,
+            end_state_collector,
+        ],
+    )
+    dump_json_file(
+        test_context.result_dir,
+        controller_related_object_collector.controller_related_list,
+        "controller_family.json",
+    )
+    dump_json_file(
+        test_context.result_dir,
+        history_digest_collector.state_update_summary,
+        "event.json",
+    )
+    dump_json_file(test_context.result_dir, end_state_collector.end_state, "state.json")
+
+
 def create_differential_oracles(test_context: TestContext):
     if not test_context.common_config.update_oracle_file_enabled:
         return
@@ -76,6 +116,8 @@ def workload_error_checker(test_context: TestContext):
     for line in file.readlines():
         if line.startswith("FINISH-SIEVE-TEST"):
             break
+        if line.startswith(WORKLOAD_STEP_LATENCY):
+            continue
         if "pauseController" in test_context.action_types and line.startswith(
             "Conditional wait timeout"
         ):
@@ -1,7 +1,11 @@
 from sieve_common.common import *
 import json
-from pathlib import PurePath
+import copy
 from sieve_oracle.checker_common import *
+from sieve_common.mask import (
+    compile_resource_key_patterns,
+    compile_workload_resource_key_patterns,
+)
 from sieve_common.k8s_event import (
     APIEventTypes,
     SIEVE_API_EVENT_MARK,
@@ -17,24 +21,11 @@ def masked_resource_key_for_state_update_summary_checker(
     test_workload = test_context.test_workload
     controller_mask = test_context.controller_config.state_update_summary_checker_mask
     common_mask = test_context.common_config.state_update_summary_checker_mask
-    for masked_test_workload in controller_mask:
-        if masked_test_workload == "*" or masked_test_workload == test_workload:
-            for masked_key in controller_mask[masked_test_workload]:
-                if masked_key == resource_key or PurePath("/" + resource_key).match(
-                    "/" + masked_key
-                ):
-                    print(
-                        "Skipping {} for state-update-summary checker".format(
-                            resource_key
-                        )
-                    )
-                    return True
-    for masked_key in common_mask:
-        if masked_key == resource_key or PurePath("/" + resource_key).match(
-            "/" + masked_key
-        ):
-            print("Skipping {} for state-update-summary checker".format(resource_key))
-            return True
+    if compile_workload_resource_key_patterns(controller_mask, test_workload).match(
+        resource_key
+    ) or compile_resource_key_patterns(common_mask).match(resource_key):
+        print("Skipping {} for state-update-summary checker".format(resource_key))
+        return True
     return False
 
 
@@ -44,57 +35,99 @@ api_event_empty_entry = {
 }
 
 
-def generate_history(test_context: TestContext):
-    api_log_path = os.path.join(test_context.result_dir, "apiserver1.log")
-    history = []
-    for line in open(api_log_path).readlines():
-        if SIEVE_API_EVENT_MARK not in line:
-            continue
-        api_event = parse_api_event(line)
-        api_event_dict = {}
-        api_event_dict["number"] = len(history)
-        api_event_dict["etype"] = api_event.etype
-        api_event_dict["key"] = api_event.key
-        api_event_dict["state"] = api_event.obj_str
-        history.append(api_event_dict)
-    return history
-
-
-def generate_history_digest(test_context: TestContext):
-    log_dir = test_context.result_dir
-    api_log_path = os.path.join(log_dir, "apiserver1.log")
-    state_update_summary = {}
-    for line in open(api_log_path).readlines():
-        if SIEVE_API_EVENT_MARK not in line:
-            continue
-        api_event = parse_api_event(line)
+def generate_history_entry(number, api_event):
+    api_event_dict = {}
+    api_event_dict["number"] = number
+    api_event_dict["etype"] = api_event.etype
+    api_event_dict["key"] = api_event.key
+    api_event_dict["state"] = api_event.obj_str
+    return api_event_dict
+
+
+class HistoryCollector:
+    def __init__(self):
+        self.history = []
+
+    def consume(self, api_event):
+        self.history.append(generate_history_entry(len(self.history), api_event))
+
+    def finish(self):
+        pass
+
+
+class HistoryWriter:
+    """
+    Write each history entry to the history file as soon as the event comes
+    instead of keeping the entire history in memory.
+    The file is the same as the one written by dump_json_file.
+    """
+
+    def __init__(self, history_path):
+        self.history_file = open(history_path, "w")
+        self.number = 0
+
+    def consume(self, api_event):
+        self.history_file.write("[\n" if self.number == 0 else ",\n")
+        # the entry is formatted directly since json.dumps with indent is slow,
+        # and the fields are in the sorted order as json.dump(sort_keys=True)
+        entry = generate_history_entry(self.number, api_event)
+        self.history_file.write("    {\n")
+        self.history_file.write(
+            ",\n".join(
+                [
+                    "        {}: {}".format(json.dumps(field), json.dumps(entry[field]))
+                    for field in sorted(entry)
+                ]
+            )
+        )
+        self.history_file.write("\n    }")
+        self.number += 1
+
+    def finish(self):
+        self.history_file.write("\n]" if self.number > 0 else "[]")
+        self.history_file.close()
+
+
+class HistoryDigestCollector:
+    def __init__(self, test_context: TestContext):
+        self.state_update_check_event_set = set(
+            test_context.common_config.state_update_summary_check_event_list
+        )
+        self.state_update_summary = {}
+
+    def consume(self, api_event):
         key = api_event.key
-        if (
-            api_event.etype
-            not in test_context.common_config.state_update_summary_check_event_list
-        ):
-            continue
+        if api_event.etype not in self.state_update_check_event_set:
+            return
         generate_name = extract_generate_name(api_event.obj_map)
         if generate_name is not None:
             if is_generated_random_name(api_event.name, generate_name):
                 key = key[:-5] + "*"
-        if key not in state_update_summary:
-            state_update_summary[key] = copy.deepcopy(api_event_empty_entry)
-        state_update_summary[key][api_event.etype] += 1
-    return state_update_summary
+        if key not in self.state_update_summary:
+            self.state_update_summary[key] = copy.deepcopy(api_event_empty_entry)
+        self.state_update_summary[key][api_event.etype] += 1
+
+    def finish(self):
+        pass
+
+
+def generate_history(test_context: TestContext):
+    api_log_path = os.path.join(test_context.result_dir, "apiserver1.log")
+    history_collector = HistoryCollector()
+    stream_api_events(api_log_path, [history_collector])
+    return history_collector.history
+
+
+def generate_history_digest(test_context: TestContext):
+    api_log_path = os.path.join(test_context.result_dir, "apiserver1.log")
+    history_digest_collector = HistoryDigestCollector(test_context)
+    stream_api_events(api_log_path, [history_digest_collector])
+    return history_digest_collector.state_update_summary
 
 
 def canonicalize_history_digest(test_context: TestContext):
-    assert test_context.mode == sieve_modes.LEARN and test_context.build_oracle
-    second_pass_learn_dir = test_context.result_dir
-    cur_history_digest = json.loads(
-        open(os.path.join(second_pass_learn_dir, "event.json")).read()
-    )
-    first_pass_learn_dir = first_pass_learn_result_dir(test_context.result_dir)
-    prev_history_digest = json.loads(
-        open(os.path.join(first_pass_learn_dir, "event.json")).read()
-    )
-    can_history_digest = second_pass_learn_trim(prev_history_digest, cur_history_digest)
+    history_digests = load_learn_passes_artifact(test_context, "event.json")
+    can_history_digest = learn_passes_trim(history_digests[0], history_digests[1:])
 
     def remove_ignored_value(event_map):
         ignored = set()
@@ -114,8 +147,8 @@ def canonicalize_history_digest(test_context: TestContext):
 
 
 def get_canonicalized_history_digest(test_context: TestContext):
-    can_history_digest = json.load(
-        open(os.path.join(test_context.oracle_dir, "event.json"))
+    can_history_digest = load_json_artifact(
+        os.path.join(test_context.oracle_dir, "event.json")
     )
     return can_history_digest
 
@@ -3,6 +3,8 @@ import os
 from sieve_common.event_delta import *
 from sieve_common.common import *
 from sieve_common.k8s_event import *
+from sieve_common.artifact_cache import load_json_artifact
+from sieve_analyzer.event_graph import EventVertex
 
 
 def convert_deltafifo_etype_to_API_etype(etype: str) -> str:
@@ -93,17 +95,15 @@ def detectable_event_diff(
 def nondeterministic_key(
     test_context: TestContext, event: Union[ControllerHear, ControllerWrite]
 ):
-    generate_name = extract_generate_name(event.obj_map)
-    end_state = json.load(
-        open(
-            os.path.join(
-                test_context.oracle_dir,
-                "state.json",
-            )
+    end_state = load_json_artifact(
+        os.path.join(
+            test_context.oracle_dir,
+            "state.json",
         )
     )
     if event.key not in end_state:
         # TODO: get rid of the heuristic
+        generate_name = extract_generate_name(event.obj_map)
         if generate_name is not None and is_generated_random_name(
             event.name, generate_name
         ):
@@ -111,3 +111,40 @@ def nondeterministic_key(
     elif end_state[event.key] == "SIEVE-IGNORE":
         return True
     return False
+
+
+def get_reconcile_depth(vertex: EventVertex):
+    # the number of reconciles the reconciler has run until the event,
+    # or until the earliest event affected by the event (e.g., for controller hear)
+    reconcile_id = getattr(vertex.content, "reconcile_id", -1)
+    if reconcile_id != -1:
+        return int(reconcile_id)
+    reconcile_depths = []
+    for edge in vertex.out_inter_reconciler_edges:
+        sink_reconcile_id = getattr(edge.sink.content, "reconcile_id", -1)
+        if sink_reconcile_id != -1:
+            reconcile_depths.append(int(sink_reconcile_id))
+    return min(reconcile_depths) if len(reconcile_depths) > 0 else 0
+
+
+def get_test_plan_signals(
+    test_context: TestContext,
+    vertex: EventVertex,
+    reconcile_vertex: Optional[EventVertex] = None,
+):
+    """
+    Collect the signals of the event perturbed by the test plan,
+    which are used to decide which test plans to run first.
+    The reconcile depth is taken from reconcile_vertex (e.g., the controller write
+    of a stale-state pair) if given.
+    """
+    rtype = getattr(vertex.content, "rtype", None)
+    return {
+        "signature_counter": getattr(vertex.content, "signature_counter", 1),
+        "crd": rtype in test_context.controller_config.custom_resource_definitions,
+        "out_degree": len(vertex.out_inter_reconciler_edges)
+        + len(vertex.out_intra_reconciler_edges),
+        "reconcile_depth": get_reconcile_depth(
+            vertex if reconcile_vertex is None else reconcile_vertex
+        ),
+    }
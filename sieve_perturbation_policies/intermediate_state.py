@@ -11,7 +11,9 @@ from sieve_analyzer.event_graph import (
 from sieve_perturbation_policies.common import (
     nondeterministic_key,
     detectable_event_diff,
+    get_test_plan_signals,
 )
+from sieve_common.test_plan import dump_test_plan_signals
 
 
 def intermediate_state_detectable_pass(
@@ -210,6 +212,7 @@ def intermediate_state_analysis(
         candidate_annotated_api_invocation_vertices
     )
     i = 0
+    test_plan_signals = {}
     for vertex in candidate_write_vertices:
         controller_write = vertex.content
         intermediate_state_test_plan = (
@@ -223,6 +226,9 @@ def intermediate_state_analysis(
         )
         if test_context.common_config.persist_test_plans_enabled:
             dump_to_yaml(intermediate_state_test_plan, file_name)
+        test_plan_signals[os.path.basename(file_name)] = get_test_plan_signals(
+            test_context, vertex
+        )
 
     for vertex in candidate_annotated_api_invocation_vertices:
         annotated_api_invocation = vertex.content
@@ -237,6 +243,11 @@ def intermediate_state_analysis(
         )
         if test_context.common_config.persist_test_plans_enabled:
             dump_to_yaml(intermediate_state_test_plan, file_name)
+        test_plan_signals[os.path.basename(file_name)] = get_test_plan_signals(
+            test_context, vertex
+        )
+    if test_context.common_config.persist_test_plans_enabled:
+        dump_test_plan_signals(path, test_plan_signals)
     cprint(
         "Generated {} intermediate-state test plan(s) in {}".format(i, path),
         bcolors.OKGREEN,
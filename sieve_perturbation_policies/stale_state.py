@@ -12,7 +12,9 @@ from sieve_analyzer.event_graph import (
 from sieve_perturbation_policies.common import (
     nondeterministic_key,
     detectable_event_diff,
+    get_test_plan_signals,
 )
+from sieve_common.test_plan import dump_test_plan_signals
 
 
 def stale_state_detectable_pass(
@@ -265,6 +267,7 @@ def stale_state_analysis(event_graph: EventGraph, path: str, test_context: TestC
         candidate_pairs = stale_state_detectable_pass(test_context, candidate_pairs)
     final_spec_number = len(candidate_pairs)
     i = 0
+    test_plan_signals = {}
     for pair in candidate_pairs:
         source = pair[0]
         sink = pair[1]
@@ -285,6 +288,9 @@ def stale_state_analysis(event_graph: EventGraph, path: str, test_context: TestC
             )
             if test_context.common_config.persist_test_plans_enabled:
                 dump_to_yaml(stale_state_test_plan, file_name)
+            test_plan_signals[os.path.basename(file_name)] = get_test_plan_signals(
+                test_context, source, sink
+            )
         elif timing == "before":
             stale_state_test_plan = generate_stale_state_test_plan(
                 test_context, controller_hear, controller_write, timing
@@ -295,6 +301,9 @@ def stale_state_analysis(event_graph: EventGraph, path: str, test_context: TestC
             )
             if test_context.common_config.persist_test_plans_enabled:
                 dump_to_yaml(stale_state_test_plan, file_name)
+            test_plan_signals[os.path.basename(file_name)] = get_test_plan_signals(
+                test_context, source, sink
+            )
         else:
             stale_state_test_plan = generate_stale_state_test_plan(
                 test_context, controller_hear, controller_write, "after"
@@ -305,6 +314,9 @@ def stale_state_analysis(event_graph: EventGraph, path: str, test_context: TestC
             )
             if test_context.common_config.persist_test_plans_enabled:
                 dump_to_yaml(stale_state_test_plan, file_name)
+            test_plan_signals[os.path.basename(file_name)] = get_test_plan_signals(
+                test_context, source, sink
+            )
 
             stale_state_test_plan = generate_stale_state_test_plan(
                 test_context, controller_hear, controller_write, "before"
@@ -315,11 +327,16 @@ def stale_state_analysis(event_graph: EventGraph, path: str, test_context: TestC
             )
             if test_context.common_config.persist_test_plans_enabled:
                 dump_to_yaml(stale_state_test_plan, file_name)
+            test_plan_signals[os.path.basename(file_name)] = get_test_plan_signals(
+                test_context, source, sink
+            )
             baseline_spec_number += 1
             after_p1_spec_number += 1
             after_p2_spec_number += 1
             final_spec_number += 1
 
+    if test_context.common_config.persist_test_plans_enabled:
+        dump_test_plan_signals(path, test_plan_signals)
     cprint(
         "Generated {} stale-state test plan(s) in {}".format(i, path), bcolors.OKGREEN
     )
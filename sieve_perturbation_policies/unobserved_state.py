@@ -11,7 +11,9 @@ from sieve_analyzer.event_graph import (
 from sieve_perturbation_policies.common import (
     nondeterministic_key,
     detectable_event_diff,
+    get_test_plan_signals,
 )
+from sieve_common.test_plan import dump_test_plan_signals
 
 
 def unobserved_state_detectable_pass(
@@ -239,6 +241,7 @@ def unobserved_state_analysis(
         )
     final_spec_number = len(candidate_vertices)
     i = 0
+    test_plan_signals = {}
     for vertex in candidate_vertices:
         controller_hear = vertex.content
         assert isinstance(controller_hear, ControllerHear)
@@ -253,7 +256,12 @@ def unobserved_state_analysis(
         )
         if test_context.common_config.persist_test_plans_enabled:
             dump_to_yaml(unobserved_state_test_plan, file_name)
+        test_plan_signals[os.path.basename(file_name)] = get_test_plan_signals(
+            test_context, vertex
+        )
 
+    if test_context.common_config.persist_test_plans_enabled:
+        dump_test_plan_signals(path, test_plan_signals)
     cprint(
         "Generated {} unobserved-state test plan(s) in {}".format(i, path),
         bcolors.OKGREEN,
@@ -60,6 +60,13 @@ const (
 	reconnectController   string = "reconnectController"
 )
 
+// the defaults used when server.yaml does not specify the cluster
+const (
+	DEFAULT_SIEVE_SERVER_PORT    string = "12345"
+	DEFAULT_LEADING_API_SERVER   string = "kind-control-plane"
+	DEFAULT_FOLLOWING_API_SERVER string = "kind-control-plane3"
+)
+
 var mergedMaskLock sync.Mutex
 
 func checkError(err error) {
@@ -24,6 +24,13 @@ func getConfig() map[interface{}]interface{} {
 	return m
 }
 
+func getConfigString(config map[interface{}]interface{}, key, defaultValue string) string {
+	if val, ok := config[key]; ok {
+		return val.(string)
+	}
+	return defaultValue
+}
+
 func getMask() (map[string][][]string, map[string][][]string, map[string][][]string) {
 	data, err := ioutil.ReadFile("learned_field_path_mask.json")
 	checkError(err)
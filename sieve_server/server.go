@@ -25,8 +25,14 @@ func main() {
 	default:
 		log.Fatalf("Cannot recognize mode: %s\n", phase)
 	}
+	// The port can be specified by the second argument
+	// so that multiple Sieve servers can run on the same host.
+	port := DEFAULT_SIEVE_SERVER_PORT
+	if len(args) > 2 {
+		port = args[2]
+	}
 	log.Println("setting up connection...")
-	addr, err := net.ResolveTCPAddr("tcp", ":12345")
+	addr, err := net.ResolveTCPAddr("tcp", ":"+port)
 	checkError(err)
 	inbound, err := net.ListenTCP("tcp", addr)
 	checkError(err)
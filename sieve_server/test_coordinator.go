@@ -56,8 +56,8 @@ func NewTestCoordinator() *TestCoordinator {
 	apiserverLockedMap := make(map[string]map[string]bool)
 	actionConext := &ActionContext{
 		namespace:                     "default",
-		leadingAPIServer:              "kind-control-plane",
-		followingAPIServer:            "kind-control-plane3",
+		leadingAPIServer:              getConfigString(config, "leadingAPIServer", DEFAULT_LEADING_API_SERVER),
+		followingAPIServer:            getConfigString(config, "followingAPIServer", DEFAULT_FOLLOWING_API_SERVER),
 		controllerPausingChs:          controllerPausingChs,
 		controllerShouldPauseMap:      controllerShouldPauseMap,
 		pauseControllerSharedDataLock: pauseControllerSharedDataLock,
@@ -12,9 +12,20 @@ from sieve_common.common import (
     RUNNING,
     BOUND,
     EXIST,
+    WORKLOAD_STEP_LATENCY,
+)
+from sieve_common.k8s_watch import (
+    get_api_client,
+    get_informer,
+    get_metadata,
+    list_custom_resources,
+    stop_informers,
+    wake_up_informer_waiters,
 )
 import time
 import traceback
+import threading
+import queue
 from sieve_common.config import get_common_config
 import datetime
 import subprocess
@@ -23,27 +34,25 @@ import json
 common_config = get_common_config()
 
 
+def get_core_v1_api():
+    return kubernetes.client.CoreV1Api(get_api_client())
+
+
+def get_apps_v1_api():
+    return kubernetes.client.AppsV1Api(get_api_client())
+
+
 def get_pod(resource_name, namespace):
-    kubernetes.config.load_kube_config()
-    core_v1 = kubernetes.client.CoreV1Api()
-    pods = core_v1.list_namespaced_pod(namespace=namespace, watch=False).items
-    target_pod = None
-    for pod in pods:
-        if pod.metadata.name == resource_name:
-            target_pod = pod
-            break
-        elif resource_name.endswith("*"):
-            resource_name_prefix = resource_name[:-1]
-            if pod.metadata.name.startswith(resource_name_prefix):
-                target_pod = pod
-                break
-    return target_pod
+    pods = get_informer(
+        get_core_v1_api().list_namespaced_pod, namespace=namespace
+    ).list()
+    return find_resource(pods, resource_name)
 
 
 def get_pods(resource_name_prefix, namespace):
-    kubernetes.config.load_kube_config()
-    core_v1 = kubernetes.client.CoreV1Api()
-    pods = core_v1.list_namespaced_pod(namespace=namespace, watch=False).items
+    pods = get_informer(
+        get_core_v1_api().list_namespaced_pod, namespace=namespace
+    ).list()
     target_pods = []
     for pod in pods:
         if pod.metadata.name.startswith(resource_name_prefix):
@@ -52,69 +61,41 @@ def get_pods(resource_name_prefix, namespace):
 
 
 def get_sts(resource_name, namespace):
-    kubernetes.config.load_kube_config()
-    apps_v1 = kubernetes.client.AppsV1Api()
-    statefulsets = apps_v1.list_namespaced_stateful_set(
-        namespace=namespace, watch=False
-    ).items
-    target_sts = None
-    for sts in statefulsets:
-        if sts.metadata.name == resource_name:
-            target_sts = sts
-    return target_sts
+    statefulsets = get_informer(
+        get_apps_v1_api().list_namespaced_stateful_set, namespace=namespace
+    ).list()
+    return find_resource(statefulsets, resource_name)
 
 
 def get_pvc(resource_name, namespace):
-    kubernetes.config.load_kube_config()
-    core_v1 = kubernetes.client.CoreV1Api()
-    pvcs = core_v1.list_namespaced_persistent_volume_claim(
-        namespace=namespace, watch=False
-    ).items
-    target_pvc = None
-    for pvc in pvcs:
-        if pvc.metadata.name == resource_name:
-            target_pvc = pvc
-            break
-        elif resource_name.endswith("*"):
-            resource_name_prefix = resource_name[:-1]
-            if pvc.metadata.name.startswith(resource_name_prefix):
-                target_pvc = pvc
-                break
-    return target_pvc
+    pvcs = get_informer(
+        get_core_v1_api().list_namespaced_persistent_volume_claim,
+        namespace=namespace,
+    ).list()
+    return find_resource(pvcs, resource_name)
 
 
 def get_secret(resource_name, namespace):
-    kubernetes.config.load_kube_config()
-    core_v1 = kubernetes.client.CoreV1Api()
-    secrets = core_v1.list_namespaced_secret(namespace=namespace, watch=False).items
-    for secret in secrets:
-        if secret.metadata.name == resource_name:
-            return secret
-    return None
+    secrets = get_informer(
+        get_core_v1_api().list_namespaced_secret, namespace=namespace
+    ).list()
+    return find_resource(secrets, resource_name)
 
 
 def get_service(resource_name, namespace):
-    kubernetes.config.load_kube_config()
-    core_v1 = kubernetes.client.CoreV1Api()
-    services = core_v1.list_namespaced_service(namespace=namespace, watch=False).items
-    for service in services:
-        if service.metadata.name == resource_name:
-            return service
-    return None
+    services = get_informer(
+        get_core_v1_api().list_namespaced_service, namespace=namespace
+    ).list()
+    return find_resource(services, resource_name)
 
 
 def get_custom_resource(custom_resource_type, resource_name, namespace):
-    try:
-        custom_resource = json.loads(
-            os.popen(
-                "kubectl get %s %s -o json -n %s"
-                % (custom_resource_type, resource_name, namespace)
-            ).read()
-        )
-        return custom_resource
-    except Exception as e:
-        print("get custom resource fail", e)
-    return None
+    custom_resources = get_informer(
+        list_custom_resources,
+        custom_resource_type=custom_resource_type,
+        namespace=namespace,
+    ).list()
+    return find_resource(custom_resources, resource_name)
 
 
 class TestCmd:
@@ -122,12 +103,22 @@ class TestCmd:
         self.cmd = cmd
         self.timeout = timeout
 
-    def run(self) -> Tuple[int, str]:
+    def describe(self):
+        return self.cmd
+
+    def run(self, stop_event=None) -> Tuple[int, str]:
         print()
         print(self.cmd)
         proc = subprocess.Popen(self.cmd, shell=True)
         try:
-            proc.wait(timeout=self.timeout)
+            if stop_event is None:
+                proc.wait(timeout=self.timeout)
+            elif not wait_for_process(proc, self.timeout, stop_event):
+                proc.terminate()
+                proc.wait()
+                return 1, "Command stopped: '%s' is stopped by its step group" % (
+                    self.cmd
+                )
             if proc.returncode != 0:
                 return 1, "Command error code: '%s' returns %d " % (
                     self.cmd,
@@ -146,12 +137,77 @@ class TestWait:
     def __init__(self, time_out):
         self.timeout = time_out
 
-    def run(self) -> Tuple[int, str]:
-        print("wait for %s seconds" % str(self.timeout))
-        time.sleep(self.timeout)
+    def describe(self):
+        return "wait for %s seconds" % str(self.timeout)
+
+    def run(self, stop_event=None) -> Tuple[int, str]:
+        print(self.describe())
+        if stop_event is None:
+            time.sleep(self.timeout)
+        elif stop_event.wait(self.timeout):
+            return 1, "Wait stopped: %s is stopped by its step group" % (
+                self.describe()
+            )
         return 0, NO_ERROR_MESSAGE
 
 
+def wait_for_process(proc, timeout, stop_event):
+    """
+    Wait until proc exits like proc.wait(timeout), unless stop_event is set before that.
+    Return whether proc exits.
+    """
+    deadline = time.time() + timeout
+    while not stop_event.is_set():
+        try:
+            proc.wait(timeout=max(0, min(1, deadline - time.time())))
+            return True
+        except subprocess.TimeoutExpired:
+            if time.time() >= deadline:
+                raise
+    return False
+
+
+def find_resource(resources, resource_name):
+    # resource_name ending with "*" matches any resource with the prefix
+    for resource in resources:
+        name = get_metadata(resource, "name", "name")
+        if name == resource_name:
+            return resource
+        elif resource_name.endswith("*"):
+            resource_name_prefix = resource_name[:-1]
+            if name.startswith(resource_name_prefix):
+                return resource
+    return None
+
+
+def conditional_wait(
+    description, error_message, timeout, list_func, condition, stop_event=None, **kwargs
+):
+    """
+    Wait until condition(resources) holds, where resources are returned by list_func(**kwargs).
+    The wait is served from the informer of the resources so it returns as soon as the condition holds,
+    and then waits for the settle period to let the cluster settle down.
+    The wait gives up once stop_event (if any) is set.
+    """
+    stopped_message = (
+        "Conditional wait stopped: %s is stopped by its step group" % description
+    )
+    s = time.time()
+    print(description + "...")
+    informer = get_informer(list_func, **kwargs)
+    if not informer.wait_for(condition, timeout, description, stop_event):
+        if stop_event is not None and stop_event.is_set():
+            return 1, stopped_message
+        print(error_message)
+        return 1, error_message
+    if stop_event is None:
+        time.sleep(common_config.workload_wait_settle_period)
+    elif stop_event.wait(common_config.workload_wait_settle_period):
+        return 1, stopped_message
+    print("wait takes %f seconds" % (time.time() - s))
+    return 0, NO_ERROR_MESSAGE
+
+
 class TestWaitForStatus:
     def __init__(
         self,
@@ -167,13 +223,8 @@ class TestWaitForStatus:
         self.namespace = namespace
         self.timeout = timeout
 
-    def check_pod(self):
-        try:
-            pod = get_pod(self.resource_name, self.namespace)
-        except Exception as err:
-            print("error occurs during check pod", err)
-            print(traceback.format_exc())
-            return False
+    def check_pod(self, pods):
+        pod = find_resource(pods, self.resource_name)
         if self.status == TERMINATED:
             if pod is None:
                 return True
@@ -189,13 +240,8 @@ class TestWaitForStatus:
             assert False, "status not supported yet"
         return False
 
-    def check_pvc(self):
-        try:
-            pvc = get_pvc(self.resource_name, self.namespace)
-        except Exception as err:
-            print("error occurs during check pvc", err)
-            print(traceback.format_exc())
-            return False
+    def check_pvc(self, pvcs):
+        pvc = find_resource(pvcs, self.resource_name)
         if self.status == TERMINATED:
             if pvc is None:
                 return True
@@ -206,37 +252,39 @@ class TestWaitForStatus:
             assert False, "status not supported yet"
         return False
 
-    def run(self) -> Tuple[int, str]:
-        s = time.time()
-        print(
-            "wait until %s %s becomes %s..."
-            % (self.resource_type, self.resource_name, self.status)
+    def describe(self):
+        return "wait until %s %s becomes %s" % (
+            self.resource_type,
+            self.resource_name,
+            self.status,
+        )
+
+    def run(self, stop_event=None) -> Tuple[int, str]:
+        if self.resource_type == POD:
+            list_func = get_core_v1_api().list_namespaced_pod
+            condition = self.check_pod
+        elif self.resource_type == PVC:
+            list_func = get_core_v1_api().list_namespaced_persistent_volume_claim
+            condition = self.check_pvc
+        else:
+            assert False, "type not supported yet"
+        error_message = (
+            "Conditional wait timeout: %s does not become %s within %d seconds"
+            % (
+                self.resource_name,
+                self.status,
+                self.timeout,
+            )
+        )
+        return conditional_wait(
+            self.describe(),
+            error_message,
+            self.timeout,
+            list_func,
+            condition,
+            stop_event=stop_event,
+            namespace=self.namespace,
         )
-        while True:
-            duration = time.time() - s
-            if duration > self.timeout:
-                error_message = (
-                    "Conditional wait timeout: %s does not become %s within %d seconds"
-                    % (
-                        self.resource_name,
-                        self.status,
-                        self.timeout,
-                    )
-                )
-                print(error_message)
-                return 1, error_message
-            if self.resource_type == POD:
-                if self.check_pod():
-                    break
-            elif self.resource_type == PVC:
-                if self.check_pvc():
-                    break
-            else:
-                assert False, "type not supported yet"
-            time.sleep(5)
-        time.sleep(5)  # make it configurable
-        print("wait takes %f seconds" % (time.time() - s))
-        return 0, NO_ERROR_MESSAGE
 
 
 class TestWaitForNumber:
@@ -254,47 +302,46 @@ class TestWaitForNumber:
         self.namespace = namespace
         self.timeout = timeout
 
-    def check_pod(self):
-        try:
-            pods = get_pods(self.resource_name_prefix, self.namespace)
-        except Exception as err:
-            print("error occurs during check pod", err)
-            print(traceback.format_exc())
-            return False
+    def check_pod(self, pods):
         running_pods = []
         for pod in pods:
-            if pod.status.phase == RUNNING:
+            if (
+                pod.metadata.name.startswith(self.resource_name_prefix)
+                and pod.status.phase == RUNNING
+            ):
                 running_pods.append(pod)
         return len(running_pods) == self.number
 
-    def run(self) -> Tuple[int, str]:
-        s = time.time()
-        print(
-            "wait until the number of running %s %s becomes %s..."
-            % (self.resource_type, self.resource_name_prefix, self.number)
+    def describe(self):
+        return "wait until the number of running %s %s becomes %s" % (
+            self.resource_type,
+            self.resource_name_prefix,
+            self.number,
+        )
+
+    def run(self, stop_event=None) -> Tuple[int, str]:
+        if self.resource_type == POD:
+            list_func = get_core_v1_api().list_namespaced_pod
+            condition = self.check_pod
+        else:
+            assert False, "type not supported yet"
+        error_message = (
+            "Conditional wait timeout: %s does not become %s within %d seconds"
+            % (
+                self.resource_name_prefix,
+                self.number,
+                self.timeout,
+            )
+        )
+        return conditional_wait(
+            self.describe(),
+            error_message,
+            self.timeout,
+            list_func,
+            condition,
+            stop_event=stop_event,
+            namespace=self.namespace,
         )
-        while True:
-            duration = time.time() - s
-            if duration > self.timeout:
-                error_message = (
-                    "Conditional wait timeout: %s does not become %s within %d seconds"
-                    % (
-                        self.resource_name_prefix,
-                        self.number,
-                        self.timeout,
-                    )
-                )
-                print(error_message)
-                return 1, error_message
-            if self.resource_type == POD:
-                if self.check_pod():
-                    break
-            else:
-                assert False, "type not supported yet"
-            time.sleep(5)
-        time.sleep(5)  # make it configurable
-        print("wait takes %f seconds" % (time.time() - s))
-        return 0, NO_ERROR_MESSAGE
 
 
 class TestWaitForStorage:
@@ -312,8 +359,8 @@ class TestWaitForStorage:
         self.namespace = namespace
         self.timeout = timeout
 
-    def check_sts(self):
-        sts = get_sts(self.resource_name, self.namespace)
+    def check_sts(self, statefulsets):
+        sts = find_resource(statefulsets, self.resource_name)
         if sts is None:
             return False
         for volume_claim_template in sts.spec.volume_claim_templates:
@@ -324,30 +371,32 @@ class TestWaitForStorage:
                 return True
         return False
 
-    def run(self) -> Tuple[int, str]:
-        s = time.time()
-        print(
-            "wait until %s %s has storage size %s..."
-            % (self.resource_type, self.resource_name, self.storage_size)
+    def describe(self):
+        return "wait until %s %s has storage size %s" % (
+            self.resource_type,
+            self.resource_name,
+            self.storage_size,
+        )
+
+    def run(self, stop_event=None) -> Tuple[int, str]:
+        if self.resource_type == STS:
+            list_func = get_apps_v1_api().list_namespaced_stateful_set
+            condition = self.check_sts
+        else:
+            assert False, "type not supported yet"
+        error_message = (
+            "Conditional wait timeout: %s does not have storage size %s within %d seconds"
+            % (self.resource_name, self.storage_size, self.timeout)
+        )
+        return conditional_wait(
+            self.describe(),
+            error_message,
+            self.timeout,
+            list_func,
+            condition,
+            stop_event=stop_event,
+            namespace=self.namespace,
         )
-        while True:
-            duration = time.time() - s
-            if duration > self.timeout:
-                error_message = (
-                    "Conditional wait timeout: %s does not have storage size %s within %d seconds"
-                    % (self.resource_name, self.storage_size, self.timeout)
-                )
-                print(error_message)
-                return 1, error_message
-            if self.resource_type == STS:
-                if self.check_sts():
-                    break
-            else:
-                assert False, "type not supported yet"
-            time.sleep(5)
-        time.sleep(5)  # make it configurable
-        print("wait takes %f seconds" % (time.time() - s))
-        return 0, NO_ERROR_MESSAGE
 
 
 class TestWaitForExistence:
@@ -365,73 +414,47 @@ class TestWaitForExistence:
         self.namespace = namespace
         self.timeout = timeout
 
-    def check_secret(self):
-        try:
-            secret = get_secret(self.resource_name, self.namespace)
-        except Exception as err:
-            print("error occurs during check pvc", err)
-            print(traceback.format_exc())
-            return False
-
+    def check_existence(self, resources):
+        resource = find_resource(resources, self.resource_name)
         if self.exist == EXIST:
-            if secret is not None:
+            if resource is not None:
                 return True
         else:
-            if secret is None:
+            if resource is None:
                 return True
         return False
 
-    def check_service(self):
-        try:
-            service = get_service(self.resource_name, self.namespace)
-        except Exception as err:
-            print("error occurs during check pvc", err)
-            print(traceback.format_exc())
-            return False
+    def describe(self):
+        return "wait until %s %s %s" % (
+            self.resource_type,
+            self.resource_name,
+            "created" if self.exist else "deleted",
+        )
 
-        if self.exist == EXIST:
-            if service is not None:
-                return True
+    def run(self, stop_event=None) -> Tuple[int, str]:
+        if self.resource_type == SECRET:
+            list_func = get_core_v1_api().list_namespaced_secret
+        elif self.resource_type == SERVICE:
+            list_func = get_core_v1_api().list_namespaced_service
         else:
-            if service is None:
-                return True
-        return False
-
-    def run(self) -> Tuple[int, str]:
-        s = time.time()
-        print(
-            "wait until %s %s %s..."
+            assert False, "type not supported yet"
+        error_message = (
+            "Conditional wait timeout: %s does not become %s within %d seconds"
             % (
-                self.resource_type,
                 self.resource_name,
                 "created" if self.exist else "deleted",
+                self.timeout,
             )
         )
-        while True:
-            duration = time.time() - s
-            if duration > self.timeout:
-                error_message = (
-                    "Conditional wait timeout: %s does not become %s within %d seconds"
-                    % (
-                        self.resource_name,
-                        "created" if self.exist else "deleted",
-                        self.timeout,
-                    )
-                )
-                print(error_message)
-                return 1, error_message
-            if self.resource_type == SECRET:
-                if self.check_secret():
-                    break
-            elif self.resource_type == SERVICE:
-                if self.check_service():
-                    break
-            else:
-                assert False, "type not supported yet"
-            time.sleep(5)
-        time.sleep(5)  # make it configurable
-        print("wait takes %f seconds" % (time.time() - s))
-        return 0, NO_ERROR_MESSAGE
+        return conditional_wait(
+            self.describe(),
+            error_message,
+            self.timeout,
+            list_func,
+            self.check_existence,
+            stop_event=stop_event,
+            namespace=self.namespace,
+        )
 
 
 class TestWaitForCRConditions:
@@ -463,40 +486,85 @@ class TestWaitForCRConditions:
                 return False
         return True
 
-    def run(self) -> Tuple[int, str]:
-        s = time.time()
-        print(
-            "wait until %s %s %s..."
+    def check_custom_resources(self, custom_resources):
+        for custom_resource in custom_resources:
+            if custom_resource["metadata"]["name"] == self.resource_name:
+                return self.check_cr_conditions(custom_resource)
+        return False
+
+    def describe(self):
+        return "wait until %s %s %s" % (
+            self.custom_resource_type,
+            self.resource_name,
+            self.conditions,
+        )
+
+    def run(self, stop_event=None) -> Tuple[int, str]:
+        error_message = (
+            "Conditional wait timeout: %s does not achieve %s within %d seconds"
             % (
-                self.custom_resource_type,
                 self.resource_name,
                 self.conditions,
+                self.timeout,
             )
         )
-        while True:
-            duration = time.time() - s
-            if duration > self.timeout:
-                error_message = (
-                    "Conditional wait timeout: %s does not achieve %s within %d seconds"
-                    % (
-                        self.resource_name,
-                        self.conditions,
-                        self.timeout,
-                    )
-                )
-                print(error_message)
-                return 1, error_message
-            custom_resource = get_custom_resource(
-                self.custom_resource_type, self.resource_name, self.namespace
-            )
-            if custom_resource is None:
-                continue
-            if self.check_cr_conditions(custom_resource):
-                break
-            time.sleep(5)
-        time.sleep(5)  # make it configurable
-        print("wait takes %f seconds" % (time.time() - s))
-        return 0, NO_ERROR_MESSAGE
+        return conditional_wait(
+            self.describe(),
+            error_message,
+            self.timeout,
+            list_custom_resources,
+            self.check_custom_resources,
+            stop_event=stop_event,
+            custom_resource_type=self.custom_resource_type,
+            namespace=self.namespace,
+        )
+
+
+class TestParallel:
+    def __init__(self, work_list):
+        self.work_list = work_list
+
+    def describe(self):
+        return "all of [%s]" % ", ".join([work.describe() for work in self.work_list])
+
+    def run(self, stop_event=None) -> Tuple[int, str]:
+        """
+        Run all the steps in the group concurrently, each in its own thread.
+        The group finishes when all the steps succeed,
+        or when any step fails (e.g., a conditional wait times out),
+        in which case the remaining steps are stopped and the error of the failed step is returned.
+        The group only returns after all its steps return, so it never overlaps the next step.
+        A nested group shares the stop event of its enclosing group.
+        """
+        if stop_event is None:
+            stop_event = threading.Event()
+        results = queue.Queue()
+
+        def run_work(work):
+            try:
+                results.put(work.run(stop_event))
+            except Exception as e:
+                traceback.print_exc()
+                results.put((1, "Step error: '%s' raises %s" % (work.describe(), e)))
+
+        print()
+        print(self.describe())
+        threads = [
+            threading.Thread(target=run_work, args=(work,), daemon=True)
+            for work in self.work_list
+        ]
+        for thread in threads:
+            thread.start()
+        return_code, error_message = 0, NO_ERROR_MESSAGE
+        for _ in self.work_list:
+            work_return_code, work_error_message = results.get()
+            if work_return_code != 0 and return_code == 0:
+                return_code, error_message = work_return_code, work_error_message
+                stop_event.set()
+                wake_up_informer_waiters()
+        for thread in threads:
+            thread.join()
+        return return_code, error_message
 
 
 class BuiltInWorkLoad:
@@ -628,15 +696,41 @@ class BuiltInWorkLoad:
         self.work_list.append(test_wait)
         return self
 
+    def parallel(self, group):
+        """
+        Run the steps of group (built by new_step_group()) concurrently as one step, e.g.,
+        .parallel(
+            new_step_group()
+            .wait_for_pod_status("a", RUNNING)
+            .wait_for_pod_status("b", RUNNING)
+        )
+        """
+        test_parallel = TestParallel(group.work_list)
+        self.work_list.append(test_parallel)
+        return self
+
+    def all_of(self, group):
+        return self.parallel(group)
+
     def run(self, output_file):
         with open(output_file, "w") as f:
             for work in self.work_list:
+                step_start_time = time.time()
                 return_code, error_message = work.run()
+                f.write(
+                    "%s %f %s\n"
+                    % (
+                        WORKLOAD_STEP_LATENCY,
+                        time.time() - step_start_time,
+                        work.describe(),
+                    )
+                )
                 print(datetime.datetime.now())
                 if return_code != 0:
                     print(error_message)
                     f.write(error_message + "\n")
                     if return_code == 2:
+                        stop_informers()
                         return
             print()
             print(
@@ -645,8 +739,15 @@ class BuiltInWorkLoad:
             )
             time.sleep(self.final_grace_period)
             f.write("FINISH-SIEVE-TEST\n")
+        stop_informers()
 
 
 def new_built_in_workload(final_grace_period=50):
     workload = BuiltInWorkLoad(final_grace_period)
     return workload
+
+
+def new_step_group():
+    # a step group only collects the steps, so it has no final grace period
+    group = BuiltInWorkLoad(0)
+    return group